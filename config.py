@@ -0,0 +1,47 @@
+import os
+
+# Market data backend: "yahoo" uses the yahoo finance API, "synthetic" generates
+# deterministic, seeded data so the application runs without any network access.
+DATA_PROVIDER = os.environ.get("ASR_DATA_PROVIDER", "yahoo").strip().lower()
+
+# Seed for the synthetic backend. The same seed always yields the same market.
+SYNTHETIC_SEED = int(os.environ.get("ASR_SYNTHETIC_SEED", "42"))
+
+# First business day of the synthetic market history.
+SYNTHETIC_START = os.environ.get("ASR_SYNTHETIC_START", "2000-01-01")
+
+# Folder for memoized Monte Carlo results, "" disables memoization.
+SIMULATION_CACHE_DIR = os.environ.get("ASR_SIMULATION_CACHE", os.path.join("cache", "montecarlo"))
+
+# Maximum size of the memoized results in MB, least recently used results are evicted.
+SIMULATION_CACHE_MAX_MB = int(os.environ.get("ASR_SIMULATION_CACHE_MB", "2048"))
+
+# Also memoize the full path matrix (large), not only what is needed for the graph.
+SIMULATION_CACHE_PATHS = os.environ.get("ASR_SIMULATION_CACHE_PATHS", "0") == "1"
+
+# Folder of the local store of intraday bars and their resampled frequencies.
+BAR_CACHE_DIR = os.environ.get("ASR_BAR_CACHE", os.path.join("cache", "bars"))
+
+# Log file of the command line interface, so background messages do not interrupt the prompt.
+LOG_FILE = os.environ.get("ASR_LOG_FILE", os.path.join("cache", "tracker.log"))
+
+# Seconds between live quote refreshes of all held tickers, 0 disables the refresher.
+QUOTE_REFRESH_SECONDS = float(os.environ.get("ASR_QUOTE_REFRESH", "60"))
+
+# Maximum number of tickers per quote request.
+QUOTE_BATCH_SIZE = int(os.environ.get("ASR_QUOTE_BATCH", "50"))
+
+# Maximum number of quote requests per second sent to the data provider.
+QUOTE_RATE_LIMIT = float(os.environ.get("ASR_QUOTE_RATE", "2"))
+
+# Maximum number of concurrent calls to the market data source.
+TRANSPORT_CONCURRENCY = int(os.environ.get("ASR_TRANSPORT_CONCURRENCY", "8"))
+
+# Seconds a single call to the market data source may take.
+TRANSPORT_TIMEOUT = float(os.environ.get("ASR_TRANSPORT_TIMEOUT", "15"))
+
+# Extra attempts after a transient failure (network error, timeout, rate limit).
+TRANSPORT_RETRIES = int(os.environ.get("ASR_TRANSPORT_RETRIES", "3"))
+
+# Currency all values, weights and portfolio prices are expressed in.
+BASE_CURRENCY = os.environ.get("ASR_BASE_CURRENCY", "USD").strip().upper()
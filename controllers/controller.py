@@ -1,12 +1,20 @@
 from models.Portfolio import Portfolio
+from models.PortfolioManager import PortfolioManager
+from models.QuoteRefresher import QuoteRefresher
 from models.Asset import Asset
+from models.LotQueue import LotQueue
+from models.Backtester import Backtester
+from models.BarStore import BarStore
+from models.MonteCarlo import MonteCarlo
+from models.Returns import ReturnCalculator
+from models.MarketData import MarketDataProvider, get_provider
 from views.create_views import Viewer
 from datetime import datetime as dt
-from typing import Optional
-import yfinance as yf
+from typing import Any, Optional
 import sys
 import contextlib
 import io
+import pandas as pd
 
 
 class Controller:
@@ -17,14 +25,25 @@ class Controller:
 
     Parameters
     ----------
-    None
+    provider: Optional[models.MarketData.MarketDataProvider]
+        Source of market data, defaults to the provider selected
+        in config.DATA_PROVIDER.
 
     Attributes
     ----------
+    manager: models.PortfolioManager
+        Holds all named portfolios and the market data they share.
+    provider: models.MarketData.MarketDataProvider
+        The cached provider shared by all portfolios.
+    portfolio_name: str
+        Name of the active portfolio.
     portfolio: models.Portfolio
-        A Class which represents the current portfolio.
+        A Class which represents the active portfolio.
     viewer: create_views.Viewer
         A class which handles all the table and plot operations.
+    refresher: models.QuoteRefresher
+        Keeps the current values of all portfolios up to date,
+        once started.
     asset_classes: dict[str]
         All asset classes listed on yahoo finance. Also includes
         "Other" and "All", for extra customisation possibilities.
@@ -32,9 +51,13 @@ class Controller:
         All sectors listed on yahoo finance. Also Includes "Other"
         and "All", for extra customisation possibilities.
     """
-    def __init__(self):
-        self.portfolio = Portfolio()
+    def __init__(self, provider: Optional[MarketDataProvider]=None):
+        self.manager = PortfolioManager(provider if provider is not None else get_provider())
+        self.provider = self.manager.provider
+        self.portfolio_name = "Default"
+        self.portfolio = self.manager.get_or_create(self.portfolio_name)
         self.viewer = Viewer(self.portfolio)
+        self.refresher = QuoteRefresher(self.manager)
         self.asset_classes = {
             "Equities",
             "Fixed Income",
@@ -67,7 +90,7 @@ class Controller:
     def handle_command(self, command: str) -> None:
         """
         Calls the relevant functions based on the main
-        command e.g. (ADD/DELETE/SHOW/GRAPH).
+        command e.g. (ADD/SELL/DELETE/SHOW/GRAPH/PORTFOLIO).
 
         Parameters
         ----------
@@ -85,6 +108,9 @@ class Controller:
         command = command.strip().upper()
         if command.strip().upper() == "ADD":
             self.add_to_portfolio()
+
+        elif command.strip().upper() == "SELL":
+            self.sell_from_portfolio()
         
         elif command.strip().upper() == "SHOW":
             self.show_table()
@@ -94,10 +120,41 @@ class Controller:
         
         elif command.strip().upper() == "DELETE":
             self.delete_from_portfolio()
+
+        elif command.strip().upper() == "PORTFOLIO":
+            self.switch_portfolio()
         
         else:
             print("\nUnrecognized command\n")
     
+    def switch_portfolio(self) -> None:
+        """
+        Makes another named portfolio the active one, creating it
+        if it does not exist. All other commands act on the active
+        portfolio.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Prompts the user for input and prints to the terminal.
+        """
+        print(f"Portfolios: {' '.join(self.manager.portfolios)} (active: {self.portfolio_name})")
+        name = input("Portfolio name (existing or new): ").strip()
+        if not name:
+            print("\nInvalid name, active portfolio unchanged.\n")
+            return
+        self.portfolio_name = name
+        self.portfolio = self.manager.get_or_create(name)
+        self.viewer.portfolio = self.portfolio
+        print(f"\nActive portfolio: {name}\n")
+
     def delete_from_portfolio(self) -> None:
         """
         Deletes a ticker entirely from the self.portfolio object.
@@ -116,7 +173,92 @@ class Controller:
         the self.portfolio object.
         """
         ticker = input("Ticker to delete: ")
-        self.portfolio.delete_asset(ticker)
+        with self.manager.lock:
+            self.portfolio.delete_asset(ticker)
+
+    def sell_from_portfolio(self) -> None:
+        """
+        Sells (part of) a ticker of the self.portfolio object,
+        matching the lots FIFO, LIFO or at average cost.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Prompts User for input and sells from the
+        self.portfolio object.
+        """
+        while True:
+            try:
+                ticker = input("Ticker: ").strip()
+                if not self.portfolio.check_if_present(ticker):
+                    raise ValueError
+                break
+            except KeyboardInterrupt:
+                print("\n\nGoodbye!\n")
+                sys.exit(0)
+            except:
+                print(f"\n{ticker} not in portfolio, choose one of {' '.join(self.portfolio.assets)}\n")
+
+        held = self.portfolio.assets[ticker].held
+        while True:
+            try:
+                quantity = float(input(f"Quantity (at most {held:g}): ").strip())
+                if not 0 < quantity <= held:
+                    raise ValueError
+                break
+            except KeyboardInterrupt:
+                print("\n\nGoodbye!\n")
+                sys.exit(0)
+            except:
+                print(f"\nInvalid quantity, provide a positive number up to {held:g}.\n")
+
+        while True:
+            try:
+                price = float(input("Sale Price: ").strip())
+                break
+            except KeyboardInterrupt:
+                print("\n\nGoodbye!\n")
+                sys.exit(0)
+            except:
+                print("sale price is not numeric, please provide numeric value.\n")
+
+        methods = {method.upper(): method for method in LotQueue.METHODS}
+        while True:
+            try:
+                method = input("Lot matching (FIFO, LIFO or Average): ").strip().upper() or "FIFO"
+                method = methods[method]
+                break
+            except KeyboardInterrupt:
+                print("\n\nGoodbye!\n")
+                sys.exit(0)
+            except:
+                print(f"\nInvalid lot matching, choose one of {set(methods.values())}\n")
+
+        while True:
+            try:
+                sale_date = input("Sale Date (YYYY-MM-DD or None for today): ").strip()
+                if sale_date.capitalize() == "None" or not sale_date:
+                    sale_date = None
+                else:
+                    dt.strptime(sale_date, "%Y-%m-%d")
+                break
+            except KeyboardInterrupt:
+                print("\n\nGoodbye!\n")
+                sys.exit(0)
+            except:
+                print("\nInvalid date entered, please provide valid format: YYYY-MM-DD\n")
+
+        with self.manager.lock:
+            realised = self.portfolio.sell(ticker, quantity, price, method, sale_date)
+        currency = self.portfolio.provider.currency(ticker)
+        print(f"\nSuccesfully sold {quantity:g} of {ticker}, realised {realised:,.2f} {currency}.\n")
 
     def add_to_portfolio(self) -> None:
         """
@@ -143,7 +285,7 @@ class Controller:
                     contextlib.redirect_stdout(io.StringIO()),
                     contextlib.redirect_stderr(io.StringIO()),
                 ):
-                    _ = int(yf.Ticker(ticker).fast_info["lastPrice"])
+                    _ = int(self.provider.last_price(ticker))
                 break
             except KeyboardInterrupt:
                 print("\n\nGoodbye!\n")
@@ -194,13 +336,37 @@ class Controller:
                 sys.exit(0)
             except:
                 print(f"purchase_price is not numeric, please provide numeric value.\n")     
+
+        while True:
+            try:
+                purchase_date = input("Purchase Date (YYYY-MM-DD or None for today): ").strip()
+                if purchase_date.capitalize() == "None" or not purchase_date:
+                    purchase_date = None
+                else:
+                    dt.strptime(purchase_date, "%Y-%m-%d")
+                break
+            except KeyboardInterrupt:
+                print("\n\nGoodbye!\n")
+                sys.exit(0)
+            except:
+                print("\nInvalid date entered, please provide valid format: YYYY-MM-DD\n")
         
-        if self.portfolio.check_if_present(ticker):
-            self.portfolio.assets[ticker].buy(quantity, purchase_price)
-        else:
-            self.portfolio.add_new_asset(
-                Asset(ticker, sector, asset_class, quantity, purchase_price),
-            )
+        # Held against the quote refresher, which revalues the assets from another thread.
+        with self.manager.lock:
+            if self.portfolio.check_if_present(ticker):
+                self.portfolio.assets[ticker].buy(quantity, purchase_price, purchase_date)
+            else:
+                self.portfolio.add_new_asset(
+                    Asset(
+                        ticker,
+                        sector,
+                        asset_class,
+                        quantity,
+                        purchase_price,
+                        self.provider,
+                        purchase_date,
+                    ),
+                )
         print(f"\nSuccesfully added {quantity} of {ticker} to the portfolio.\n")
 
     def show_table(self) -> None:
@@ -219,15 +385,253 @@ class Controller:
         -----
         Prompts the User for input and prints to the terminal.
         """
-        table_type = input("Table (Summary or Weights): ").strip().capitalize()
+        table_type = input("Table (Summary, Weights, Books, P&L, Returns, Stress or Export): ").strip().capitalize()
         if table_type == "Summary":
-            self.viewer.display_summary()
+            options = self.retrieve_table_options(self.viewer.SUMMARY_COLUMNS)
+            self.viewer.display_summary(**options)
+        elif table_type == "Books":
+            self.viewer.display_books(self.manager)
         elif table_type == "Weights":
             restrictions = self.retrieve_restrictions()
-            self.viewer.display_weights(restrictions=restrictions)
+            options = self.retrieve_table_options(self.viewer.WEIGHT_COLUMNS)
+            self.viewer.display_weights(restrictions=restrictions, **options)
+        elif table_type.upper() == "P&L":
+            self.viewer.display_pnl(self.retrieve_restrictions())
+        elif table_type == "Returns":
+            restrictions = self.retrieve_restrictions()
+            try:
+                self.viewer.display_returns(restrictions, self.retrieve_grouping())
+            except ValueError as e:
+                print(f"\n{e}\n")
+        elif table_type == "Stress":
+            self.stress_test()
+        elif table_type == "Export":
+            self.export_table()
         else:
             print("\nInvalid Table type, choose one of the available options.\n")
 
+    def stress_test(self) -> None:
+        """
+        Prints the P&L of the active portfolio (or a subset of it)
+        under the scenario library and historical replays.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Prompts the User for input and prints to the terminal.
+        """
+        restrictions = self.retrieve_restrictions()
+        groups = {"Asset Class": "asset_class", "Sector": "sector", "Ticker": "ticker"}
+        while True:
+            try:
+                by = input("P&L by (Asset Class, Sector or Ticker): ").strip().title()
+                if by not in groups:
+                    raise ValueError
+                text = input("Rolling window in trading days (e.g. 21, or None): ").strip()
+                window = None if text.capitalize() in {"None", ""} else int(text)
+                if window is not None and window < 1:
+                    raise ValueError
+                break
+            except KeyboardInterrupt:
+                print("\n\nGoodbye!\n")
+                sys.exit(0)
+            except:
+                print(f"\nInvalid input, choose one of {set(groups)} and a positive window\n")
+
+        date1, date2 = "2000-01-01", None
+        if window is not None:
+            while True:
+                try:
+                    date1 = input("Start date of the windows (YYYY-MM-DD): ").strip()
+                    dt.strptime(date1, "%Y-%m-%d")
+                    date2 = input("End date of the windows (YYYY-MM-DD or None): ").strip().capitalize()
+                    date2 = None if date2 == "None" else date2
+                    if date2 is not None:
+                        dt.strptime(date2, "%Y-%m-%d")
+                    break
+                except KeyboardInterrupt:
+                    print("\n\nGoodbye!\n")
+                    sys.exit(0)
+                except:
+                    print("\nInvalid date, use YYYY-MM-DD\n")
+        try:
+            self.viewer.display_stress(restrictions, groups[by], window, date1, date2)
+        except ValueError as e:
+            print(f"\n{e}\n")
+
+    def retrieve_table_options(self, columns: list[str]) -> dict[str, Any]:
+        """
+        Prompts the User for sorting, top N, filters and pagination of
+        a table, as ";" separated options, e.g.
+        "sort=Current Value; asc; top=10; sector=Energy; page=2; size=20".
+        An empty input shows the whole table in portfolio order.
+
+        Parameters
+        ----------
+        columns: list[str]
+            The columns of the table, valid values for "sort".
+
+        Returns
+        -------
+        dict[str, Any]
+            Keyword arguments for Viewer.display_summary and
+            Viewer.display_weights.
+
+        Notes
+        -----
+        Prompts the User for input and prints to the terminal.
+        """
+        while True:
+            try:
+                text = input("Options (sort=, asc, top=, asset_class=, sector=, page=, size=): ")
+                options = {}
+                restrictions = {}
+                for option in filter(None, (part.strip() for part in text.split(";"))):
+                    key, _, value = (part.strip() for part in option.partition("="))
+                    key = key.lower()
+                    if key == "sort":
+                        if value.title() not in columns:
+                            raise ValueError(f"Invalid column, choose one of {columns}")
+                        options["sort_by"] = value.title()
+                    elif key == "asc":
+                        options["descending"] = False
+                    elif key == "top":
+                        options["top"] = int(value)
+                    elif key == "page":
+                        options["page"] = int(value)
+                        options.setdefault("page_size", 50)
+                    elif key == "size":
+                        options["page_size"] = int(value)
+                    elif key == "asset_class" and value.title() in self.asset_classes:
+                        restrictions["asset_class"] = value.title()
+                    elif key == "sector" and value.title() in self.sectors:
+                        restrictions["sector"] = value.title()
+                    else:
+                        raise ValueError(f"Invalid option {option}")
+                if any(options.get(key, 1) < 1 for key in ("top", "page", "page_size")):
+                    raise ValueError("top, page and size must be positive integers")
+                # Weights have their own restrictions prompt, the summary is filtered here.
+                if restrictions and "Asset Name" in columns:
+                    options["restrictions"] = restrictions
+                return options
+            except KeyboardInterrupt:
+                print("\n\nGoodbye!\n")
+                sys.exit(0)
+            except ValueError as e:
+                print(f"\n{e}\n")
+
+    def export_table(self) -> None:
+        """
+        Writes the Summary, Weights or Returns table of the active
+        portfolio to a CSV, Parquet or JSON file.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Prompts the User for input, prints to the terminal and writes
+        a file.
+        """
+        table_type = input("Table to export (Summary, Weights or Returns): ").strip().capitalize()
+        if table_type not in {"Summary", "Weights", "Returns"}:
+            print("\nInvalid Table type, choose one of the available options.\n")
+            return
+        restrictions = self.retrieve_restrictions()
+        by = self.retrieve_grouping() if table_type == "Returns" else None
+        path = input("File (.csv, .parquet or .json): ").strip()
+        if table_type == "Summary":
+            columns, rows = self.viewer.SUMMARY_COLUMNS, self.viewer.summary_rows(restrictions)
+        elif table_type == "Returns":
+            try:
+                table = ReturnCalculator(self.portfolio).run(restrictions, by).reset_index()
+            except ValueError as e:
+                print(f"\n{e}\n")
+                return
+            columns, rows = list(table.columns), table.itertuples(index=False)
+        else:
+            columns, rows = self.viewer.WEIGHT_COLUMNS, self.viewer.weight_rows(restrictions)
+        self.viewer.export_table(path, columns, rows)
+
+    def retrieve_grouping(self) -> str:
+        """
+        Retrieves the group of a breakdown per asset class, sector
+        or ticker.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        str
+            One of "asset_class", "sector" or "ticker".
+
+        Notes
+        -----
+        Prompts the User for input.
+        """
+        groups = {"Asset Class": "asset_class", "Sector": "sector", "Ticker": "ticker"}
+        while True:
+            try:
+                by = input("By (Asset Class, Sector or Ticker): ").strip().title()
+                return groups[by]
+            except KeyboardInterrupt:
+                print("\n\nGoodbye!\n")
+                sys.exit(0)
+            except:
+                print(f"\nInvalid input, choose one of {set(groups)}\n")
+
+    def retrieve_bars(self) -> dict[str, Optional[str]]:
+        """
+        Retrieves whether a graph uses intraday bars instead of daily
+        closes, and the frequency to resample them to.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        dict[str, Optional[str]]
+            Keyword arguments "interval" and "rule" for the graphs of
+            the Viewer (None for daily closes or no resampling).
+
+        Notes
+        -----
+        Prompts the User for input.
+        """
+        while True:
+            try:
+                interval = input("Bar interval (1m, 5m, 1h or None for daily closes): ").strip().lower()
+                if interval == "none":
+                    return {"interval": None, "rule": None}
+                if interval not in BarStore.INTERVALS:
+                    raise ValueError
+                rule = input("Resample to (e.g. 15min, 4h, 1D, W-FRI or None): ").strip()
+                if rule.capitalize() == "None":
+                    rule = None
+                else:
+                    pd.tseries.frequencies.to_offset(rule)
+                return {"interval": interval, "rule": rule}
+            except KeyboardInterrupt:
+                print("\n\nGoodbye!\n")
+                sys.exit(0)
+            except:
+                print(f"\nInvalid input, choose an interval of {set(BarStore.INTERVALS)} and a pandas frequency\n")
+
     def retrieve_restrictions(self) -> Optional[dict[str, str]]:
         """
         Prompts to the User if for the current operation, the user
@@ -301,7 +705,9 @@ class Controller:
         Prompts the User for input, prints to the terminal
         and writes a file to the folder "graphs".
         """
-        graph_type = input("Type (Individual Assets/Portfolio/Monte Carlo): ").strip().title()
+        graph_type = input(
+            "Type (Individual Assets/Portfolio/Monte Carlo/Efficient Frontier/Backtest): ",
+        ).strip().title()
 
         while True:
             try:
@@ -332,7 +738,7 @@ class Controller:
                             contextlib.redirect_stdout(io.StringIO()),
                             contextlib.redirect_stderr(io.StringIO()),
                         ):
-                            _ = int(yf.Ticker(asset).fast_info["lastPrice"])
+                            _ = int(self.provider.last_price(asset))
                     break
                 except KeyboardInterrupt:
                     print("\n\nGoodbye!\n")
@@ -340,11 +746,14 @@ class Controller:
                 except:
                     print(f"\n{asset} not present in yahoo finance API.\n")
 
-            self.viewer.create_individual_asset_graphs(name_graph, assets, date1, date2=date2)
+            bars = self.retrieve_bars()
+            self.viewer.create_individual_asset_graphs(name_graph, assets, date1, date2=date2, **bars)
         
         elif graph_type == "Portfolio":
             restrictions = self.retrieve_restrictions()
-            self.viewer.create_portfolio_graph(restrictions, name_graph, date1, date2=date2)
+            export = self.retrieve_export(paths=False)
+            bars = self.retrieve_bars()
+            self.viewer.create_portfolio_graph(restrictions, name_graph, date1, date2=date2, **export, **bars)
         
         elif graph_type == "Monte Carlo":
             restrictions = self.retrieve_restrictions()
@@ -364,10 +773,15 @@ class Controller:
 
             while True:
                 try:
-                    years = float(input("Number of years (min 1/12, max 100): ").strip())
-                    if years*12 % 1 != 0:
+                    # Several horizons (e.g. 1, 5, 10, 15) are summarized from one simulation.
+                    years = [
+                        float(part) for part in input(
+                            "Number of years (min 1/12, max 100, chain with , for several horizons): ",
+                        ).split(",")
+                    ]
+                    if any(y*12 % 1 != 0 or y <= 0 for y in years):
                         print("\nUnable to process, make sure input * 12 is a positive integer.\n")
-                    elif years > 100:
+                    elif max(years) > 100:
                         print("\ninput exceeded 100, make sure input is below 100\n")
                     else:
                         break
@@ -377,11 +791,180 @@ class Controller:
                 except:
                     print("\nProvide an integer.\n")
             
+            while True:
+                try:
+                    engine = input("Engine (GBM or Bootstrap): ").strip()
+                    engine = "GBM" if engine.upper() == "GBM" else engine.capitalize()
+                    if engine not in MonteCarlo.ENGINES:
+                        raise ValueError
+                    step = input("Step (Daily/Weekly/Monthly/Quarterly): ").strip().capitalize()
+                    if step not in MonteCarlo.STEPS:
+                        raise ValueError
+                    block_size = 6
+                    if engine == "Bootstrap":
+                        block_size = int(input("Block size in steps: ").strip())
+                        if block_size < 1:
+                            raise ValueError
+                    break
+                except KeyboardInterrupt:
+                    print("\n\nGoodbye!\n")
+                    sys.exit(0)
+                except:
+                    print(
+                        f"\nChoose one of {MonteCarlo.ENGINES} and one of {set(MonteCarlo.STEPS)},"
+                        f" with a positive integer block size.\n"
+                    )
+
+            export = self.retrieve_export(paths=True)
             self.viewer.create_monte_carlo_graph(
                 restrictions,
                 name_graph,
                 date1,
                 date2,
+                **export,
                 n=sims,
-                months=int(12*years),
+                months=int(12*max(years)),
+                engine=engine,
+                block_size=block_size,
+                step=step,
+                horizons=sorted({int(12*y) for y in years}) if len(years) > 1 else None,
             )
+
+        elif graph_type == "Efficient Frontier":
+            restrictions = self.retrieve_restrictions()
+
+            while True:
+                try:
+                    candidates = int(input("Number of candidate portfolios: ").strip())
+                    if not 1 <= candidates <= 1000000:
+                        raise ValueError
+                    risk_free = float(input("Annual risk free rate (e.g. 0.02): ").strip())
+                    break
+                except KeyboardInterrupt:
+                    print("\n\nGoodbye!\n")
+                    sys.exit(0)
+                except:
+                    print("\nProvide an integer between 1 and 1000000 and a number.\n")
+
+            constraints = self.retrieve_constraints()
+            self.viewer.create_frontier_graph(
+                restrictions,
+                name_graph,
+                date1,
+                date2,
+                n=candidates,
+                constraints=constraints,
+                risk_free=risk_free,
+            )
+
+        elif graph_type == "Backtest":
+            restrictions = self.retrieve_restrictions()
+
+            while True:
+                try:
+                    rebalance = input("Rebalance (Weekly/Monthly/Quarterly/Yearly): ").strip().capitalize()
+                    if rebalance not in Backtester.FREQUENCIES:
+                        raise ValueError
+                    break
+                except KeyboardInterrupt:
+                    print("\n\nGoodbye!\n")
+                    sys.exit(0)
+                except:
+                    print(f"\nChoose one of {set(Backtester.FREQUENCIES)}\n")
+
+            self.viewer.create_backtest_graph(
+                restrictions, name_graph, date1, date2, rebalance=rebalance,
+            )
+
+    def retrieve_export(self, paths: bool) -> dict[str, Any]:
+        """
+        Prompts the User if and where the results of a graph should
+        also be written as Arrow or Parquet files.
+
+        Parameters
+        ----------
+        paths: bool
+            If the User can also export the simulated paths.
+
+        Returns
+        -------
+        dict[str, Any]
+            Keyword arguments for Viewer.create_portfolio_graph and
+            Viewer.create_monte_carlo_graph, empty for no export.
+
+        Notes
+        -----
+        Prompts the User for input and prints to the terminal.
+        """
+        folder = input("Export results to folder (or None): ").strip()
+        if folder.capitalize() in {"None", ""}:
+            return {}
+        while True:
+            try:
+                export = {"export_folder": folder}
+                export["export_format"] = input("Table format (Arrow or Parquet): ").strip().capitalize()
+                if export["export_format"] not in {"Arrow", "Parquet"}:
+                    raise ValueError
+                if paths:
+                    text = input("Full paths (None, Npy, Arrow or Parquet): ").strip().capitalize()
+                    if text not in {"None", "Npy", "Arrow", "Parquet"}:
+                        raise ValueError
+                    export["export_paths"] = None if text == "None" else text
+                return export
+            except KeyboardInterrupt:
+                print("\n\nGoodbye!\n")
+                sys.exit(0)
+            except:
+                print("\nInvalid format, choose one of the available options.\n")
+
+    def retrieve_constraints(self) -> Optional[dict[str, dict[str, tuple[float, float]]]]:
+        """
+        Prompts the User for the minimum and maximum weight per asset
+        class and/or sector of an optimized portfolio, e.g.
+        "Equities<=0.6; Energy>=0.1". A name that is both an asset
+        class and a sector (Real Estate, Other) is taken as asset class.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Optional[dict[str, dict[str, tuple[float, float]]]]
+            Bounds per asset class and per sector, None for no
+            constraints.
+
+        Notes
+        -----
+        Prompts the User for input and prints to the terminal.
+        """
+        while True:
+            try:
+                text = input("Constraints (e.g. Equities<=0.6; Energy>=0.1, or None): ").strip()
+                constraints = {}
+                if text.capitalize() != "None" and text:
+                    for part in text.split(";"):
+                        operator = "<=" if "<=" in part else ">="
+                        group, value = part.split(operator)
+                        group, value = group.strip().title(), float(value)
+                        if group in self.asset_classes - {"All"}:
+                            kind = "asset_class"
+                        elif group in self.sectors - {"All"}:
+                            kind = "sector"
+                        else:
+                            raise ValueError
+                        low, high = constraints.setdefault(kind, {}).get(group, (0.0, 1.0))
+                        bounds = (low, value) if operator == "<=" else (value, high)
+                        if not 0 <= bounds[0] <= bounds[1] <= 1:
+                            raise ValueError
+                        constraints[kind][group] = bounds
+                return constraints or None
+            except KeyboardInterrupt:
+                print("\n\nGoodbye!\n")
+                sys.exit(0)
+            except:
+                print(
+                    f"\nInvalid constraints, use <name><=<weight> or <name>>=<weight> separated"
+                    f" by ;, with weights between 0 and 1 and names from"
+                    f" {self.asset_classes | self.sectors}\n"
+                )
@@ -0,0 +1,1094 @@
+from controllers.controller import Controller
+from models.Asset import Asset
+from models.Backtester import Backtester
+from models.BarStore import BarStore
+from models.LotQueue import LotQueue
+from models.MarketData import CachedProvider, MarketDataProvider, get_provider
+from models.MonteCarlo import MonteCarlo
+from models.Optimizer import Optimizer
+from models.Portfolio import Portfolio
+from models.Returns import ReturnCalculator
+from models.SimulationCache import SimulationCache
+from models.StressTest import StressTester
+from views.create_views import Viewer
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime as dt
+from http import HTTPStatus
+from typing import Any, Callable, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+import pandas as pd
+import asyncio
+import json
+import config
+import multiprocessing
+import os
+
+
+def _render_individual_assets(name: str, assets: list[str], marketData: pd.DataFrame) -> str:
+    Viewer.plot_individual_assets(name, assets, marketData)
+    return os.path.join("graphs", f"{name}.png")
+
+
+def _render_portfolio(
+        restrictions: Optional[dict[str, str]],
+        name: str,
+        portfolio_p: pd.DataFrame,
+        export: Optional[dict[str, Any]]=None,
+) -> str:
+    Viewer.plot_portfolio(restrictions, name, portfolio_p)
+    if export is not None:
+        Viewer.export_frame(
+            os.path.join(export["folder"], f"{name}_history{Viewer.EXPORT_EXTENSIONS[export['format']]}"),
+            portfolio_p,
+        )
+    return os.path.join("graphs", f"{name}.png")
+
+
+def _render_monte_carlo(
+        restrictions: Optional[dict[str, str]],
+        name: str,
+        key: Optional[str],
+        portfolio_p: Optional[pd.DataFrame],
+        params: dict[str, Any],
+        export: Optional[dict[str, Any]]=None,
+) -> tuple[str, Optional[dict[str, Any]]]:
+    cache = SimulationCache() if key is not None else None
+    result = cache.load(key) if cache is not None else None
+    horizons = params.get("horizons")
+    export_paths = export["paths"] if export is not None else None
+    paths = None
+    if result is None or (export_paths is not None and result[4] is None):
+        if portfolio_p is None:
+            raise RuntimeError("Memoized simulation was evicted, please retry")
+        history, sims, future_index = MonteCarlo.simulate_from_prices(portfolio_p, **params)
+        terminals = None
+        if horizons is not None:
+            terminals = sims[MonteCarlo.horizon_rows(future_index, history.index[-1], horizons)]
+        if cache is not None:
+            result = cache.store(key, history, future_index, sims, terminals)
+        else:
+            result = (history, future_index, *SimulationCache.summarize(sims), sims, terminals)
+        paths = sims
+    history, future_index, bands, samples, stored_paths, terminals = result
+    Viewer.plot_monte_carlo(restrictions, name, history, bands, samples, future_index)
+    if export is not None:
+        Viewer.export_simulation(
+            export["folder"],
+            name,
+            history,
+            future_index,
+            bands,
+            stored_paths if stored_paths is not None else paths,
+            export["format"],
+            export_paths,
+        )
+    if horizons is None:
+        return os.path.join("graphs", f"{name}.png"), None
+    rows = MonteCarlo.horizon_rows(future_index, history.index[-1], horizons)
+    summary = MonteCarlo.horizon_statistics(terminals, history.iloc[-1, 0], horizons, future_index[rows])
+    Viewer.plot_horizons(restrictions, f"{name}_horizons", summary, terminals, history.iloc[-1, 0])
+    return os.path.join("graphs", f"{name}.png"), summary.to_dict(orient="index")
+
+
+def _render_frontier(
+        restrictions: Optional[dict[str, str]],
+        name: str,
+        returns: pd.DataFrame,
+        current: pd.Series,
+        groups: dict[str, dict[str, str]],
+        params: dict[str, Any],
+) -> tuple[str, dict[str, dict[str, float]]]:
+    portfolios, frontier, cloud = Optimizer.optimize_returns(returns, current, groups, **params)
+    Viewer.plot_frontier(restrictions, name, portfolios, frontier, cloud)
+    return os.path.join("graphs", f"{name}.png"), portfolios.to_dict(orient="index")
+
+
+def _render_backtest(
+        restrictions: Optional[dict[str, str]],
+        name: str,
+        prices: pd.DataFrame,
+        lots: pd.DataFrame,
+        weights: pd.Series,
+        rebalance: str,
+) -> str:
+    navs = Backtester.backtest_prices(prices, lots, weights, rebalance)
+    Viewer.plot_backtest(restrictions, name, navs)
+    return os.path.join("graphs", f"{name}.png")
+
+
+class HTTPError(Exception):
+    """
+    Raised by a handler to answer with an error status.
+
+    Parameters
+    ----------
+    status: http.HTTPStatus
+        The status of the response.
+    message: str
+        Explanation sent to the client.
+
+    Attributes
+    ----------
+    status: http.HTTPStatus
+        Stored from the constructor.
+    """
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class PortfolioServer:
+    """
+    Local asyncio HTTP/JSON service exposing the ADD/SELL/DELETE/SHOW/GRAPH
+    and PORTFOLIO operations of the Controller. Clients manage named
+    portfolios (books) side by side, held by the models.PortfolioManager
+    of the Controller, and share one market data cache. Every route
+    below also exists under /portfolios/{name}, acting on that book;
+    without the prefix it acts on the book "Default". Market data is
+    retrieved in threads, with
+    concurrent identical requests coalesced by the cache, simulations
+    and rendering run in a process pool, and portfolio mutations are
+    serialised by a lock. Live quotes of all holdings are refreshed in
+    the background on the same event loop.
+
+    Routes
+    ------
+    GET    /portfolios                PORTFOLIO, the books and their
+                                      current value
+    POST   /portfolios                PORTFOLIO, creates a book, body:
+                                      name
+    DELETE /portfolios/{name}         deletes a book
+    GET    /books?by=                 SHOW Books, revalues all books
+    GET    /portfolio                 SHOW Summary
+    GET    /weights?asset_class=&sector=
+                                      SHOW Weights
+    POST   /assets                    ADD, body: ticker, asset_class,
+                                      sector, quantity, purchase_price,
+                                      purchase_date
+    POST   /sales                     SELL, body: ticker, quantity,
+                                      price, method, date, or trades
+                                      (a list of those with a side)
+                                      and method
+    GET    /pnl?asset_class=&sector=  SHOW P&L
+    GET    /returns?asset_class=&sector=&by=
+                                      SHOW Returns
+    DELETE /assets/{ticker}           DELETE
+    POST   /graphs                    GRAPH, body: type, name, start,
+                                      end, assets, asset_class, sector,
+                                      interval, resample, n, years (a list for several
+                                      horizons), engine, block_size,
+                                      step, seed, constraints,
+                                      risk_free, rebalance, export
+    POST   /stress                    SHOW Stress, body: asset_class,
+                                      sector, by, scenarios,
+                                      historical, window, start, end,
+                                      top
+
+    Parameters
+    ----------
+    provider: Optional[models.MarketData.MarketDataProvider]
+        Source of market data, wrapped in a shared cache.
+        Defaults to the application wide provider.
+    workers: Optional[int]
+        Size of the process pool, defaults to the number of CPUs.
+
+    Attributes
+    ----------
+    controller: controllers.Controller
+        Holds the books and the valid categories.
+    portfolio: models.Portfolio
+        The book "Default", of the routes without a book name.
+    workers: Optional[int]
+        Stored from the constructor.
+    """
+    MAX_BODY = 1024 * 1024
+
+    def __init__(
+            self,
+            provider: Optional[MarketDataProvider]=None,
+            workers: Optional[int]=None,
+    ):
+        provider = provider if provider is not None else get_provider()
+        if not isinstance(provider, CachedProvider):
+            provider = CachedProvider(provider)
+        self.controller = Controller(provider)
+        self.portfolio = self.controller.portfolio
+        self.workers = workers
+        self._lock = asyncio.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    async def serve(self, host: str="127.0.0.1", port: int=8000) -> None:
+        """
+        Runs the service until cancelled.
+
+        Parameters
+        ----------
+        host: str
+            Interface to listen on.
+        port: int
+            Port to listen on.
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Prints to the terminal.
+        """
+        # spawn, because forking a process with running threads is unsafe.
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        print(f"Serving the Portfolio Tracker on http://{host}:{port}")
+        if config.QUOTE_REFRESH_SECONDS > 0:
+            self.controller.refresher.start()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.controller.refresher.stop()
+            self._pool.shutdown(cancel_futures=True)
+
+    async def _handle_connection(
+            self,
+            reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter,
+    ) -> None:
+        """
+        Answers HTTP/1.1 requests on one connection until the client
+        closes it (keep-alive).
+
+        Parameters
+        ----------
+        reader: asyncio.StreamReader
+            Incoming side of the connection.
+        writer: asyncio.StreamWriter
+            Outgoing side of the connection.
+
+        Returns
+        -------
+        None
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > self.MAX_BODY:
+                    status, payload = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Body too large"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = await self._dispatch(method.upper(), target, body)
+                    keep_alive = headers.get("connection", "").lower() != "close"
+
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+                    + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> tuple[HTTPStatus, Any]:
+        """
+        Routes a request to its handler and converts errors to
+        a status and a JSON message.
+
+        Parameters
+        ----------
+        method: str
+            HTTP method.
+        target: str
+            Path and query of the request.
+        body: bytes
+            Raw request body, JSON if present.
+
+        Returns
+        -------
+        tuple[http.HTTPStatus, Any]
+            Status and JSON serialisable payload.
+        """
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.split("/") if part]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise ValueError("Body must be a JSON object")
+
+            if parts == ["portfolios"] and method == "GET":
+                return HTTPStatus.OK, await self.list_books()
+            if parts == ["portfolios"] and method == "POST":
+                return HTTPStatus.CREATED, await self.create_book(data)
+            if len(parts) == 2 and parts[0] == "portfolios" and method == "DELETE":
+                return HTTPStatus.OK, await self.delete_book(parts[1])
+            if parts == ["books"] and method == "GET":
+                return HTTPStatus.OK, await self.show_books(query)
+
+            book = None
+            if len(parts) > 2 and parts[0] == "portfolios":
+                book, parts = parts[1], parts[2:]
+            if parts == ["portfolio"] and method == "GET":
+                return HTTPStatus.OK, await self.show_summary(book)
+            if parts == ["weights"] and method == "GET":
+                return HTTPStatus.OK, await self.show_weights(query, book)
+            if parts == ["assets"] and method == "POST":
+                return HTTPStatus.CREATED, await self.add(data, book)
+            if parts == ["sales"] and method == "POST":
+                return HTTPStatus.CREATED, await self.sell(data, book)
+            if parts == ["pnl"] and method == "GET":
+                return HTTPStatus.OK, await self.show_pnl(query, book)
+            if parts == ["returns"] and method == "GET":
+                return HTTPStatus.OK, await self.show_returns(query, book)
+            if len(parts) == 2 and parts[0] == "assets" and method == "DELETE":
+                return HTTPStatus.OK, await self.delete(parts[1], book)
+            if parts == ["graphs"] and method == "POST":
+                return HTTPStatus.CREATED, await self.graph(data, book)
+            if parts == ["stress"] and method == "POST":
+                return HTTPStatus.OK, await self.stress(data, book)
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {method} {url.path}")
+
+        except HTTPError as e:
+            return e.status, {"error": str(e)}
+        except (ValueError, TypeError, KeyError) as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+
+    def _book(self, name: Optional[str]) -> Portfolio:
+        """
+        Resolves a book of the manager by name.
+
+        Parameters
+        ----------
+        name: Optional[str]
+            Name of the book, None for the book "Default".
+
+        Returns
+        -------
+        models.Portfolio
+            The book.
+
+        Raises
+        ------
+        HTTPError
+            If the book does not exist (404).
+        """
+        manager = self.controller.manager
+        with manager.lock:
+            if name is None:
+                return self.portfolio
+            if name not in manager.portfolios:
+                raise HTTPError(
+                    HTTPStatus.NOT_FOUND,
+                    f"Portfolio {name} not found, options: {sorted(manager.portfolios)}",
+                )
+            return manager.portfolios[name]
+
+    async def _snapshot(self, book: Optional[str]=None) -> Portfolio:
+        """
+        A consistent copy of a book, safe to read in a thread while
+        other requests mutate the shared books.
+
+        Parameters
+        ----------
+        book: Optional[str]
+            Name of the book, None for the book "Default".
+
+        Returns
+        -------
+        models.Portfolio
+            Copy of the book, with copies of its assets.
+        """
+        async with self._lock:
+            portfolio = self._book(book)
+            snapshot = Portfolio(portfolio.provider)
+            with self.controller.manager.lock:
+                snapshot.assets = {ticker: asset.copy() for ticker, asset in portfolio.assets.items()}
+                snapshot.sales = list(portfolio.sales)
+                snapshot.closed = list(portfolio.closed)
+        return snapshot
+
+    def _locked(self, function: Callable[..., Any], *args: Any) -> Any:
+        """
+        Calls a function that changes a book, holding the lock
+        the quote refresher takes to revalue it. Requests are ordered
+        by self._lock already.
+
+        Parameters
+        ----------
+        function: Callable[..., Any]
+            The function to call.
+        *args: Any
+            Its arguments.
+
+        Returns
+        -------
+        Any
+            The result of the function.
+        """
+        with self.controller.manager.lock:
+            return function(*args)
+
+    def _export(self, data: dict[str, Any], paths: bool) -> Optional[dict[str, Any]]:
+        """
+        Validates the export of a graph request, mirroring
+        Controller.retrieve_export.
+
+        Parameters
+        ----------
+        data: dict[str, Any]
+            May contain "export" with "folder", "format" (Arrow or
+            Parquet) and "paths" (Npy, Arrow or Parquet).
+        paths: bool
+            If the simulated paths can be exported.
+
+        Returns
+        -------
+        Optional[dict[str, Any]]
+            The folder, format and paths format, None for no export.
+        """
+        export = data.get("export")
+        if export is None:
+            return None
+        if not isinstance(export, dict) or not export.get("folder"):
+            raise ValueError("export must contain a folder")
+        table_format = str(export.get("format", "Arrow")).capitalize()
+        if table_format not in {"Arrow", "Parquet"}:
+            raise ValueError("Invalid export format, choose one of Arrow, Parquet")
+        paths_format = export.get("paths")
+        if paths_format is not None:
+            paths_format = str(paths_format).capitalize()
+            if not paths:
+                raise ValueError("Only Monte Carlo graphs have paths to export")
+            if paths_format not in Viewer.EXPORT_EXTENSIONS:
+                raise ValueError(f"Invalid paths format, choose one of {set(Viewer.EXPORT_EXTENSIONS)}")
+        return {"folder": str(export["folder"]), "format": table_format, "paths": paths_format}
+
+    @staticmethod
+    def _bars(data: dict[str, Any]) -> dict[str, Optional[str]]:
+        """
+        Validates the intraday bars of a graph request, mirroring
+        Controller.retrieve_bars.
+
+        Parameters
+        ----------
+        data: dict[str, Any]
+            May contain "interval" (1m, 5m or 1h) and "resample" (a
+            pandas frequency).
+
+        Returns
+        -------
+        dict[str, Optional[str]]
+            The interval and rule, None for daily closes.
+        """
+        interval, rule = data.get("interval"), data.get("resample")
+        if interval is None:
+            if rule is not None:
+                raise ValueError("resample requires an interval")
+            return {"interval": None, "rule": None}
+        if interval not in BarStore.INTERVALS:
+            raise ValueError(f"Invalid interval, choose one of {set(BarStore.INTERVALS)}")
+        if rule is not None:
+            rule = str(rule)
+            pd.tseries.frequencies.to_offset(rule)
+        return {"interval": interval, "rule": rule}
+
+    def _restrictions(self, data: dict[str, Any]) -> Optional[dict[str, str]]:
+        """
+        Validates the asset class and sector of a request,
+        mirroring Controller.retrieve_restrictions.
+
+        Parameters
+        ----------
+        data: dict[str, Any]
+            The request, may contain "asset_class" and "sector".
+
+        Returns
+        -------
+        Optional[dict[str, str]]
+            The restrictions, None for the whole portfolio.
+        """
+        asset_class = str(data.get("asset_class", "All")).strip().title()
+        sector = str(data.get("sector", "All")).strip().title()
+        if asset_class not in self.controller.asset_classes:
+            raise ValueError(f"Invalid Asset Class, choose one of {self.controller.asset_classes}")
+        if sector not in self.controller.sectors:
+            raise ValueError(f"Invalid Sector, choose one of {self.controller.sectors}")
+
+        restrictions = {}
+        if asset_class != "All":
+            restrictions["asset_class"] = asset_class
+        if sector != "All":
+            restrictions["sector"] = sector
+        return restrictions or None
+
+    async def list_books(self) -> list[dict[str, Any]]:
+        """
+        PORTFOLIO, lists the books.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        list[dict[str, Any]]
+            Name, number of assets and current value (base currency)
+            per book.
+        """
+        manager = self.controller.manager
+        with manager.lock:
+            return [
+                {
+                    "name": name,
+                    "assets": len(portfolio.assets),
+                    "current_value": float(sum(asset.current_value for asset in portfolio.assets.values())),
+                }
+                for name, portfolio in manager.portfolios.items()
+            ]
+
+    async def create_book(self, data: dict[str, Any]) -> dict[str, Any]:
+        """
+        PORTFOLIO, creates an empty book.
+
+        Parameters
+        ----------
+        data: dict[str, Any]
+            name of the book.
+
+        Returns
+        -------
+        dict[str, Any]
+            The name of the book.
+        """
+        name = str(data["name"]).strip()
+        if not name or "/" in name:
+            raise ValueError("Invalid portfolio name")
+        manager = self.controller.manager
+        async with self._lock:
+            with manager.lock:
+                if name in manager.portfolios:
+                    raise HTTPError(HTTPStatus.CONFLICT, f"Portfolio {name} already exists")
+                manager.get_or_create(name)
+        return {"portfolio": name}
+
+    async def delete_book(self, name: str) -> dict[str, Any]:
+        """
+        Deletes a book, except the book "Default".
+
+        Parameters
+        ----------
+        name: str
+            Name of the book.
+
+        Returns
+        -------
+        dict[str, Any]
+            The deleted book.
+        """
+        manager = self.controller.manager
+        async with self._lock:
+            if self._book(name) is self.portfolio:
+                raise ValueError(f"The portfolio {name} cannot be deleted")
+            with manager.lock:
+                del manager.portfolios[name]
+        return {"deleted": name}
+
+    async def show_books(self, data: dict[str, Any]) -> dict[str, Any]:
+        """
+        SHOW Books, revalues all books with one quote request.
+
+        Parameters
+        ----------
+        data: dict[str, Any]
+            May contain "by" (asset_class, sector or ticker).
+
+        Returns
+        -------
+        dict[str, Any]
+            Base currency, the current value per book and its
+            breakdown per group, see
+            models.PortfolioManager.aggregate_exposure.
+        """
+        by = str(data.get("by", "asset_class"))
+        if by not in {"asset_class", "sector", "ticker"}:
+            raise ValueError(f"Invalid grouping {by}, choose one of asset_class, sector, ticker")
+        manager = self.controller.manager
+        values = await asyncio.to_thread(manager.revalue_all)
+        exposure = await asyncio.to_thread(self._locked, manager.aggregate_exposure, by)
+        exposure["Total"] = exposure.sum(axis=1)
+        return {
+            "currency": config.BASE_CURRENCY,
+            "values": {name: float(value) for name, value in values.items()},
+            "exposure": exposure.to_dict(orient="index"),
+        }
+
+    async def show_summary(self, book: Optional[str]=None) -> list[dict[str, Any]]:
+        """
+        SHOW Summary.
+
+        Parameters
+        ----------
+        book: Optional[str]
+            Name of the book, None for the book "Default".
+
+        Returns
+        -------
+        list[dict[str, Any]]
+            One record per asset, columns as in Viewer.display_summary.
+        """
+        snapshot = await self._snapshot(book)
+        return [
+            {
+                "ticker": asset.ticker,
+                "name": asset.name,
+                "sector": asset.sector,
+                "asset_class": asset.asset_class,
+                "currency": asset.currency,
+                "quantity": list(asset.quantity),
+                "purchase_price": list(asset.purchase_price),
+                "purchase_date": list(asset.purchase_date),
+                "transaction_value": float(asset.transaction_value),
+                "current_value": float(asset.current_value),
+            }
+            for asset in snapshot.assets.values()
+        ]
+
+    async def show_weights(self, data: dict[str, Any], book: Optional[str]=None) -> dict[str, Any]:
+        """
+        SHOW Weights.
+
+        Parameters
+        ----------
+        data: dict[str, Any]
+            May contain "asset_class" and "sector".
+        book: Optional[str]
+            Name of the book, None for the book "Default".
+
+        Returns
+        -------
+        dict[str, Any]
+            Weights of the filtered portfolio and its weight
+            w.r.t. the total portfolio.
+        """
+        restrictions = self._restrictions(data)
+        snapshot = await self._snapshot(book)
+        weights, class_sector_value, total = snapshot.get_portfolio_weights(restrictions)
+        return {
+            "weights": {ticker: float(weight) for ticker, weight in weights.items()},
+            "weight_of_total": float(class_sector_value / total) if total else 0.0,
+        }
+
+    async def add(self, data: dict[str, Any], book: Optional[str]=None) -> dict[str, Any]:
+        """
+        ADD, buys more of an asset if it is already present.
+
+        Parameters
+        ----------
+        data: dict[str, Any]
+            ticker, asset_class, sector, quantity, purchase_price and
+            optionally purchase_date (YYYY-MM-DD, defaults to today).
+        book: Optional[str]
+            Name of the book, None for the book "Default".
+
+        Returns
+        -------
+        dict[str, Any]
+            Ticker and quantity added.
+        """
+        ticker = str(data["ticker"]).strip()
+        asset_class = str(data["asset_class"]).strip().title()
+        sector = str(data["sector"]).strip().title()
+        quantity = int(data["quantity"])
+        purchase_price = float(data["purchase_price"])
+        purchase_date = data.get("purchase_date")
+        if purchase_date is not None:
+            purchase_date = str(dt.strptime(str(purchase_date), "%Y-%m-%d").date())
+        if asset_class not in self.controller.asset_classes:
+            raise ValueError(f"Invalid Asset Class, choose one of {self.controller.asset_classes}")
+        if sector not in self.controller.sectors:
+            raise ValueError(f"Invalid Sector, choose one of {self.controller.sectors}")
+        portfolio = self._book(book)
+        provider = portfolio.provider
+        try:
+            _ = int(await asyncio.to_thread(provider.last_price, ticker))
+        except Exception:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"{ticker} does not exist in the market data API")
+
+        # Building the Asset retrieves data, so it is done before taking the lock.
+        new_asset = None
+        if not portfolio.check_if_present(ticker):
+            new_asset = await asyncio.to_thread(
+                Asset, ticker, sector, asset_class, quantity, purchase_price, provider, purchase_date,
+            )
+        async with self._lock:
+            portfolio = self._book(book)
+            if portfolio.check_if_present(ticker):
+                await asyncio.to_thread(
+                    self._locked, portfolio.assets[ticker].buy, quantity, purchase_price, purchase_date,
+                )
+            else:
+                if new_asset is None:
+                    # Deleted by another request in the meantime.
+                    new_asset = await asyncio.to_thread(
+                        Asset, ticker, sector, asset_class, quantity, purchase_price, provider, purchase_date,
+                    )
+                self._locked(portfolio.add_new_asset, new_asset)
+        return {"ticker": ticker, "quantity": quantity}
+
+    async def sell(self, data: dict[str, Any], book: Optional[str]=None) -> dict[str, Any]:
+        """
+        SELL, a single sale or a batch of trades.
+
+        Parameters
+        ----------
+        data: dict[str, Any]
+            ticker, quantity, price and optionally method (FIFO, LIFO
+            or Average, default FIFO) and date (YYYY-MM-DD, defaults to
+            today). Or "trades", a list of ticker, side (BUY or SELL),
+            quantity, price and optionally date, applied in order, and
+            optionally method.
+        book: Optional[str]
+            Name of the book, None for the book "Default".
+
+        Returns
+        -------
+        dict[str, Any]
+            Realised profit in the currency of the asset, per trade
+            for a batch.
+        """
+        method = {m.upper(): m for m in LotQueue.METHODS}.get(str(data.get("method", "FIFO")).upper())
+        if method is None:
+            raise ValueError(f"Invalid method, choose one of {LotQueue.METHODS}")
+        if "trades" in data:
+            trades = pd.DataFrame(data["trades"])
+            if trades.empty:
+                raise ValueError("No trades")
+            missing = {"ticker", "side", "quantity", "price"} - set(trades.columns)
+            if missing:
+                raise ValueError(f"Trades are missing {sorted(missing)}")
+            if "date" in trades:
+                trades["date"] = pd.to_datetime(trades["date"], format="%Y-%m-%d").dt.strftime("%Y-%m-%d")
+            async with self._lock:
+                portfolio = self._book(book)
+                realised = await asyncio.to_thread(self._locked, portfolio.process_trades, trades, method)
+            return {"trades": len(trades), "realised": realised.tolist()}
+
+        ticker = str(data["ticker"]).strip()
+        quantity = float(data["quantity"])
+        price = float(data["price"])
+        sale_date = data.get("date")
+        if sale_date is not None:
+            sale_date = str(dt.strptime(str(sale_date), "%Y-%m-%d").date())
+        async with self._lock:
+            portfolio = self._book(book)
+            if not portfolio.check_if_present(ticker):
+                raise HTTPError(
+                    HTTPStatus.NOT_FOUND,
+                    f"Ticker not in portfolio, options: {sorted(portfolio.assets)}",
+                )
+            realised = self._locked(portfolio.sell, ticker, quantity, price, method, sale_date)
+        return {"ticker": ticker, "quantity": quantity, "realised": realised}
+
+    async def show_pnl(self, data: dict[str, Any], book: Optional[str]=None) -> dict[str, Any]:
+        """
+        SHOW P&L.
+
+        Parameters
+        ----------
+        data: dict[str, Any]
+            May contain "asset_class" and "sector".
+        book: Optional[str]
+            Name of the book, None for the book "Default".
+
+        Returns
+        -------
+        dict[str, Any]
+            Base currency and the realised and unrealised profit per
+            ticker, see models.Portfolio.pnl.
+        """
+        restrictions = self._restrictions(data)
+        snapshot = await self._snapshot(book)
+        table = await asyncio.to_thread(snapshot.pnl, restrictions)
+        return {"currency": config.BASE_CURRENCY, "pnl": table.to_dict(orient="index")}
+
+    async def show_returns(self, data: dict[str, Any], book: Optional[str]=None) -> dict[str, Any]:
+        """
+        SHOW Returns.
+
+        Parameters
+        ----------
+        data: dict[str, Any]
+            May contain "asset_class", "sector" and "by" (asset_class,
+            sector or ticker).
+        book: Optional[str]
+            Name of the book, None for the book "Default".
+
+        Returns
+        -------
+        dict[str, Any]
+            Base currency and the returns per group and in total,
+            see models.ReturnCalculator.run.
+        """
+        restrictions = self._restrictions(data)
+        by = str(data.get("by", "asset_class"))
+        snapshot = await self._snapshot(book)
+        table = await asyncio.to_thread(ReturnCalculator(snapshot).run, restrictions, by)
+        table = table.astype(object).where(table.notna(), None)
+        return {"currency": config.BASE_CURRENCY, "returns": table.to_dict(orient="index")}
+
+    async def stress(self, data: dict[str, Any], book: Optional[str]=None) -> dict[str, Any]:
+        """
+        SHOW Stress.
+
+        Parameters
+        ----------
+        data: dict[str, Any]
+            May contain "asset_class", "sector", "by" (asset_class,
+            sector or ticker), "scenarios" (shocks per scenario, see
+            models.StressTester.shock_matrix, replaces the library),
+            "historical" (replay past periods, default true),
+            "window" with "start" and "end" (rolling replays) and
+            "top" (number of scenarios returned, worst first).
+        book: Optional[str]
+            Name of the book, None for the book "Default".
+
+        Returns
+        -------
+        dict[str, Any]
+            Number of scenarios and the P&L of the worst ones.
+        """
+        restrictions = self._restrictions(data)
+        by = str(data.get("by", "asset_class"))
+        scenarios = data.get("scenarios")
+        if scenarios is not None:
+            if not isinstance(scenarios, dict):
+                raise ValueError("scenarios must map a name to shocks per level")
+            scenarios = {
+                str(name): {
+                    str(level): {str(group): float(shock) for group, shock in groups.items()}
+                    for level, groups in shocks.items()
+                }
+                for name, shocks in scenarios.items()
+            }
+        window = data.get("window")
+        window = int(window) if window is not None else None
+        date1 = str(data.get("start", "2000-01-01"))
+        dt.strptime(date1, "%Y-%m-%d")
+        date2 = data.get("end")
+        if date2 is not None:
+            dt.strptime(date2, "%Y-%m-%d")
+        top = int(data.get("top", 20))
+        if top < 1:
+            raise ValueError("top must be a positive integer")
+
+        tester = StressTester(await self._snapshot(book))
+        results = await asyncio.to_thread(
+            tester.run, restrictions, scenarios, by, bool(data.get("historical", True)),
+            window, date1, date2,
+        )
+        return {
+            "count": len(results),
+            "scenarios": results.nsmallest(top, "Total").to_dict(orient="index"),
+        }
+
+    async def delete(self, ticker: str, book: Optional[str]=None) -> dict[str, Any]:
+        """
+        DELETE.
+
+        Parameters
+        ----------
+        ticker: str
+            Ticker to delete entirely.
+        book: Optional[str]
+            Name of the book, None for the book "Default".
+
+        Returns
+        -------
+        dict[str, Any]
+            The deleted ticker.
+        """
+        async with self._lock:
+            portfolio = self._book(book)
+            if not portfolio.check_if_present(ticker):
+                raise HTTPError(
+                    HTTPStatus.NOT_FOUND,
+                    f"Ticker not in portfolio, options: {sorted(portfolio.assets)}",
+                )
+            self._locked(portfolio.remove_asset, ticker)
+        return {"deleted": ticker}
+
+    async def graph(self, data: dict[str, Any], book: Optional[str]=None) -> dict[str, Any]:
+        """
+        GRAPH. Market data is retrieved in a thread, the simulation
+        and rendering run in the process pool.
+
+        Parameters
+        ----------
+        data: dict[str, Any]
+            type (Individual Assets/Portfolio/Monte Carlo/Efficient
+            Frontier/Backtest), name, start, end and the options of
+            the type.
+        book: Optional[str]
+            Name of the book, None for the book "Default".
+
+        Returns
+        -------
+        dict[str, Any]
+            Path of the written graph, and for an Efficient Frontier
+            the statistics and weights of the optimized portfolios.
+        """
+        graph_type = str(data.get("type", "")).strip().title()
+        name = str(data["name"])
+        if not name or os.path.basename(name) != name or name in {".", ".."}:
+            raise ValueError("Invalid graph name")
+        date1 = str(data["start"])
+        dt.strptime(date1, "%Y-%m-%d")
+        date2 = data.get("end")
+        if date2 is not None:
+            dt.strptime(date2, "%Y-%m-%d")
+
+        loop = asyncio.get_running_loop()
+        if graph_type == "Individual Assets":
+            assets = [str(asset).strip() for asset in data["assets"]]
+            if not assets:
+                raise ValueError("Provide at least one ticker")
+            bars = self._bars(data)
+            if bars["interval"] is None:
+                marketData = await asyncio.to_thread(
+                    self.portfolio.provider.download_close, assets, date1, date2,
+                )
+            else:
+                marketData = await asyncio.to_thread(
+                    BarStore(self.portfolio.provider).bars, assets, date1, date2, bars["interval"], bars["rule"],
+                )
+            path = await loop.run_in_executor(
+                self._pool, _render_individual_assets, name, assets, marketData,
+            )
+
+        elif graph_type in {"Portfolio", "Monte Carlo"}:
+            restrictions = self._restrictions(data)
+            snapshot = await self._snapshot(book)
+            export = self._export(data, paths=graph_type == "Monte Carlo")
+            if graph_type == "Portfolio":
+                bars = self._bars(data)
+                portfolio_p = await asyncio.to_thread(
+                    snapshot.get_portfolio_prices, restrictions, date1, date2, bars["interval"], bars["rule"],
+                )
+                path = await loop.run_in_executor(
+                    self._pool, _render_portfolio, restrictions, name, portfolio_p, export,
+                )
+            else:
+                n = int(data.get("n", 10000))
+                years = data.get("years", 15)
+                years = [float(y) for y in years] if isinstance(years, list) else [float(years)]
+                if not 1 <= n <= 100000:
+                    raise ValueError("Maximum allowed is 100000 and a Minimum of 1")
+                if not years or any(y * 12 % 1 != 0 or not 0 < y <= 100 for y in years):
+                    raise ValueError("years * 12 must be a positive integer, at most 1200")
+                engine = str(data.get("engine", "GBM"))
+                if engine not in MonteCarlo.ENGINES:
+                    raise ValueError(f"Invalid engine, choose one of {MonteCarlo.ENGINES}")
+                block_size = int(data.get("block_size", 6))
+                step = str(data.get("step", "Monthly")).capitalize()
+                if step not in MonteCarlo.STEPS:
+                    raise ValueError(f"Invalid step, choose one of {set(MonteCarlo.STEPS)}")
+                seed = data.get("seed")
+                params = dict(
+                    n=n,
+                    months=int(12*max(years)),
+                    engine=engine,
+                    block_size=block_size,
+                    step=step,
+                    seed=None if seed is None else int(seed),
+                )
+                if len(years) > 1:
+                    params["horizons"] = sorted({int(12*y) for y in years})
+
+                key = None
+                if config.SIMULATION_CACHE_DIR:
+                    key = SimulationCache.key(
+                        snapshot, restrictions, startDate=date1, endDate=date2, **params,
+                    )
+                # A memoized simulation needs no market data, the worker only renders it.
+                portfolio_p = None
+                simulate = key is None or not SimulationCache().contains(key)
+                # Full paths are only memoized with config.SIMULATION_CACHE_PATHS.
+                if export is not None and export["paths"] is not None:
+                    simulate = simulate or not config.SIMULATION_CACHE_PATHS
+                if simulate:
+                    portfolio_p = await asyncio.to_thread(
+                        snapshot.get_portfolio_prices, restrictions, date1, date2,
+                    )
+                path, horizons = await loop.run_in_executor(
+                    self._pool, _render_monte_carlo, restrictions, name, key, portfolio_p, params, export,
+                )
+                if horizons is not None:
+                    return {"graph": path, "horizons": horizons}
+        elif graph_type == "Efficient Frontier":
+            restrictions = self._restrictions(data)
+            n = int(data.get("n", 100000))
+            if not 1 <= n <= 1000000:
+                raise ValueError("Maximum allowed is 1000000 and a Minimum of 1")
+            constraints = {}
+            for kind, valid in [
+                ("asset_class", self.controller.asset_classes),
+                ("sector", self.controller.sectors),
+            ]:
+                for group, (low, high) in dict(data.get("constraints", {}).get(kind, {})).items():
+                    if group not in valid - {"All"}:
+                        raise ValueError(f"Invalid constraint {group}, choose one of {valid - {'All'}}")
+                    constraints.setdefault(kind, {})[group] = (float(low), float(high))
+            seed = data.get("seed")
+            params = dict(
+                n=n,
+                constraints=constraints or None,
+                risk_free=float(data.get("risk_free", 0.0)),
+                seed=None if seed is None else int(seed),
+            )
+
+            optimizer = Optimizer(await self._snapshot(book))
+            returns = await asyncio.to_thread(
+                optimizer.asset_returns, restrictions, date1, date2,
+            )
+            current, _, _ = optimizer.portfolio.get_portfolio_weights(restrictions)
+            groups = optimizer.asset_groups(list(returns.columns))
+            path, portfolios = await loop.run_in_executor(
+                self._pool, _render_frontier, restrictions, name, returns, pd.Series(current), groups, params,
+            )
+            return {"graph": path, "portfolios": portfolios}
+        elif graph_type == "Backtest":
+            restrictions = self._restrictions(data)
+            rebalance = str(data.get("rebalance", "Monthly")).capitalize()
+            if rebalance not in Backtester.FREQUENCIES:
+                raise ValueError(f"Invalid rebalance, choose one of {set(Backtester.FREQUENCIES)}")
+            backtester = Backtester(await self._snapshot(book))
+            prices, lots, weights = await asyncio.to_thread(backtester.inputs, restrictions, date1, date2)
+            path = await loop.run_in_executor(
+                self._pool, _render_backtest, restrictions, name, prices, lots, weights, rebalance,
+            )
+        else:
+            raise ValueError(
+                "Invalid type, choose one of Individual Assets/Portfolio/Monte Carlo/Efficient Frontier/Backtest",
+            )
+        return {"graph": path}
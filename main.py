@@ -1,20 +1,50 @@
 from controllers.controller import Controller
+import argparse
+import asyncio
+import config
+import logging
+import os
 import warnings
 
 def main():
     """
     Entry point for the CLI Portfolio Tracker.
-    Initializes MVC components and runs the command loop.
+    Initializes MVC components and runs the command loop,
+    or runs the HTTP/JSON service when started with --serve.
     """
     warnings.filterwarnings("ignore", category=FutureWarning)
 
+    parser = argparse.ArgumentParser(description="a.s.r. Portfolio Tracker")
+    parser.add_argument("--serve", action="store_true", help="Run the HTTP/JSON service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None, help="Size of the worker pool.")
+    args = parser.parse_args()
+
+    if args.serve:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+        from controllers.server import PortfolioServer
+        try:
+            asyncio.run(PortfolioServer(workers=args.workers).serve(args.host, args.port))
+        except KeyboardInterrupt:
+            print("\nGoodbye!")
+        return
+
+    os.makedirs(os.path.dirname(config.LOG_FILE) or ".", exist_ok=True)
+    logging.basicConfig(
+        filename=config.LOG_FILE,
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
     controller = Controller()
+    if config.QUOTE_REFRESH_SECONDS > 0:
+        controller.refresher.start_in_thread()
     print("a.s.r. Portfolio Tracker")
     print("View the README for instructions. C^ (CTRL + C) at any point to quit.")
 
     while True:
         try:
-            command = input("\nProvide a Command (ADD/DELETE/SHOW/GRAPH): ")
+            command = input("\nProvide a Command (ADD/SELL/DELETE/SHOW/GRAPH/PORTFOLIO): ")
             if not command:
                 continue
             if command.lower() in {"exit", "quit"}:
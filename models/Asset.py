@@ -1,4 +1,9 @@
-import yfinance as yf
+from models.FX import get_converter
+from models.LotQueue import LotQueue
+from models.MarketData import MarketDataProvider, get_provider
+from datetime import date
+from typing import Optional
+import copy
 
 
 class Asset:
@@ -18,25 +23,48 @@ class Asset:
         The quantity of the asset to hold.
     purchase_price: float
         The purchase price of the asset.
+    provider: Optional[models.MarketData.MarketDataProvider]
+        Source of market data, defaults to the application wide provider.
+    purchase_date: Optional[str]
+        Date of the purchase (YYYY-MM-DD), defaults to today.
 
     Attributes:
     -----------
     ticker: str
         Stored from the constructor.
+    provider: models.MarketData.MarketDataProvider
+        Stored from the constructor.
     name: str
         Full name of the asset retrieved from yahoo finance API.
+    currency: str
+        Currency the asset is quoted in, retrieved through the shared
+        models.FX converter, which remembers it for all conversions.
+        Purchase prices are in this currency.
     sector: str
         Stored from the constructor.
     asset_class: str
         Stored from the constructor.
+    lots: models.LotQueue
+        The open lots, starting with the quantity, purchase price and
+        purchase date from the constructor. Purchases and sales update
+        it in place.
     quantity: list[int]
-        Transformed the quantity from the constructor to a list.
+        Quantity per open lot, read from self.lots.
     purchase_price: list[float]
-        Transformed the purchase price from the constructor to a list.
+        Purchase price per open lot, read from self.lots.
+    purchase_date: list[str]
+        Purchase date per open lot, read from self.lots.
+    held: float
+        Total quantity of the open lots, read from self.lots.
+    purchases: list[tuple[str, float, float]]
+        Date, quantity and price of every purchase, also of the lots
+        that have been sold since.
     current_value: float
-        Current value of holdings in the asset.
+        Current value of holdings in the asset, in the base currency
+        (config.BASE_CURRENCY).
     transaction_value: float
-        The value of all transactions combined.
+        The purchase value of the open lots, in the currency of the
+        asset, read from self.lots.
     """
     def __init__(
             self,
@@ -45,21 +73,102 @@ class Asset:
             asset_class: str,
             quantity: int,
             purchase_price: float,
+            provider: Optional[MarketDataProvider]=None,
+            purchase_date: Optional[str]=None,
     ):
         self.ticker = ticker
-        self.name = yf.Ticker(self.ticker).info.get(
-            "longName",
-            f"No long name found for {self.ticker}",
-        )
+        self.provider = provider if provider is not None else get_provider()
+        self.name = self.provider.long_name(self.ticker)
+        self.currency = get_converter(self.provider).currencies([self.ticker]).iloc[0]
         self.sector = sector
         self.asset_class = asset_class
-        self.quantity = [quantity]
-        self.purchase_price = [purchase_price]
+        purchase_date = purchase_date or str(date.today())
+        self.lots = LotQueue([quantity], [purchase_price], [purchase_date])
+        self.purchases = [(purchase_date, quantity, purchase_price)]
         # This suffices. We use daily data, so constant updating not required.
         self.current_value = self.calculate_current_value()
-        self.transaction_value = quantity*purchase_price
 
-    def buy(self, quantity: int, price: float) -> None:
+    @property
+    def quantity(self) -> list[float]:
+        """
+        Quantity per open lot, as int if they are all whole.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        list[float]
+            The quantities, in purchase order.
+        """
+        return self.lots.lots()[0]
+
+    @property
+    def purchase_price(self) -> list[float]:
+        """
+        Purchase price per open lot.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        list[float]
+            The purchase prices, in purchase order.
+        """
+        return self.lots.lots()[1]
+
+    @property
+    def purchase_date(self) -> list[str]:
+        """
+        Purchase date per open lot.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        list[str]
+            The purchase dates, in purchase order.
+        """
+        return self.lots.lots()[2]
+
+    @property
+    def held(self) -> float:
+        """
+        Total quantity of the open lots, without listing them.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        float
+            The quantity held.
+        """
+        return self.lots.quantity
+
+    @property
+    def transaction_value(self) -> float:
+        """
+        Purchase value of the open lots, without listing them.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        float
+            The purchase value, in the currency of the asset.
+        """
+        return self.lots.cost
+
+    def buy(self, quantity: int, price: float, purchase_date: Optional[str]=None) -> None:
         """
         Add a quantity and purchase price to the asset.
         This allows for buying more of the same asset 
@@ -71,6 +180,8 @@ class Asset:
             Quantity to add to the asset.
         price: float
             Purchase price to add to the asset.
+        purchase_date: Optional[str]
+            Date of the purchase (YYYY-MM-DD), defaults to today.
         
         Returns
         -------
@@ -78,17 +189,91 @@ class Asset:
 
         Notes
         -----
-        Asjusts self.quantity, self.purchase_price, .
+        Asjusts self.lots, self.purchases and self.current_value.
         """
-        self.quantity.append(quantity)
-        self.purchase_price.append(price)
-        self.transaction_value += quantity*price
-        self.current_value += quantity*self.last_price()
+        purchase_date = purchase_date or str(date.today())
+        self.lots.buy(quantity, price, purchase_date)
+        self.purchases.append((purchase_date, quantity, price))
+        self.current_value += quantity*self.last_price()*self.fx_rate()
+
+    def sell(self, quantity: float, price: float, method: str="FIFO") -> float:
+        """
+        Removes a quantity from the lots of the asset, matched
+        with models.LotQueue.
+
+        Parameters
+        ----------
+        quantity: float
+            Quantity to sell, at most the quantity held.
+        price: float
+            Sale price, in the currency of the asset.
+        method: str
+            Lot matching rule: FIFO, LIFO or Average.
+
+        Returns
+        -------
+        float
+            Realised profit of the sale, in the currency of the asset.
+
+        Notes
+        -----
+        Adjusts self.lots in place, so a sale only touches the lots it
+        consumes, and self.current_value (pro rata, without retrieving
+        a new price).
+        """
+        held = self.lots.quantity
+        matches = self.lots.sell(quantity, method)
+        self.current_value = self.lots.quantity * (self.current_value / held if held else 0.0)
+        return sum(sold * (price - cost) for sold, cost in matches)
+
+    def copy(self) -> "Asset":
+        """
+        A copy of the asset that does not share its lots with it, so
+        trades on either do not affect the other. Does not access
+        market data.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        models.Asset
+            The copy.
+        """
+        clone = copy.copy(self)
+        clone.lots = self.lots.copy()
+        clone.purchases = list(self.purchases)
+        return clone
+
+    def set_lots(self, queue: LotQueue, unit_value: float) -> None:
+        """
+        Replaces the lots of the asset by a queue, e.g. a copy that a
+        batch of trades was applied to.
+
+        Parameters
+        ----------
+        queue: models.LotQueue
+            The open lots.
+        unit_value: float
+            Current value of one unit, in the base currency.
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Adjusts self.lots and self.current_value.
+        """
+        self.lots = queue
+        self.current_value = queue.quantity * unit_value
 
     def last_price(self) -> float:
         """
         Retrieves the latest price of the asset known
-        from the Yahoo finance API. (20 minute delay allegedly).
+        to the market data provider. (Yahoo finance API has a
+        20 minute delay allegedly).
 
         Parameters
         ----------
@@ -98,12 +283,29 @@ class Asset:
         -------
         float
             The latest price of the Asset.
-        
-        Notes
-        -----
-        Prints to the terminal if the ticker does not exist.
+
+        Raises
+        ------
+        ValueError
+            If no price is available for the ticker.
+        """
+        return self.provider.last_price(self.ticker)
+
+    def fx_rate(self) -> float:
+        """
+        Retrieves the latest exchange rate from the currency of the
+        asset to the base currency.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        float
+            Base currency per unit of the currency of the asset.
         """
-        return yf.Ticker(self.ticker).fast_info.get("lastPrice", "No Last Price Found")
+        return float(get_converter(self.provider).latest_rates([self.ticker]).iloc[0])
 
     def calculate_current_value(self) -> float:
         """
@@ -116,6 +318,7 @@ class Asset:
         Returns
         -------
         float
-            The total current value of the allocation in the asset.
+            The total current value of the allocation in the asset,
+            in the base currency.
         """
-        return sum(self.quantity) * self.last_price()
+        return self.held * self.last_price() * self.fx_rate()
@@ -0,0 +1,273 @@
+from models.FX import get_converter
+from models.Portfolio import Portfolio
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+
+
+class Backtester:
+    """
+    Replays the trades of the portfolio (every purchase, also of assets
+    sold entirely since, and every sale) against historical closing
+    prices. Every lot is added on its purchase date and every sale is
+    withdrawn on its sale date; trades before the first date are
+    applied on the first date. Three strategies receive the same
+    trades:
+
+    - Buy and Hold: every lot is kept as bought, until it is sold.
+    - Periodic Rebalance: at the end of every period all holdings are
+      rebalanced to the target weights, trades in between are
+      kept as traded until then.
+    - Continuous Rebalance: the value of the holdings is rebalanced
+      to the target weights every day.
+
+    A sale withdraws the market value of the sold quantity from every
+    strategy. The target weights are the current weights of the
+    portfolio. Prices and trade prices are converted to the base
+    currency. All
+    NAVs are computed with cumulative sums and products over the
+    price matrix, without loops over days or lots.
+
+    Parameters
+    ----------
+    portfolio: models.Portfolio
+        The portfolio to backtest.
+
+    Attributes
+    ----------
+    portfolio: models.Portfolio
+        Stored from the constructor.
+    """
+    # pandas frequency of the rebalancing dates per period.
+    FREQUENCIES = {"Weekly": "W-FRI", "Monthly": "ME", "Quarterly": "QE", "Yearly": "YE"}
+
+    def __init__(self, portfolio: Portfolio):
+        self.portfolio = portfolio
+
+    def lots(self, restrictions: Optional[dict[str, str]]=None) -> pd.DataFrame:
+        """
+        All trades of the assets under "restrictions": the purchases
+        of the held assets and of the assets sold entirely
+        (Portfolio.closed), and the sales (Portfolio.sales).
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            To filter the portfolio by asset class and/or sector.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per trade with the ticker, date, quantity (negative
+            for a sale) and price, in the currency of the asset.
+        """
+        columns = Portfolio.PURCHASE_COLUMNS
+        purchases = pd.DataFrame(
+            [(ticker, asset.asset_class, asset.sector, *purchase)
+             for ticker, asset in self.portfolio.assets.items() for purchase in asset.purchases]
+            + self.portfolio.closed,
+            columns=columns,
+        )
+        sales = pd.DataFrame(self.portfolio.sales, columns=Portfolio.SALE_COLUMNS)[columns]
+        sales["quantity"] = -sales["quantity"]
+        lots = pd.concat([frame for frame in (purchases, sales) if not frame.empty] or [purchases], ignore_index=True)
+        for key, value in (restrictions or {}).items():
+            lots = lots[lots[key] == value]
+        lots = lots[["ticker", "date", "quantity", "price"]].reset_index(drop=True)
+        lots["date"] = pd.to_datetime(lots["date"])
+        lots["quantity"] = lots["quantity"].astype(float)
+        lots["price"] = lots["price"].astype(float)
+        return lots
+
+    def inputs(
+            self,
+            restrictions: Optional[dict[str, str]],
+            date1: str,
+            date2: Optional[str]=None,
+    ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.Series]:
+        """
+        Retrieves everything backtest_prices needs, in the base
+        currency. A trade price is converted at the exchange rate of
+        the day it is traded in the backtest. Assets sold entirely are
+        included, with a target weight of 0.
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            To filter the portfolio by asset class and/or sector.
+        date1: str
+            Starting date for the data.
+        date2: Optional[str]
+            Ending date for the data. ("None" retrieves most recent.)
+
+        Returns
+        -------
+        Tuple[pd.DataFrame, pd.DataFrame, pd.Series]
+            The prices, the lots and the target weights.
+        """
+        weights, _, _ = self.portfolio.get_portfolio_weights(restrictions)
+        if len(weights) == 0:
+            raise ValueError("No assets to backtest")
+        lots = self.lots(restrictions)
+        tickers = list(dict.fromkeys(list(weights.keys()) + lots["ticker"].tolist()))
+        marketData = self.portfolio.provider.download_close(tickers, date1, date2)[tickers]
+        marketData = marketData.ffill().dropna()
+        if marketData.empty:
+            return marketData, lots, pd.Series(weights)
+
+        rates = get_converter(self.portfolio.provider).rates(tickers, marketData.index)
+        index = marketData.index.tz_localize(None) if marketData.index.tz is not None else marketData.index
+        day = np.searchsorted(index.values, lots["date"].to_numpy(dtype="datetime64[ns]"), side="left")
+        column = pd.Index(tickers).get_indexer(lots["ticker"])
+        lots["price"] = lots["price"] * rates.to_numpy()[np.minimum(day, len(index) - 1), column]
+        return marketData * rates.to_numpy(), lots, pd.Series(weights)
+
+    def run(
+            self,
+            restrictions: Optional[dict[str, str]],
+            date1: str,
+            date2: Optional[str]=None,
+            rebalance: str="Monthly",
+    ) -> pd.DataFrame:
+        """
+        Backtests the assets under "restrictions".
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            To filter the portfolio by asset class and/or sector.
+        date1: str
+            Starting date for the data.
+        date2: Optional[str]
+            Ending date for the data. ("None" retrieves most recent.)
+        rebalance: str
+            Period of the periodic rebalancing, one of
+            Weekly/Monthly/Quarterly/Yearly.
+
+        Returns
+        -------
+        pd.DataFrame
+            See backtest_prices.
+        """
+        prices, lots, weights = self.inputs(restrictions, date1, date2)
+        return self.backtest_prices(prices, lots, weights, rebalance)
+
+    @staticmethod
+    def backtest_prices(
+            prices: pd.DataFrame,
+            lots: pd.DataFrame,
+            weights: pd.Series,
+            rebalance: str="Monthly",
+    ) -> pd.DataFrame:
+        """
+        Backtests from already retrieved prices. Does not access
+        market data, so it can run in a separate worker process.
+
+        Parameters
+        ----------
+        prices: pd.DataFrame
+            Closing prices per date (rows) and ticker (columns),
+            without missing values.
+        lots: pd.DataFrame
+            One row per trade, as returned by lots.
+        weights: pd.Series
+            Target weight per ticker.
+        rebalance: str
+            Period of the periodic rebalancing, see run.
+
+        Returns
+        -------
+        pd.DataFrame
+            The NAV of the three strategies and the invested capital
+            (purchase value of the lots bought so far, less the
+            proceeds of the sales) per date.
+        """
+        if rebalance not in Backtester.FREQUENCIES:
+            raise ValueError(f"Invalid rebalance {rebalance}, choose one of {set(Backtester.FREQUENCIES)}")
+        if prices.empty:
+            raise ValueError("No prices between the dates")
+        tickers = list(prices.columns)
+        index = prices.index.tz_localize(None) if prices.index.tz is not None else prices.index
+        closes = prices.to_numpy(dtype=float)
+        w = weights.reindex(tickers).fillna(0.0).to_numpy()
+        w = w / w.sum()
+
+        # Trades on a non trading day are applied the next trading day, trades after the last date are
+        # ignored. A sale is a lot with a negative quantity.
+        day = np.searchsorted(index.values, lots["date"].to_numpy(dtype="datetime64[ns]"), side="left")
+        column = pd.Index(tickers).get_indexer(lots["ticker"])
+        keep = (day < len(index)) & (column >= 0)
+        day, column = day[keep], column[keep]
+        quantity = lots["quantity"].to_numpy(dtype=float)[keep]
+        cost = quantity * lots["price"].to_numpy(dtype=float)[keep]
+
+        bought = np.zeros_like(closes)
+        np.add.at(bought, (day, column), quantity)
+        holdings = np.cumsum(bought, axis=0)
+        buy_and_hold = (holdings * closes).sum(axis=1)
+        # Every strategy receives the market value of the lots on the day they are bought, and pays out
+        # the market value of the sales on the day they are sold.
+        flows = (bought * closes).sum(axis=1)
+        invested = np.zeros(len(index))
+        np.add.at(invested, day, cost)
+
+        growth = np.ones(len(index))
+        growth[1:] = (closes[1:] / closes[:-1]) @ w
+        continuous = Backtester.linear_recurrence(growth, flows)
+
+        # Rebalanced on the first day and the last trading day of every period.
+        period_ends = (
+            pd.Series(np.arange(len(index)), index=index)
+            .resample(Backtester.FREQUENCIES[rebalance])
+            .last()
+            .dropna()
+            .to_numpy(dtype=np.int64)
+        )
+        starts = np.unique(np.concatenate(([0], period_ends)))
+        start = starts[np.searchsorted(starts, np.arange(len(index)), side="right") - 1]
+        # NAV at the rebalancing dates: the rebalanced NAV grows with the target weights,
+        # the lots bought within the period are added at their value.
+        start_growth = np.ones(len(starts))
+        start_growth[1:] = (closes[starts[1:]] / closes[starts[:-1]]) @ w
+        start_flows = np.empty(len(starts))
+        start_flows[0] = buy_and_hold[0]
+        start_flows[1:] = ((holdings[starts[1:]] - holdings[starts[:-1]]) * closes[starts[1:]]).sum(axis=1)
+        start_nav = Backtester.linear_recurrence(start_growth, start_flows)
+        periodic = (
+            start_nav[np.searchsorted(starts, start)] * ((closes / closes[start]) @ w)
+            + ((holdings - holdings[start]) * closes).sum(axis=1)
+        )
+
+        return pd.DataFrame(
+            {
+                "Buy and Hold": buy_and_hold,
+                f"{rebalance} Rebalance": periodic,
+                "Continuous Rebalance": continuous,
+                "Invested": np.cumsum(invested),
+            },
+            index=prices.index,
+        )
+
+    @staticmethod
+    def linear_recurrence(
+            growth: np._typing.NDArray[np.float64],
+            flows: np._typing.NDArray[np.float64],
+    ) -> np._typing.NDArray[np.float64]:
+        """
+        Solves nav[t] = growth[t] * nav[t-1] + flows[t], starting from
+        nav[-1] = 0, with one cumulative product and one cumulative sum.
+
+        Parameters
+        ----------
+        growth: np.typing.NDArray[np.float64]
+            Growth factor per step (growth[0] is not used).
+        flows: np.typing.NDArray[np.float64]
+            Amount added per step.
+
+        Returns
+        -------
+        np.typing.NDArray[np.float64]
+            The NAV per step.
+        """
+        cumulative = np.cumprod(growth)
+        return cumulative * np.cumsum(flows / cumulative)
@@ -0,0 +1,544 @@
+from models.MarketData import MarketDataProvider, get_provider
+from typing import Iterator, Optional
+from urllib.parse import quote
+import config
+import numpy as np
+import pandas as pd
+import json
+import os
+import tempfile
+import threading
+
+
+class BarStore:
+    """
+    Stores intraday bars (the closing price of every bar) on disk, and
+    the coarser frequencies resampled from them.
+
+    Bars are retrieved once: a request only downloads the periods that
+    are not stored yet (also gaps between stored periods), one month at
+    a time for all tickers missing the same period. They are stored as
+    one .npy file per interval, ticker and month, which is
+    memory-mapped when read. The manifest lists the stored periods, a
+    month is only added once it has been downloaded.
+
+    A coarser frequency (any pandas frequency, e.g. "15min", "4h",
+    "1D" or "W-FRI") is aggregated from the bars one month at a time and
+    stored as well. The close of a period is the close of its last bar,
+    so when bars are added only the new bars are aggregated and merged
+    with the stored periods, the latest bar of a period wins. Months of
+    minute bars of hundreds of tickers are therefore never in memory at
+    once.
+
+    Bars of different sources (see MarketDataProvider.source) are
+    stored apart, so synthetic bars are never returned as real ones.
+    Layout of directory::
+
+        {source}/{interval}/{ticker}/manifest.json
+                                              stored periods per frequency
+        {source}/{interval}/{ticker}/{YYYY-MM}.npy
+                                              bars (time, close)
+        {source}/{interval}/{ticker}/resampled/{frequency}.npy
+                                              periods (label, time, close)
+
+    Parameters
+    ----------
+    provider: Optional[models.MarketData.MarketDataProvider]
+        Source of the bars, defaults to the application wide provider.
+    directory: str
+        Folder to store the bars in.
+
+    Attributes
+    ----------
+    provider: models.MarketData.MarketDataProvider
+        Stored from the constructor.
+    directory: str
+        Stored from the constructor.
+    """
+    # Length of a bar per interval, as a pandas frequency.
+    INTERVALS = {"1m": "1min", "5m": "5min", "1h": "1h"}
+    # Times are nanoseconds since the epoch (UTC).
+    BAR_DTYPE = np.dtype([("time", "<i8"), ("close", "<f8")])
+    # A resampled period keeps its label and the time of its last bar.
+    RESAMPLED_DTYPE = np.dtype([("label", "<i8"), ("time", "<i8"), ("close", "<f8")])
+    # Shared by all stores, the files are updated by reading and rewriting them.
+    _lock = threading.RLock()
+
+    def __init__(
+            self,
+            provider: Optional[MarketDataProvider]=None,
+            directory: str=config.BAR_CACHE_DIR,
+    ):
+        self.provider = provider if provider is not None else get_provider()
+        self.directory = directory
+
+    def bars(
+            self,
+            tickers: list[str],
+            start: str,
+            end: Optional[str]=None,
+            interval: str="1m",
+            rule: Optional[str]=None,
+    ) -> pd.DataFrame:
+        """
+        Closing prices of intraday bars, or of a coarser frequency
+        resampled from them. Missing bars are retrieved first.
+
+        Parameters
+        ----------
+        tickers: list[str]
+            The tickers to retrieve.
+        start: str
+            Starting time (or date) for the data, in UTC.
+        end: Optional[str]
+            Ending time for the data, exclusive. ("None" gives up to
+            the last completed bar.)
+        interval: str
+            Length of the stored bars, one of "1m", "5m" or "1h".
+        rule: Optional[str]
+            A coarser pandas frequency to resample to, None for the
+            bars themselves.
+
+        Returns
+        -------
+        pd.DataFrame
+            Closing prices, indexed by the starting time of the bar
+            (or the label of the period) with one column per ticker.
+        """
+        if rule is not None:
+            pd.tseries.frequencies.to_offset(rule)
+        tickers = list(dict.fromkeys(tickers))
+        first, last = self._period(start, end, interval)
+        columns = []
+        with self._lock:
+            self.ingest(tickers, start, end, interval)
+            for ticker in tickers:
+                folder = self._folder(interval, ticker)
+                if rule is None:
+                    parts = list(self._partitions(folder, first, last))
+                    rows = np.concatenate(parts) if parts else np.empty(0, self.BAR_DTYPE)
+                    index = rows["time"]
+                else:
+                    rows = self._resampled(folder, rule)
+                    # A period belongs to the request when its last bar does.
+                    rows = rows[(rows["time"] >= first.value) & (rows["time"] < last.value)]
+                    index = rows["label"]
+                columns.append(pd.Series(rows["close"], index=pd.DatetimeIndex(index.astype("datetime64[ns]"))))
+        if not columns:
+            return pd.DataFrame(columns=tickers, index=pd.DatetimeIndex([]), dtype=float)
+        return pd.concat(columns, axis=1, keys=tickers)
+
+    def ingest(
+            self,
+            tickers: list[str],
+            start: str,
+            end: Optional[str]=None,
+            interval: str="1m",
+    ) -> None:
+        """
+        Retrieves and stores the bars of a period that are not
+        stored yet, extended to whole (UTC) days. A month is recorded
+        as stored once it has been downloaded, so after a failed
+        download only the remaining months are retrieved again. The
+        current day is retrieved again until it has passed.
+
+        Parameters
+        ----------
+        tickers: list[str]
+            The tickers to retrieve.
+        start: str
+            Starting time (or date) for the data, in UTC.
+        end: Optional[str]
+            Ending time for the data, exclusive. ("None" gives up to
+            the last completed bar.)
+        interval: str
+            Length of the bars, one of "1m", "5m" or "1h".
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Writes files to self.directory.
+        """
+        first, last = self._period(start, end, interval)
+        # Whole days, so the provider can tell a day without bars from a failed download.
+        today = pd.Timestamp.now("UTC").tz_localize(None).normalize()
+        first = first.floor("D")
+        last = last if last > today else last.ceil("D")
+        with self._lock:
+            # Tickers missing the same period are retrieved together.
+            missing: dict[tuple[pd.Timestamp, pd.Timestamp], list[str]] = {}
+            manifests = {}
+            for ticker in dict.fromkeys(tickers):
+                manifest = manifests[ticker] = self._manifest(self._folder(interval, ticker))
+                for period in self._uncovered(self._coverage(manifest), first, last):
+                    missing.setdefault(period, []).append(ticker)
+
+            for (period_first, period_last), group in missing.items():
+                for month_first, month_last in self._months(period_first, period_last):
+                    # Raises on a failed download, the month then stays missing.
+                    bars = self.provider.download_bars(group, str(month_first), str(month_last), interval)
+                    for ticker in group:
+                        folder = self._folder(interval, ticker)
+                        closes = bars[ticker].dropna() if ticker in bars else pd.Series(dtype=float)
+                        self._append(folder, closes)
+                        if month_first < today:
+                            self._cover(manifests[ticker], month_first, min(month_last, today))
+                            self._write_manifest(folder, manifests[ticker])
+
+    @staticmethod
+    def resample(rows: np.ndarray, rule: str) -> np.ndarray:
+        """
+        Closes of the periods of a frequency, from bars.
+
+        Parameters
+        ----------
+        rows: np.ndarray
+            Bars (BarStore.BAR_DTYPE) sorted by time.
+        rule: str
+            pandas frequency of the periods.
+
+        Returns
+        -------
+        np.ndarray
+            One row (BarStore.RESAMPLED_DTYPE) per period with bars.
+        """
+        if not len(rows):
+            return np.empty(0, BarStore.RESAMPLED_DTYPE)
+        positions = pd.Series(
+            np.arange(len(rows)), index=pd.DatetimeIndex(rows["time"].astype("datetime64[ns]")),
+        ).resample(rule).last().dropna()
+        last = positions.to_numpy(dtype=np.int64)
+        periods = np.empty(len(last), BarStore.RESAMPLED_DTYPE)
+        periods["label"] = positions.index.asi8
+        periods["time"] = rows["time"][last]
+        periods["close"] = rows["close"][last]
+        return periods
+
+    @staticmethod
+    def merge(parts: list[np.ndarray]) -> np.ndarray:
+        """
+        Combines resampled periods. A period in several parts (its
+        bars were stored at different times) keeps the close of its
+        latest bar.
+
+        Parameters
+        ----------
+        parts: list[np.ndarray]
+            Periods (BarStore.RESAMPLED_DTYPE), in any order.
+
+        Returns
+        -------
+        np.ndarray
+            The periods sorted by label.
+        """
+        rows = np.concatenate(parts) if parts else np.empty(0, BarStore.RESAMPLED_DTYPE)
+        rows = rows[np.lexsort((rows["time"], rows["label"]))]
+        latest = np.ones(len(rows), dtype=bool)
+        latest[:-1] = rows["label"][1:] != rows["label"][:-1]
+        return rows[latest]
+
+    def _resampled(self, folder: str, rule: str) -> np.ndarray:
+        """
+        The stored periods of a frequency, brought up to date with the
+        stored bars by aggregating only the bars added since.
+
+        Parameters
+        ----------
+        folder: str
+            Folder of the bars of a ticker.
+        rule: str
+            pandas frequency of the periods.
+
+        Returns
+        -------
+        np.ndarray
+            All periods (BarStore.RESAMPLED_DTYPE) of the stored bars.
+
+        Notes
+        -----
+        The bars of the current day are not recorded as stored (see
+        ingest), their periods are aggregated on every call.
+        """
+        manifest = self._manifest(folder)
+        coverage = self._coverage(manifest)
+        today = pd.Timestamp.now("UTC").tz_localize(None).normalize()
+        current = self._aggregate(folder, today, today + pd.Timedelta(days=1), rule)
+        if not coverage:
+            return current
+        path = os.path.join(folder, "resampled", f"{quote(rule, safe='')}.npy")
+        stored = manifest.get("resampled", {}).get(rule)
+        if stored is not None and os.path.exists(path):
+            stored_coverage = self._coverage(stored)
+            added = [gap for first, last in coverage for gap in self._uncovered(stored_coverage, first, last)]
+            if not added:
+                return self.merge([np.load(path), current])
+            parts = [np.load(path)] + [self._aggregate(folder, first, last, rule) for first, last in added]
+        else:
+            parts = [self._aggregate(folder, first, last, rule) for first, last in coverage]
+
+        periods = self.merge(parts)
+        self._save(path, periods)
+        manifest.setdefault("resampled", {})[rule] = {"intervals": [[str(a), str(b)] for a, b in coverage]}
+        self._write_manifest(folder, manifest)
+        return self.merge([periods, current])
+
+    def _aggregate(self, folder: str, first: pd.Timestamp, last: pd.Timestamp, rule: str) -> np.ndarray:
+        """
+        Resamples the stored bars of a period, one month at a time.
+
+        Parameters
+        ----------
+        folder: str
+            Folder of the bars of a ticker.
+        first: pd.Timestamp
+            Start of the period.
+        last: pd.Timestamp
+            End of the period, exclusive.
+        rule: str
+            pandas frequency of the periods.
+
+        Returns
+        -------
+        np.ndarray
+            The periods (BarStore.RESAMPLED_DTYPE) of these bars.
+        """
+        return self.merge([self.resample(rows, rule) for rows in self._partitions(folder, first, last)])
+
+    def _partitions(self, folder: str, first: pd.Timestamp, last: pd.Timestamp) -> Iterator[np.ndarray]:
+        """
+        The stored bars of a period, per month.
+
+        Parameters
+        ----------
+        folder: str
+            Folder of the bars of a ticker.
+        first: pd.Timestamp
+            Start of the period.
+        last: pd.Timestamp
+            End of the period, exclusive.
+
+        Returns
+        -------
+        Iterator[np.ndarray]
+            Memory-mapped bars (BarStore.BAR_DTYPE) of every month.
+        """
+        if not os.path.isdir(folder) or first >= last:
+            return
+        months = pd.period_range(first, last - pd.Timedelta(1, "ns"), freq="M")
+        for month in months:
+            path = os.path.join(folder, f"{month}.npy")
+            if not os.path.exists(path):
+                continue
+            rows = np.load(path, mmap_mode="r")
+            low, high = np.searchsorted(rows["time"], [first.value, last.value])
+            if low < high:
+                yield rows[low:high]
+
+    def _append(self, folder: str, closes: pd.Series) -> None:
+        """
+        Adds bars to the files of their months.
+
+        Parameters
+        ----------
+        folder: str
+            Folder of the bars of a ticker.
+        closes: pd.Series
+            Closing price per starting time of the bar.
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Writes files to folder.
+        """
+        if closes.empty:
+            return
+        times = closes.index.values.astype("datetime64[ns]").astype(np.int64)
+        months = closes.index.to_period("M")
+        for month in months.unique():
+            rows = np.empty(int((months == month).sum()), self.BAR_DTYPE)
+            rows["time"] = times[months == month]
+            rows["close"] = closes.to_numpy(dtype=float)[months == month]
+            path = os.path.join(folder, f"{month}.npy")
+            if os.path.exists(path):
+                rows = np.concatenate([np.load(path), rows])
+            # Sorted by time, a bar retrieved again replaces the stored one.
+            newest_first = rows[::-1]
+            _, positions = np.unique(newest_first["time"], return_index=True)
+            self._save(path, newest_first[positions])
+
+    def _period(
+            self,
+            start: str,
+            end: Optional[str],
+            interval: str,
+    ) -> tuple[pd.Timestamp, pd.Timestamp]:
+        """
+        The requested period, ending at the last completed bar.
+
+        Parameters
+        ----------
+        start: str
+            Starting time (or date).
+        end: Optional[str]
+            Ending time, exclusive, None for now.
+        interval: str
+            Length of the bars, one of "1m", "5m" or "1h".
+
+        Returns
+        -------
+        tuple[pd.Timestamp, pd.Timestamp]
+            Start and (exclusive) end of the period.
+        """
+        if interval not in self.INTERVALS:
+            raise ValueError(f"Invalid interval {interval}, choose one of {set(self.INTERVALS)}")
+        # A bar that has not closed yet would be stored with a price that still changes.
+        now = pd.Timestamp.now("UTC").tz_localize(None) - pd.Timedelta(self.INTERVALS[interval])
+        last = min(pd.Timestamp(end), now) if end is not None else now
+        return pd.Timestamp(start), last
+
+    @staticmethod
+    def _coverage(manifest: dict) -> list[tuple[pd.Timestamp, pd.Timestamp]]:
+        """
+        The stored periods of a manifest (or of a resampled frequency).
+
+        Parameters
+        ----------
+        manifest: dict
+            Holds "intervals", a list of [start, end) pairs, or the
+            single "start" and "until" of earlier versions.
+
+        Returns
+        -------
+        list[tuple[pd.Timestamp, pd.Timestamp]]
+            Start and (exclusive) end of every stored period, sorted
+            and without overlaps.
+        """
+        if "intervals" in manifest:
+            return [(pd.Timestamp(first), pd.Timestamp(last)) for first, last in manifest["intervals"]]
+        if "start" in manifest:
+            return [(pd.Timestamp(manifest["start"]), pd.Timestamp(manifest["until"]))]
+        return []
+
+    @staticmethod
+    def _uncovered(
+            coverage: list[tuple[pd.Timestamp, pd.Timestamp]],
+            first: pd.Timestamp,
+            last: pd.Timestamp,
+    ) -> list[tuple[pd.Timestamp, pd.Timestamp]]:
+        """
+        The parts of a period outside the stored periods.
+
+        Parameters
+        ----------
+        coverage: list[tuple[pd.Timestamp, pd.Timestamp]]
+            Stored periods, as returned by _coverage.
+        first: pd.Timestamp
+            Start of the period.
+        last: pd.Timestamp
+            End of the period, exclusive.
+
+        Returns
+        -------
+        list[tuple[pd.Timestamp, pd.Timestamp]]
+            Start and (exclusive) end of every missing part, in order.
+        """
+        missing = []
+        for stored_first, stored_last in coverage:
+            if stored_first > first:
+                missing.append((first, min(stored_first, last)))
+            first = max(first, stored_last)
+            if first >= last:
+                break
+        if first < last:
+            missing.append((first, last))
+        return [(a, b) for a, b in missing if a < b]
+
+    def _cover(self, manifest: dict, first: pd.Timestamp, last: pd.Timestamp) -> None:
+        """
+        Records a period as stored in a manifest, merged with the
+        stored periods it overlaps or touches.
+
+        Parameters
+        ----------
+        manifest: dict
+            The manifest of a ticker.
+        first: pd.Timestamp
+            Start of the period.
+        last: pd.Timestamp
+            End of the period, exclusive.
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Adjusts manifest, its "start" and "until" of earlier versions
+        are replaced by "intervals".
+        """
+        merged: list[list[pd.Timestamp]] = []
+        for stored_first, stored_last in sorted(self._coverage(manifest) + [(first, last)]):
+            if merged and stored_first <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], stored_last)
+            else:
+                merged.append([stored_first, stored_last])
+        manifest.pop("start", None)
+        manifest.pop("until", None)
+        manifest["intervals"] = [[str(a), str(b)] for a, b in merged]
+
+    @staticmethod
+    def _months(first: pd.Timestamp, last: pd.Timestamp) -> Iterator[tuple[pd.Timestamp, pd.Timestamp]]:
+        """
+        Splits a period at the starts of the months.
+
+        Parameters
+        ----------
+        first: pd.Timestamp
+            Start of the period.
+        last: pd.Timestamp
+            End of the period, exclusive.
+
+        Returns
+        -------
+        Iterator[tuple[pd.Timestamp, pd.Timestamp]]
+            Start and (exclusive) end of the part in every month.
+        """
+        while first < last:
+            month_end = (first.to_period("M") + 1).start_time
+            yield first, min(month_end, last)
+            first = month_end
+
+    def _folder(self, interval: str, ticker: str) -> str:
+        return os.path.join(
+            self.directory, quote(self.provider.source(), safe=""), interval, quote(ticker, safe=""),
+        )
+
+    @staticmethod
+    def _manifest(folder: str) -> dict:
+        path = os.path.join(folder, "manifest.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, folder: str, manifest: dict) -> None:
+        os.makedirs(folder, exist_ok=True)
+        # Written to a temporary file first, so readers never see a partial file.
+        handle, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp-")
+        with os.fdopen(handle, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, os.path.join(folder, "manifest.json"))
+
+    @staticmethod
+    def _save(path: str, rows: np.ndarray) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handle, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-", suffix=".npy")
+        with os.fdopen(handle, "wb") as f:
+            np.save(f, rows)
+        os.replace(tmp, path)
@@ -0,0 +1,265 @@
+from models.MarketData import MarketDataProvider, get_provider
+from typing import Optional
+import config
+import numpy as np
+import pandas as pd
+import threading
+import time
+import weakref
+
+
+class FXConverter:
+    """
+    Converts prices and values of assets quoted in different currencies
+    to one base currency. All exchange rates a conversion needs are
+    requested in one batch (e.g. EURUSD=X and GBPUSD=X together) from
+    the market data provider, which caches them. Conversions multiply
+    whole price matrices or value vectors by a rate matrix or vector
+    aligned to the tickers, never asset by asset. The currency of a
+    ticker is retrieved once and the latest rates are kept for
+    quote_ttl seconds, use get_converter to share them between all
+    users of a provider.
+
+    Parameters
+    ----------
+    provider: Optional[models.MarketData.MarketDataProvider]
+        Source of the currencies and exchange rates, defaults to the
+        application wide provider.
+    base: str
+        The base currency, defaults to config.BASE_CURRENCY.
+    quote_ttl: float
+        Seconds a latest exchange rate stays valid.
+
+    Attributes
+    ----------
+    provider: models.MarketData.MarketDataProvider
+        Stored from the constructor.
+    base: str
+        Stored from the constructor.
+    quote_ttl: float
+        Stored from the constructor.
+    """
+    # Currencies quoted in their minor unit: the major currency and the size of a unit.
+    MINOR_UNITS = {"GBp": ("GBP", 0.01), "GBX": ("GBP", 0.01), "ZAc": ("ZAR", 0.01), "ILA": ("ILS", 0.01)}
+
+    def __init__(
+            self,
+            provider: Optional[MarketDataProvider]=None,
+            base: str=config.BASE_CURRENCY,
+            quote_ttl: float=60.0,
+    ):
+        self.provider = provider if provider is not None else get_provider()
+        self.base = base
+        self.quote_ttl = quote_ttl
+        self._latest: dict[str, tuple[float, float]] = {}
+        self._currencies: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def currencies(self, tickers: list[str]) -> pd.Series:
+        """
+        Currency of every ticker. The currency of a ticker does not
+        change, so it is only retrieved the first time, for all new
+        tickers in one request.
+
+        Parameters
+        ----------
+        tickers: list[str]
+            Tickers of the assets.
+
+        Returns
+        -------
+        pd.Series
+            Currency code per ticker.
+        """
+        with self._lock:
+            missing = [ticker for ticker in dict.fromkeys(tickers) if ticker not in self._currencies]
+        if missing:
+            fetched = self.provider.currencies(missing)
+            with self._lock:
+                self._currencies.update(fetched.items())
+        with self._lock:
+            return pd.Series([self._currencies[ticker] for ticker in tickers], index=tickers, dtype=object)
+
+    def _pairs(self, currencies: pd.Series) -> tuple[pd.Series, list[str], np.ndarray]:
+        """
+        The exchange rates needed for a set of currencies.
+
+        Parameters
+        ----------
+        currencies: pd.Series
+            Currency per ticker.
+
+        Returns
+        -------
+        tuple[pd.Series, list[str], np.ndarray]
+            The major currency per ticker, the exchange rate tickers to
+            request (one per distinct foreign currency) and the size
+            of a quoted unit per ticker.
+        """
+        major = currencies.map(lambda currency: self.MINOR_UNITS.get(currency, (currency, 1.0))[0])
+        unit = currencies.map(lambda currency: self.MINOR_UNITS.get(currency, (currency, 1.0))[1])
+        pairs = [f"{currency}{self.base}=X" for currency in major.unique() if currency != self.base]
+        return major, pairs, unit.to_numpy(dtype=float)
+
+    def latest_rates(self, tickers: list[str]) -> pd.Series:
+        """
+        Latest exchange rate to the base currency of every ticker.
+
+        Parameters
+        ----------
+        tickers: list[str]
+            Tickers of the assets.
+
+        Returns
+        -------
+        pd.Series
+            Base currency per unit of the currency of each ticker.
+
+        Raises
+        ------
+        ValueError
+            If no exchange rate is available for a currency.
+        """
+        major, pairs, unit = self._pairs(self.currencies(tickers))
+        now = time.monotonic()
+        with self._lock:
+            latest = {
+                currency: rate for currency, (stored_at, rate) in self._latest.items()
+                if now - stored_at < self.quote_ttl
+            }
+        stale = [pair for pair in pairs if pair[:3] not in latest]
+        if stale:
+            quotes = pd.to_numeric(self.provider.last_prices(stale), errors="coerce").reindex(stale)
+            missing = [pair for pair, quote in quotes.items() if not np.isfinite(quote) or quote <= 0]
+            if missing:
+                raise ValueError(f"No exchange rate found for {', '.join(missing)}")
+            fetched = {pair[:3]: float(quote) for pair, quote in quotes.items()}
+            with self._lock:
+                self._latest.update({currency: (now, rate) for currency, rate in fetched.items()})
+            latest.update(fetched)
+        latest[self.base] = 1.0
+        return pd.Series(np.array([latest[currency] for currency in major]) * unit, index=major.index)
+
+    def rates(self, tickers: list[str], index: pd.DatetimeIndex, strict: bool=True) -> pd.DataFrame:
+        """
+        Daily exchange rates to the base currency of every ticker,
+        aligned to the dates of a price matrix. Rates of days without
+        a rate (e.g. a holiday of the currency market) are carried
+        forward, a rate is never applied to earlier dates.
+
+        Parameters
+        ----------
+        tickers: list[str]
+            Tickers of the assets, the columns of the price matrix.
+        index: pd.DatetimeIndex
+            Dates of the price matrix.
+        strict: bool
+            If False, dates without an exchange rate (e.g. before the
+            history of the rate starts) are NaN instead of an error,
+            for callers that treat them as missing prices.
+
+        Returns
+        -------
+        pd.DataFrame
+            Base currency per unit of the currency of each ticker,
+            per date (rows) and ticker (columns).
+
+        Raises
+        ------
+        ValueError
+            If strict and an exchange rate is missing, or has no rate
+            on or before a date.
+        """
+        major, pairs, unit = self._pairs(self.currencies(tickers))
+        dates = index.tz_localize(None) if index.tz is not None else index
+        history = pd.DataFrame(1.0, index=dates, columns=[self.base])
+        if pairs and len(dates):
+            closes = self.provider.download_close(
+                pairs,
+                str(dates[0].date() - pd.Timedelta(days=10)),
+                str(dates[-1].date() + pd.Timedelta(days=1)),
+            )
+            missing = [pair for pair in pairs if pair not in closes.columns or closes[pair].isna().all()]
+            if missing and strict:
+                raise ValueError(f"No exchange rate found for {', '.join(missing)}")
+            closes = closes.reindex(columns=pairs)
+            closes.index = closes.index.tz_localize(None) if closes.index.tz is not None else closes.index
+            closes.columns = [pair[:3] for pair in pairs]
+            # Aligned on the dates of the prices, the last known rate applies. Never filled
+            # backwards: a later rate would convert earlier prices at the wrong rate.
+            closes = closes.reindex(closes.index.union(dates)).ffill().reindex(dates)
+            unknown = closes.isna().any()
+            if strict and unknown.any():
+                currency = unknown.index[unknown.to_numpy()][0]
+                first = closes.index[closes[currency].isna().to_numpy()][0]
+                raise ValueError(f"No exchange rate for {currency}{self.base}=X on or before {first.date()}")
+            history = pd.concat([history, closes], axis=1)
+
+        columns = history.columns.get_indexer(major.to_numpy())
+        return pd.DataFrame(history.to_numpy()[:, columns] * unit, index=index, columns=tickers)
+
+    def convert_prices(self, prices: pd.DataFrame, strict: bool=True) -> pd.DataFrame:
+        """
+        Converts a price matrix to the base currency.
+
+        Parameters
+        ----------
+        prices: pd.DataFrame
+            Prices per date (rows) and ticker (columns) in the
+            currency of each ticker.
+        strict: bool
+            If False, prices of dates without an exchange rate become
+            NaN instead of an error, see rates.
+
+        Returns
+        -------
+        pd.DataFrame
+            The prices in the base currency.
+        """
+        if prices.empty:
+            return prices
+        tickers = list(prices.columns)
+        return prices * self.rates(tickers, prices.index, strict).to_numpy()
+
+    def convert_values(self, values: pd.Series) -> pd.Series:
+        """
+        Converts values per ticker at the latest exchange rates.
+
+        Parameters
+        ----------
+        values: pd.Series
+            Value per ticker in the currency of each ticker.
+
+        Returns
+        -------
+        pd.Series
+            The values in the base currency.
+        """
+        return values * self.latest_rates(list(values.index)).to_numpy()
+
+
+_converters: "weakref.WeakKeyDictionary[MarketDataProvider, FXConverter]" = weakref.WeakKeyDictionary()
+_converters_lock = threading.Lock()
+
+
+def get_converter(provider: Optional[MarketDataProvider]=None) -> FXConverter:
+    """
+    Retrieves the converter to config.BASE_CURRENCY of a provider,
+    created on first use, so its latest exchange rates are shared.
+
+    Parameters
+    ----------
+    provider: Optional[models.MarketData.MarketDataProvider]
+        Source of the exchange rates, defaults to the application wide
+        provider.
+
+    Returns
+    -------
+    FXConverter
+        The shared converter of the provider.
+    """
+    provider = provider if provider is not None else get_provider()
+    with _converters_lock:
+        if provider not in _converters:
+            _converters[provider] = FXConverter(provider)
+        return _converters[provider]
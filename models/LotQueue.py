@@ -0,0 +1,166 @@
+from collections import deque
+from typing import Tuple
+import numpy as np
+
+
+class LotQueue:
+    """
+    The open lots of one asset in purchase order, kept by the asset
+    for matching sales against them:
+
+    - FIFO: the oldest lots are sold first.
+    - LIFO: the newest lots are sold first.
+    - Average: every lot is reduced by the same fraction, at the
+      average cost of all lots.
+
+    Lots are kept in a deque, so FIFO and LIFO sales take constant time
+    per consumed lot. An average cost sale only updates a common scale
+    factor of all quantities, so it takes constant time as well.
+
+    Parameters
+    ----------
+    quantities: list[float]
+        Quantity per lot.
+    prices: list[float]
+        Purchase price per lot.
+    dates: list[str]
+        Purchase date per lot.
+
+    Attributes
+    ----------
+    quantity: float
+        Total quantity of the open lots.
+    cost: float
+        Total purchase value of the open lots.
+    """
+    METHODS = {"FIFO", "LIFO", "Average"}
+    # Lots smaller than this (relative to the sold quantity) are closed.
+    TOLERANCE = 1e-9
+
+    def __init__(self, quantities: list[float], prices: list[float], dates: list[str]):
+        # [quantity / scale, price, date] per lot, the quantity of a lot is its first entry * scale.
+        self._lots = deque([quantity, price, date] for quantity, price, date in zip(quantities, prices, dates))
+        self._scale = 1.0
+        self.quantity = float(sum(quantities))
+        self.cost = float(sum(quantity * price for quantity, price in zip(quantities, prices)))
+
+    def __len__(self) -> int:
+        return len(self._lots)
+
+    def copy(self) -> "LotQueue":
+        """
+        A copy that does not share its lots with the queue, e.g. to
+        apply trades that may still be rejected.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        models.LotQueue
+            The copy.
+        """
+        clone = LotQueue([], [], [])
+        clone._lots = deque(list(lot) for lot in self._lots)
+        clone._scale, clone.quantity, clone.cost = self._scale, self.quantity, self.cost
+        return clone
+
+    def buy(self, quantity: float, price: float, date: str) -> None:
+        """
+        Adds a lot.
+
+        Parameters
+        ----------
+        quantity: float
+            Quantity bought.
+        price: float
+            Purchase price.
+        date: str
+            Purchase date.
+
+        Returns
+        -------
+        None
+        """
+        self._lots.append([quantity / self._scale, price, date])
+        self.quantity += quantity
+        self.cost += quantity * price
+
+    def sell(self, quantity: float, method: str="FIFO") -> list[Tuple[float, float]]:
+        """
+        Removes a quantity from the lots.
+
+        Parameters
+        ----------
+        quantity: float
+            Quantity sold, at most self.quantity.
+        method: str
+            FIFO, LIFO or Average.
+
+        Returns
+        -------
+        list[Tuple[float, float]]
+            The sold quantity and its purchase price per matched lot
+            (one entry at the average cost for Average).
+        """
+        if method not in self.METHODS:
+            raise ValueError(f"Invalid method {method}, choose one of {self.METHODS}")
+        if quantity <= 0:
+            raise ValueError("Quantity must be positive")
+        tolerance = self.TOLERANCE * max(1.0, quantity)
+        if quantity > self.quantity + tolerance:
+            raise ValueError(f"Cannot sell {quantity}, only {self.quantity:g} held")
+
+        if method == "Average":
+            average = self.cost / self.quantity
+            remaining = max(0.0, 1 - quantity / self.quantity)
+            if remaining * self.quantity <= tolerance:
+                self._lots.clear()
+                self._scale, self.quantity, self.cost = 1.0, 0.0, 0.0
+            else:
+                self._scale *= remaining
+                self.quantity *= remaining
+                self.cost *= remaining
+            return [(quantity, average)]
+
+        matches = []
+        left = quantity
+        while left > tolerance and self._lots:
+            lot = self._lots[0] if method == "FIFO" else self._lots[-1]
+            held = lot[0] * self._scale
+            sold = min(held, left)
+            matches.append((sold, lot[1]))
+            self.cost -= sold * lot[1]
+            left -= sold
+            if held - sold <= tolerance:
+                if method == "FIFO":
+                    self._lots.popleft()
+                else:
+                    self._lots.pop()
+            else:
+                lot[0] = (held - sold) / self._scale
+        self.quantity = max(0.0, self.quantity - quantity)
+        if not self._lots:
+            self._scale, self.quantity, self.cost = 1.0, 0.0, 0.0
+        return matches
+
+    def lots(self) -> Tuple[list[float], list[float], list[str]]:
+        """
+        The open lots, quantities as int if they are all whole.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Tuple[list[float], list[float], list[str]]
+            Quantity, purchase price and purchase date per lot.
+        """
+        raw, prices, dates = zip(*self._lots) if self._lots else ((), (), ())
+        quantities = np.asarray(raw, dtype=float) * self._scale
+        whole = np.round(quantities)
+        if np.all(np.abs(quantities - whole) < self.TOLERANCE):
+            return whole.astype(int).tolist(), list(prices), list(dates)
+        return quantities.tolist(), list(prices), list(dates)
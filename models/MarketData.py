@@ -0,0 +1,944 @@
+from models.Transport import Transport, get_transport
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, Optional
+import config
+import yfinance as yf
+import numpy as np
+import pandas as pd
+import threading
+import time
+import zlib
+
+
+class MarketDataProvider(ABC):
+    """
+    Interface for all market data used in the application.
+    Models, views and the controller only talk to a provider,
+    never to a data source directly. A provider missing one of the
+    abstract methods cannot be instantiated.
+
+    Parameters
+    ----------
+    None
+
+    Attributes
+    ----------
+    None
+    """
+    @abstractmethod
+    def long_name(self, ticker: str) -> str:
+        """
+        Retrieves the full name of an asset.
+
+        Parameters
+        ----------
+        ticker: str
+            Ticker of the asset.
+
+        Returns
+        -------
+        str
+            The full name of the asset.
+        """
+
+    @abstractmethod
+    def last_price(self, ticker: str) -> float:
+        """
+        Retrieves the latest known price of an asset.
+
+        Parameters
+        ----------
+        ticker: str
+            Ticker of the asset.
+
+        Returns
+        -------
+        float
+            The latest price of the asset.
+
+        Raises
+        ------
+        ValueError
+            If no price is available for the ticker.
+        """
+
+    @abstractmethod
+    def currency(self, ticker: str) -> str:
+        """
+        Retrieves the currency an asset is quoted in.
+
+        Parameters
+        ----------
+        ticker: str
+            Ticker of the asset.
+
+        Returns
+        -------
+        str
+            Currency code, e.g. "USD", "EUR" or "GBp" (pence).
+        """
+
+    def source(self) -> str:
+        """
+        Identifies the data source, so data and results of different
+        sources (e.g. synthetic and real prices) are never mixed.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        str
+            Name of the source, including whatever changes its data.
+        """
+        return type(self).__name__.lower()
+
+    def currencies(self, tickers: list[str]) -> pd.Series:
+        """
+        Retrieves the currencies of a number of assets.
+        Providers that can retrieve them in one request override this.
+
+        Parameters
+        ----------
+        tickers: list[str]
+            Tickers of the assets.
+
+        Returns
+        -------
+        pd.Series
+            Currency code per ticker.
+        """
+        return pd.Series({ticker: self.currency(ticker) for ticker in tickers}, dtype=object)
+
+    def last_prices(self, tickers: list[str]) -> pd.Series:
+        """
+        Retrieves the latest known prices of a number of assets.
+        Providers that can retrieve them in one request override this.
+
+        Parameters
+        ----------
+        tickers: list[str]
+            Tickers of the assets.
+
+        Returns
+        -------
+        pd.Series
+            The latest price per ticker.
+        """
+        return pd.Series({ticker: self.last_price(ticker) for ticker in tickers}, dtype=float)
+
+    @abstractmethod
+    def download_close(
+            self,
+            tickers: list[str],
+            start: str,
+            end: Optional[str]=None,
+    ) -> pd.DataFrame:
+        """
+        Retrieves daily closing prices for a number of tickers.
+
+        Parameters
+        ----------
+        tickers: list[str]
+            The tickers to retrieve.
+        start: str
+            Starting date for the data.
+        end: Optional[str]
+            Ending date for the data, exclusive. ("None" retrieves
+            most recent.)
+
+        Returns
+        -------
+        pd.DataFrame
+            Closing prices, indexed by date with one column per ticker.
+        """
+
+    @abstractmethod
+    def download_bars(
+            self,
+            tickers: list[str],
+            start: str,
+            end: Optional[str]=None,
+            interval: str="1m",
+    ) -> pd.DataFrame:
+        """
+        Retrieves intraday closing prices (bars) for a number of tickers.
+
+        Parameters
+        ----------
+        tickers: list[str]
+            The tickers to retrieve.
+        start: str
+            Starting time (or date) for the data, in UTC.
+        end: Optional[str]
+            Ending time for the data, exclusive. ("None" retrieves
+            most recent.)
+        interval: str
+            Length of a bar, one of "1m", "5m" or "1h".
+
+        Returns
+        -------
+        pd.DataFrame
+            Closing price of every bar starting in [start, end),
+            indexed by the starting time of the bar (UTC, without
+            time zone) with one column per ticker.
+
+        Raises
+        ------
+        ConnectionError
+            If the bars of a ticker that traded on a whole day of the
+            period could not be retrieved. Bars older than the
+            provider keeps are not an error, they are left out.
+        """
+
+
+class YahooProvider(MarketDataProvider):
+    """
+    Market data retrieved from the yahoo finance API. All calls go
+    through one models.Transport, sharing its session, timeouts,
+    retries and circuit breaker.
+
+    Parameters
+    ----------
+    transport: Optional[models.Transport]
+        Defaults to the application wide transport.
+
+    Attributes
+    ----------
+    transport: models.Transport
+        Stored from the constructor.
+    """
+    # Longest period per intraday request accepted by the yahoo finance API.
+    BAR_REQUEST_DAYS = {"1m": 7, "5m": 59, "1h": 729}
+    # Days intraday bars are kept by the yahoo finance API, older bars are not served.
+    BAR_RETENTION_DAYS = {"1m": 30, "5m": 60, "1h": 730}
+
+    def __init__(self, transport: Optional[Transport]=None):
+        self.transport = transport if transport is not None else get_transport()
+
+    def source(self) -> str:
+        return "yahoo"
+
+    def long_name(self, ticker: str) -> str:
+        info = self.transport.call(
+            lambda: yf.Ticker(ticker, session=self.transport.session).info,
+        )
+        return info.get("longName", f"No long name found for {ticker}")
+
+    def last_price(self, ticker: str) -> float:
+        price = self.transport.call(
+            lambda: yf.Ticker(ticker, session=self.transport.session).fast_info.get("lastPrice"),
+        )
+        if price is None or not np.isfinite(price):
+            raise ValueError(f"No last price found for {ticker}")
+        return float(price)
+
+    def currency(self, ticker: str) -> str:
+        return self.transport.call(
+            lambda: yf.Ticker(ticker, session=self.transport.session).fast_info["currency"],
+        )
+
+    def last_prices(self, tickers: list[str]) -> pd.Series:
+        # One download for all tickers, the last (intraday) bar of the most recent days.
+        marketData = self._download(tickers, period="5d", interval="1m")["Close"]
+        if isinstance(marketData, pd.Series):
+            marketData = marketData.to_frame(tickers[0])
+        return marketData.ffill().iloc[-1].reindex(tickers)
+
+    def download_close(
+            self,
+            tickers: list[str],
+            start: str,
+            end: Optional[str]=None,
+    ) -> pd.DataFrame:
+        marketData = self._download(tickers, start=start, end=end)
+        return marketData["Close"]
+
+    def download_bars(
+            self,
+            tickers: list[str],
+            start: str,
+            end: Optional[str]=None,
+            interval: str="1m",
+    ) -> pd.DataFrame:
+        if interval not in self.BAR_REQUEST_DAYS:
+            raise ValueError(f"Invalid interval {interval}, choose one of {set(self.BAR_REQUEST_DAYS)}")
+        now = pd.Timestamp.now("UTC").tz_localize(None)
+        last = pd.Timestamp(end) if end is not None else now
+        # Bars older than the retention are not served, requesting them would only fail.
+        first = max(pd.Timestamp(start), now - pd.Timedelta(days=self.BAR_RETENTION_DAYS[interval]) + pd.Timedelta(hours=1))
+        frames = []
+        # The API only serves a limited period per intraday request.
+        while first < last:
+            stop = min(first + pd.Timedelta(days=self.BAR_REQUEST_DAYS[interval]), last)
+            marketData = self._download(
+                tickers, allow_empty=True, start=first.tz_localize("UTC"), end=stop.tz_localize("UTC"), interval=interval,
+            )
+            closes = pd.DataFrame(columns=tickers, index=pd.DatetimeIndex([]), dtype=float)
+            if not marketData.empty:
+                closes = marketData["Close"]
+                if isinstance(closes, pd.Series):
+                    closes = closes.to_frame(tickers[0])
+                closes.index = closes.index.tz_convert("UTC").tz_localize(None)
+                closes = closes[(closes.index >= first) & (closes.index < stop)].reindex(columns=tickers)
+            self._check_bars(closes, first, stop, interval)
+            frames.append(closes)
+            first = stop
+        if not frames:
+            return pd.DataFrame(columns=tickers, index=pd.DatetimeIndex([]), dtype=float)
+        return pd.concat(frames).reindex(columns=tickers)
+
+    def _check_bars(self, closes: pd.DataFrame, first: pd.Timestamp, stop: pd.Timestamp, interval: str) -> None:
+        """
+        yfinance returns no bars both for a period without trading and
+        for a failed download (network error, rate limit). Tickers
+        without bars are only accepted when their daily closes show no
+        trading on the whole days of the period either, so a failed
+        download is never stored as a period without bars.
+
+        Parameters
+        ----------
+        closes: pd.DataFrame
+            The downloaded bars, one column per ticker.
+        first: pd.Timestamp
+            Start of the period.
+        stop: pd.Timestamp
+            End of the period, exclusive.
+        interval: str
+            Length of a bar.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        ConnectionError
+            If tickers without bars did trade in the period.
+        """
+        empty = [ticker for ticker in closes.columns if closes[ticker].isna().all()]
+        # Only whole (UTC) days can be compared with daily closes, a part of a day may lie
+        # outside the trading session. models.BarStore retrieves whole days for this reason.
+        days = pd.bdate_range(first.ceil("D"), stop.floor("D") - pd.Timedelta(days=1))
+        if not empty or len(days) == 0:
+            return
+        daily = self._download(
+            empty, allow_empty=True, start=str(days[0].date()), end=str((days[-1] + pd.Timedelta(days=1)).date()),
+        )
+        if daily.empty:
+            return
+        daily = daily["Close"]
+        if isinstance(daily, pd.Series):
+            daily = daily.to_frame(empty[0])
+        traded = [ticker for ticker in empty if ticker in daily and daily[ticker].notna().any()]
+        if traded:
+            raise ConnectionError(f"No {interval} bars returned for {traded} between {first} and {stop}")
+
+    def _download(self, tickers: list[str], allow_empty: bool=False, **kwargs: Any) -> pd.DataFrame:
+        def download() -> pd.DataFrame:
+            marketData = yf.download(
+                tickers,
+                progress=False,
+                auto_adjust=False,
+                # yfinance retrieves the tickers on threads of its own, bounded like the transport.
+                threads=self.transport.max_concurrency,
+                timeout=self.transport.timeout,
+                session=self.transport.session,
+                **kwargs,
+            )
+            # yfinance reports failed downloads instead of raising, so they could not be retried.
+            # A period without trading (e.g. a weekend of intraday bars) may be empty.
+            if marketData is None or (marketData.empty and not allow_empty):
+                raise ConnectionError(f"No market data returned for {tickers}")
+            return marketData
+
+        return self.transport.call(download)
+
+
+class SyntheticProvider(MarketDataProvider):
+    """
+    Deterministic market data without any network access. Every ticker
+    follows a Geometric Brownian Motion driven by one common market
+    factor and its own idiosyncratic noise, so assets are correlated.
+    All randomness is derived from (seed, ticker), hence a price on a
+    given date is the same regardless of the requested date range or
+    of the other tickers requested alongside it.
+
+    Parameters
+    ----------
+    seed: int
+        Seed of the synthetic market.
+    start: str
+        First business day of the synthetic history.
+    chunk_size: int
+        Number of tickers generated at once, bounds peak memory.
+
+    Attributes
+    ----------
+    seed: int
+        Stored from the constructor.
+    start: pd.Timestamp
+        Stored from the constructor.
+    chunk_size: int
+        Stored from the constructor.
+    """
+    TRADING_DAYS = 252
+    MARKET_VOL = 0.18
+    # Currency of a ticker by exchange suffix (as on yahoo finance), USD otherwise.
+    SUFFIX_CURRENCIES = {
+        ".AS": "EUR",
+        ".PA": "EUR",
+        ".DE": "EUR",
+        ".MI": "EUR",
+        ".MC": "EUR",
+        ".BR": "EUR",
+        ".L": "GBp",
+        ".SW": "CHF",
+        ".T": "JPY",
+        ".HK": "HKD",
+        ".TO": "CAD",
+        ".AX": "AUD",
+    }
+    # Approximate value in USD, the level around which exchange rates (e.g. EURUSD=X) move.
+    CURRENCY_LEVELS = {
+        "USD": 1.0,
+        "EUR": 1.1,
+        "GBP": 1.3,
+        "CHF": 1.1,
+        "JPY": 0.007,
+        "HKD": 0.13,
+        "CAD": 0.73,
+        "AUD": 0.66,
+    }
+    FX_VOL = 0.08
+    # Intraday session of the bars in UTC (New York hours, ignoring daylight saving time).
+    SESSION_OPEN = pd.Timedelta(hours=14, minutes=30)
+    SESSION_MINUTES = 390
+    BAR_MINUTES = {"1m": 1, "5m": 5, "1h": 60}
+
+    def __init__(
+            self,
+            seed: int=config.SYNTHETIC_SEED,
+            start: str=config.SYNTHETIC_START,
+            chunk_size: int=512,
+    ):
+        self.seed = seed
+        self.start = pd.Timestamp(start)
+        self.chunk_size = chunk_size
+        self._market_shocks = np.empty(0)
+
+    def source(self) -> str:
+        # Another seed or start is another market.
+        return f"synthetic-{self.seed}-{self.start.date()}"
+
+    def long_name(self, ticker: str) -> str:
+        return f"{self._validate(ticker).upper()} Synthetic Holdings"
+
+    def last_price(self, ticker: str) -> float:
+        closes = self._closes([self._validate(ticker)], len(self._calendar(None)))
+        return float(closes[-1, 0])
+
+    def currency(self, ticker: str) -> str:
+        ticker = self._validate(ticker).upper()
+        if ticker.endswith("=X"):
+            # An exchange rate is quoted in its second currency, as on yahoo finance.
+            return ticker[3:6]
+        for suffix, currency in self.SUFFIX_CURRENCIES.items():
+            if ticker.endswith(suffix):
+                return currency
+        return "USD"
+
+    def last_prices(self, tickers: list[str]) -> pd.Series:
+        last_day = self._calendar(None)[-1]
+        return self.download_close(tickers, str(last_day.date())).iloc[-1]
+
+    def download_close(
+            self,
+            tickers: list[str],
+            start: str,
+            end: Optional[str]=None,
+    ) -> pd.DataFrame:
+        if isinstance(tickers, str):
+            tickers = [tickers]
+        # Duplicates would only cost extra generation, the columns are identical.
+        tickers = list(dict.fromkeys(self._validate(ticker) for ticker in tickers))
+        calendar = self._calendar(end)
+        first = calendar.searchsorted(pd.Timestamp(start))
+        closes = np.empty((len(calendar) - first, len(tickers)))
+
+        for i in range(0, len(tickers), self.chunk_size):
+            chunk = tickers[i:i + self.chunk_size]
+            closes[:, i:i + len(chunk)] = self._closes(chunk, len(calendar))[first:]
+
+        return pd.DataFrame(closes, index=calendar[first:], columns=tickers)
+
+    def download_bars(
+            self,
+            tickers: list[str],
+            start: str,
+            end: Optional[str]=None,
+            interval: str="1m",
+    ) -> pd.DataFrame:
+        # Every day is a Brownian bridge per minute from the previous close to the close of
+        # the day, drawn per (seed, ticker, month): the last bar of a day closes at the daily
+        # close, and a bar is the same regardless of the requested period or interval.
+        if interval not in self.BAR_MINUTES:
+            raise ValueError(f"Invalid interval {interval}, choose one of {set(self.BAR_MINUTES)}")
+        if isinstance(tickers, str):
+            tickers = [tickers]
+        tickers = list(dict.fromkeys(self._validate(ticker) for ticker in tickers))
+        first_time = pd.Timestamp(start)
+        last_time = pd.Timestamp(end) if end is not None else pd.Timestamp.now("UTC").tz_localize(None)
+        calendar = self._calendar(None)
+        first = calendar.searchsorted(first_time.normalize())
+        last = calendar.searchsorted(last_time.normalize(), side="right")
+        days = calendar[first:last]
+
+        minutes = self.BAR_MINUTES[interval]
+        offsets = np.arange(0, self.SESSION_MINUTES, minutes)
+        # Minute of the session at which every bar closes.
+        closes_at = np.minimum(offsets + minutes, self.SESSION_MINUTES)
+        times = pd.DatetimeIndex(
+            (days.values[:, None] + self.SESSION_OPEN.to_timedelta64()
+             + offsets * np.timedelta64(1, "m")).ravel(),
+        )
+        keep = (times >= first_time) & (times < last_time)
+        bars = np.empty((int(keep.sum()), len(tickers)))
+        if not len(bars):
+            return pd.DataFrame(bars, index=times[keep], columns=tickers)
+
+        months = days.to_period("M")
+        # Position of every day among the business days of its month.
+        positions = np.busday_count(months.start_time.values.astype("datetime64[D]"), days.values.astype("datetime64[D]"))
+        fraction = np.arange(1, self.SESSION_MINUTES + 1) / self.SESSION_MINUTES
+        for i in range(0, len(tickers), self.chunk_size):
+            chunk = tickers[i:i + self.chunk_size]
+            daily = np.log(self._closes(chunk, len(calendar)))
+            previous = daily[np.maximum(np.arange(first, last) - 1, 0)]
+            for j, ticker in enumerate(chunk):
+                _, beta, idio_vol, _ = self._ticker_params(ticker)
+                minute_vol = np.sqrt(((beta * self.MARKET_VOL)**2 + idio_vol**2) / self.TRADING_DAYS / self.SESSION_MINUTES)
+                shocks = np.empty((len(days), self.SESSION_MINUTES))
+                for month in months.unique():
+                    rows = months == month
+                    size = len(pd.bdate_range(month.start_time, month.end_time))
+                    rng = np.random.default_rng([self.seed, zlib.crc32(ticker.encode()), 2, month.ordinal])
+                    shocks[rows] = rng.standard_normal((size, self.SESSION_MINUTES))[positions[rows]]
+                walk = np.cumsum(shocks, axis=1)
+                bridge = walk - fraction * walk[:, -1:]
+                start_price, close = previous[:, j][:, None], daily[first:last, j][:, None]
+                path = start_price + fraction * (close - start_price) + minute_vol * bridge
+                bars[:, i + j] = np.exp(path[:, closes_at - 1]).ravel()[keep]
+        return pd.DataFrame(bars, index=times[keep], columns=tickers)
+
+    def _validate(self, ticker: str) -> str:
+        """
+        Checks that a ticker can be generated.
+
+        Parameters
+        ----------
+        ticker: str
+            Ticker of the asset.
+
+        Returns
+        -------
+        str
+            The stripped ticker.
+        """
+        ticker = ticker.strip()
+        if not ticker:
+            raise ValueError("An empty ticker does not exist")
+        return ticker
+
+    def _calendar(self, end: Optional[str]) -> pd.DatetimeIndex:
+        """
+        Business days from self.start up to end (exclusive, like
+        the yahoo finance API) or up to today.
+
+        Parameters
+        ----------
+        end: Optional[str]
+            Ending date, exclusive. ("None" gives up to today.)
+
+        Returns
+        -------
+        pd.DatetimeIndex
+            The trading days of the synthetic market.
+        """
+        if end is None:
+            last = pd.Timestamp.today().normalize()
+        else:
+            last = pd.Timestamp(end) - pd.Timedelta(days=1)
+        return pd.bdate_range(self.start, max(last, self.start - pd.Timedelta(days=1)))
+
+    def _market(self, length: int) -> np.ndarray:
+        """
+        Standard normal shocks of the common market factor.
+        Generated once and grown when a longer history is needed.
+
+        Parameters
+        ----------
+        length: int
+            Number of trading days required.
+
+        Returns
+        -------
+        np.ndarray
+            The first "length" market shocks.
+        """
+        if len(self._market_shocks) < length:
+            self._market_shocks = np.random.default_rng([self.seed, 0]).standard_normal(length)
+        return self._market_shocks[:length]
+
+    def _ticker_params(self, ticker: str) -> tuple[float, float, float, float]:
+        """
+        Drift, market beta, idiosyncratic volatility and first price
+        of a ticker, all annualised.
+
+        Parameters
+        ----------
+        ticker: str
+            Ticker of the asset.
+
+        Returns
+        -------
+        tuple[float, float, float, float]
+            drift, beta, idiosyncratic volatility, first price.
+        """
+        rng = np.random.default_rng([self.seed, zlib.crc32(ticker.encode()), 0])
+        pair = ticker.upper()
+        if pair.endswith("=X") and len(pair) == 8:
+            # Exchange rates do not drift, follow no market factor and start near a realistic level.
+            base, quote = pair[:3], pair[3:6]
+            level = self.CURRENCY_LEVELS.get(base, 1.0) / self.CURRENCY_LEVELS.get(quote, 1.0)
+            return 0.0, 0.0, self.FX_VOL, level * float(np.exp(rng.uniform(-0.1, 0.1)))
+        drift = rng.uniform(0.0, 0.15)
+        beta = rng.uniform(0.5, 1.5)
+        idio_vol = rng.uniform(0.10, 0.30)
+        start_price = float(np.exp(rng.uniform(np.log(10), np.log(500))))
+        return drift, beta, idio_vol, start_price
+
+    def _closes(self, tickers: list[str], length: int) -> np.ndarray:
+        """
+        Generates closing prices from self.start for a set of tickers.
+
+        Parameters
+        ----------
+        tickers: list[str]
+            The tickers to generate.
+        length: int
+            Number of trading days to generate.
+
+        Returns
+        -------
+        np.ndarray
+            A (length, len(tickers)) matrix of closing prices.
+        """
+        if length == 0:
+            return np.empty((0, len(tickers)))
+        drift, beta, idio_vol, start_price = np.array(
+            [self._ticker_params(ticker) for ticker in tickers],
+        ).T
+        dt = 1 / self.TRADING_DAYS
+        sigma2 = (beta * self.MARKET_VOL)**2 + idio_vol**2
+        # Prefixes of a generator are stable, so a longer history never changes older prices.
+        idio_shocks = np.column_stack([
+            np.random.default_rng([self.seed, zlib.crc32(ticker.encode()), 1]).standard_normal(length)
+            for ticker in tickers
+        ])
+        log_returns = (
+            (drift - 0.5 * sigma2) * dt
+            + np.sqrt(dt) * (beta * self.MARKET_VOL * self._market(length)[:, None]
+                             + idio_vol * idio_shocks)
+        )
+        log_returns[0] = 0.0
+        return start_price * np.exp(np.cumsum(log_returns, axis=0))
+
+
+class CachedProvider(MarketDataProvider):
+    """
+    Wraps another provider with a thread-safe, size-bounded LRU store
+    of names, quotes and closing prices, kept per ticker. However many
+    portfolios or requests ask for a ticker, it is retrieved once: a
+    request only fetches the tickers that are missing, in one batch, and
+    concurrent requests for the same ticker wait for and share the first
+    caller's result. Returned frames are shared between callers and must
+    not be modified in place.
+
+    Parameters
+    ----------
+    provider: MarketDataProvider
+        The provider to retrieve uncached data from.
+    maxsize: int
+        Maximum number of cached entries (one per ticker and request).
+    quote_ttl: float
+        Seconds a last price stays valid.
+    history_ttl: float
+        Seconds closing prices stay valid.
+
+    Attributes
+    ----------
+    provider: MarketDataProvider
+        Stored from the constructor.
+    maxsize: int
+        Stored from the constructor.
+    quote_ttl: float
+        Stored from the constructor.
+    history_ttl: float
+        Stored from the constructor.
+    """
+    def __init__(
+            self,
+            provider: MarketDataProvider,
+            maxsize: int=16384,
+            quote_ttl: float=60.0,
+            history_ttl: float=3600.0,
+    ):
+        self.provider = provider
+        self.maxsize = maxsize
+        self.quote_ttl = quote_ttl
+        self.history_ttl = history_ttl
+        self._cache: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._inflight: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def source(self) -> str:
+        return self.provider.source()
+
+    def long_name(self, ticker: str) -> str:
+        key = ("name", ticker)
+        return self._cached_many(
+            [key],
+            None,
+            lambda keys: {key: self.provider.long_name(ticker)},
+        )[key]
+
+    def last_price(self, ticker: str) -> float:
+        return self.last_prices([ticker]).iloc[0]
+
+    def currency(self, ticker: str) -> str:
+        return self.currencies([ticker]).iloc[0]
+
+    def currencies(self, tickers: list[str]) -> pd.Series:
+        tickers = list(dict.fromkeys(tickers))
+        keys = [("currency", ticker) for ticker in tickers]
+        currencies = self._cached_many(
+            keys,
+            None,
+            lambda missing: {
+                ("currency", ticker): currency
+                for ticker, currency in self.provider.currencies(
+                    [key[1] for key in missing],
+                ).items()
+            },
+        )
+        return pd.Series([currencies[key] for key in keys], index=tickers, dtype=object)
+
+    def last_prices(self, tickers: list[str]) -> pd.Series:
+        tickers = list(dict.fromkeys(tickers))
+        keys = [("quote", ticker) for ticker in tickers]
+        quotes = self._cached_many(
+            keys,
+            self.quote_ttl,
+            self._fetch_quotes,
+        )
+        return pd.Series([quotes[key] for key in keys], index=tickers)
+
+    def refresh_quotes(self, tickers: list[str]) -> pd.Series:
+        """
+        Retrieves the latest prices regardless of their age and stores
+        them, so later calls of last_price(s) return the fresh quotes.
+        Tickers already being retrieved by another thread are shared.
+
+        Parameters
+        ----------
+        tickers: list[str]
+            Tickers of the assets.
+
+        Returns
+        -------
+        pd.Series
+            The latest price per ticker.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        keys = [("quote", ticker) for ticker in tickers]
+        quotes = self._cached_many(
+            keys,
+            0.0,
+            self._fetch_quotes,
+        )
+        return pd.Series([quotes[key] for key in keys], index=tickers)
+
+    def download_close(
+            self,
+            tickers: list[str],
+            start: str,
+            end: Optional[str]=None,
+    ) -> pd.DataFrame:
+        if isinstance(tickers, str):
+            tickers = [tickers]
+        tickers = list(dict.fromkeys(tickers))
+        keys = [("close", ticker, start, end) for ticker in tickers]
+
+        def fetch(missing: list[Hashable]) -> dict[Hashable, pd.Series]:
+            closes = self.provider.download_close([key[1] for key in missing], start, end)
+            return {
+                key: closes[key[1]] if key[1] in closes else pd.Series(index=closes.index, dtype=float)
+                for key in missing
+            }
+
+        columns = self._cached_many(keys, self.history_ttl, fetch)
+        return pd.concat([columns[key] for key in keys], axis=1, keys=tickers)
+
+    def download_bars(
+            self,
+            tickers: list[str],
+            start: str,
+            end: Optional[str]=None,
+            interval: str="1m",
+    ) -> pd.DataFrame:
+        # Bars are too many to keep in memory, models.BarStore stores them on disk.
+        return self.provider.download_bars(tickers, start, end, interval)
+
+    def _fetch_quotes(self, missing: list[Hashable]) -> dict[Hashable, float]:
+        prices = self.provider.last_prices([key[1] for key in missing])
+        return {("quote", ticker): price for ticker, price in prices.items()}
+
+    def _cached_many(
+            self,
+            keys: list[Hashable],
+            ttl: Optional[float],
+            fetch: Callable[[list[Hashable]], dict[Hashable, Any]],
+    ) -> dict[Hashable, Any]:
+        """
+        Returns cached results, fetching all missing keys in a single
+        call. Keys already being fetched by another thread are not
+        fetched again, their result is awaited instead.
+
+        Parameters
+        ----------
+        keys: list[Hashable]
+            Identify the requested entries.
+        ttl: Optional[float]
+            Seconds a result stays valid, None is forever.
+        fetch: Callable[[list[Hashable]], dict[Hashable, Any]]
+            Retrieves the results of the missing keys.
+
+        Returns
+        -------
+        dict[Hashable, Any]
+            The (possibly shared) result per key.
+        """
+        results = {}
+        owned: dict[Hashable, Future] = {}
+        waiting: dict[Hashable, Future] = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                if key in self._cache:
+                    stored_at, value = self._cache[key]
+                    if ttl is None or now - stored_at < ttl:
+                        self._cache.move_to_end(key)
+                        results[key] = value
+                        continue
+                    del self._cache[key]
+                if key in self._inflight:
+                    waiting[key] = self._inflight[key]
+                else:
+                    owned[key] = self._inflight[key] = Future()
+
+        if owned:
+            try:
+                fetched = fetch(list(owned))
+                missing = [key for key in owned if key not in fetched]
+                if missing:
+                    raise KeyError(f"No data returned for {missing}")
+            except BaseException as e:
+                for future in owned.values():
+                    future.set_exception(e)
+                raise
+            else:
+                stored_at = time.monotonic()
+                with self._lock:
+                    for key in owned:
+                        self._cache[key] = (stored_at, fetched[key])
+                    while len(self._cache) > self.maxsize:
+                        self._cache.popitem(last=False)
+                for key, future in owned.items():
+                    future.set_result(fetched[key])
+                    results[key] = fetched[key]
+            finally:
+                with self._lock:
+                    for key in owned:
+                        del self._inflight[key]
+
+        # Only waited on after our own fetch, so two threads never wait on each other.
+        for key, future in waiting.items():
+            results[key] = future.result()
+        return results
+
+
+_PROVIDERS = {
+    "yahoo": YahooProvider,
+    "synthetic": SyntheticProvider,
+}
+_provider: Optional[MarketDataProvider] = None
+
+
+def create_provider(name: str) -> MarketDataProvider:
+    """
+    Creates a market data provider by name.
+
+    Parameters
+    ----------
+    name: str
+        One of the registered providers ("yahoo" or "synthetic").
+
+    Returns
+    -------
+    MarketDataProvider
+        A new provider.
+    """
+    if name not in _PROVIDERS:
+        raise ValueError(f"Unknown data provider {name}, choose one of {set(_PROVIDERS)}")
+    return _PROVIDERS[name]()
+
+
+def get_provider() -> MarketDataProvider:
+    """
+    Retrieves the application wide provider, created from
+    config.DATA_PROVIDER on first use.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    MarketDataProvider
+        The shared provider.
+    """
+    global _provider
+    if _provider is None:
+        _provider = create_provider(config.DATA_PROVIDER)
+    return _provider
+
+
+def set_provider(provider: MarketDataProvider) -> None:
+    """
+    Replaces the application wide provider.
+
+    Parameters
+    ----------
+    provider: MarketDataProvider
+        The provider to use from now on.
+
+    Returns
+    -------
+    None
+    """
+    global _provider
+    _provider = provider
@@ -1,6 +1,5 @@
 from models.Portfolio import Portfolio
 from typing import Optional, Tuple
-import yfinance as yf
 import numpy as np
 import pandas as pd
 
@@ -18,6 +17,11 @@ class MonteCarlo:
     portfolio: models.Portfolio
         Stored from the constructor.
     """
+    ENGINES = {"GBM", "Bootstrap"}
+    QUANTILES = [5, 25, 50, 75, 95]
+    # pandas frequency of the output dates per simulation step.
+    STEPS = {"Daily": "B", "Weekly": "W-FRI", "Monthly": "ME", "Quarterly": "QE"}
+
     def __init__(self, portfolio: Portfolio):
         self.portfolio = portfolio
 
@@ -28,6 +32,11 @@ class MonteCarlo:
             endDate: str,
             n: int=100000,
             months: int=12*15,
+            engine: str="GBM",
+            block_size: int=6,
+            step: str="Monthly",
+            seed: Optional[int]=None,
+            horizons: Optional[list[int]]=None,
     ) -> Tuple[pd.DataFrame, np._typing.NDArray[np.float64], pd.DatetimeIndex]:
         """
         Simulates the paths of a Monte Carlo simulation.
@@ -46,27 +55,294 @@ class MonteCarlo:
             Number of simulations to perform.
         months: int
             The number of months to perform each simulation for.
+        engine: str
+            "GBM" draws normal log returns, "Bootstrap" resamples
+            blocks of the historical returns.
+        block_size: int
+            Steps per resampled block (Bootstrap only).
+        step: str
+            Simulation step and frequency of the output dates, one of
+            Daily/Weekly/Monthly/Quarterly. Daily parameters are
+            scaled exactly to the trading days in every step, so the
+            statistics do not depend on the step, only the cost does.
+        seed: Optional[int]
+            Seed of the random numbers, None for a random seed.
+        horizons: Optional[list[int]]
+            Horizons in months (e.g. [12, 60, 120, 180]) that must be
+            dates of the simulation, so one run to the longest horizon
+            serves all of them, see horizon_statistics. The simulation
+            runs to the longest of months and the horizons.
         
         Returns
         -------
         Tuple[pd.DataFrame, np.typing.NDArray[np.float64], pd.DatetimeIndex]
             A tuple containing the historical data between startDate
-            and endDate, The monte Carlo simulations (months*n matrix),
-            The dates for the monte carlo simulations. (Not done in 
-            pandas df to save memory.)
+            and endDate (at the step frequency, the last date is the
+            start of the simulation), The monte Carlo
+            simulations (steps*n matrix), The dates for the monte carlo
+            simulations. (Not done in pandas df to save memory.)
         """
         portfolio_p = self.portfolio.get_portfolio_prices(restrictions, startDate, endDate)
-        portfolio_month_p = portfolio_p.resample('ME').last() 
-        log_returns = np.log(portfolio_p / portfolio_p.shift(1)).dropna()
+        return self.simulate_from_prices(
+            portfolio_p,
+            n=n,
+            months=months,
+            engine=engine,
+            block_size=block_size,
+            step=step,
+            seed=seed,
+            horizons=horizons,
+        )
+
+    @staticmethod
+    def simulate_from_prices(
+            portfolio_p: pd.DataFrame,
+            n: int=100000,
+            months: int=12*15,
+            engine: str="GBM",
+            block_size: int=6,
+            step: str="Monthly",
+            seed: Optional[int]=None,
+            horizons: Optional[list[int]]=None,
+    ) -> Tuple[pd.DataFrame, np._typing.NDArray[np.float64], pd.DatetimeIndex]:
+        """
+        Simulates the paths of a Monte Carlo simulation from an
+        already retrieved price history. Does not access market data,
+        so it can run in a separate worker process.
+
+        Parameters
+        ----------
+        portfolio_p: pd.DataFrame
+            NAV of the portfolio as returned by
+            models.Portfolio.get_portfolio_prices.
+        n: int
+            Number of simulations to perform.
+        months: int
+            The number of months to perform each simulation for.
+        engine: str
+            "GBM" or "Bootstrap", see simulate_paths.
+        block_size: int
+            Steps per resampled block (Bootstrap only).
+        step: str
+            Daily/Weekly/Monthly/Quarterly, see simulate_paths.
+        seed: Optional[int]
+            Seed of the random numbers, None for a random seed.
+        horizons: Optional[list[int]]
+            Horizons in months, see simulate_paths.
+
+        Returns
+        -------
+        Tuple[pd.DataFrame, np.typing.NDArray[np.float64], pd.DatetimeIndex]
+            See simulate_paths.
+        """
+        if engine not in MonteCarlo.ENGINES:
+            raise ValueError(f"Invalid engine {engine}, choose one of {MonteCarlo.ENGINES}")
+        if step not in MonteCarlo.STEPS:
+            raise ValueError(f"Invalid step {step}, choose one of {set(MonteCarlo.STEPS)}")
+        if step == "Daily":
+            portfolio_step_p = portfolio_p
+        else:
+            portfolio_step_p = portfolio_p.resample(MonteCarlo.STEPS[step]).last()
+            # The last step ends on the last date of the history, where the simulation starts.
+            portfolio_step_p.index = portfolio_step_p.index[:-1].append(portfolio_p.index[-1:])
+        log_returns = np.log(portfolio_p / portfolio_p.shift(1)).dropna().to_numpy().ravel()
 
-        mu = np.mean(log_returns)
-        sigma = np.std(log_returns)
         last_price = portfolio_p.iloc[-1].item()
         last_date = portfolio_p.index[-1]
+        future_index, step_days = MonteCarlo.future_steps(last_date, months, step, horizons)
+        rng = np.random.default_rng(seed)
 
-        random_shocks = np.random.normal(mu, sigma, size=(months, n))
+        if engine == "Bootstrap":
+            random_shocks = MonteCarlo.bootstrap_returns(log_returns, step_days, n, block_size, rng)
+        else:
+            # Sums of i.i.d. normal daily log returns: mean and variance scale with the days.
+            mu = np.mean(log_returns)
+            sigma = np.std(log_returns)
+            random_shocks = rng.normal(
+                (mu * step_days)[:, None],
+                (sigma * np.sqrt(step_days))[:, None],
+                size=(len(step_days), n),
+            )
         log_price_paths = np.cumsum(random_shocks, axis=0)
         price_paths = last_price * np.exp(log_price_paths)
 
-        future_index = pd.bdate_range(start=last_date, periods=months + 1, freq="ME")[1:]
-        return portfolio_month_p, price_paths, future_index
+        return portfolio_step_p, price_paths, future_index
+
+    @staticmethod
+    def future_steps(
+            last_date: pd.Timestamp,
+            months: int,
+            step: str,
+            horizons: Optional[list[int]]=None,
+    ) -> Tuple[pd.DatetimeIndex, np._typing.NDArray[np.int64]]:
+        """
+        Output dates of a simulation and the number of trading days in
+        every step. The dates follow the step frequency, and the last
+        date is always exactly "months" months after last_date. The
+        date of every horizon is added as well.
+
+        Parameters
+        ----------
+        last_date: pd.Timestamp
+            Last historical date, the start of the simulation.
+        months: int
+            The number of months to simulate.
+        step: str
+            Daily/Weekly/Monthly/Quarterly.
+        horizons: Optional[list[int]]
+            Extra horizons in months, the longest one extends months.
+
+        Returns
+        -------
+        Tuple[pd.DatetimeIndex, np.typing.NDArray[np.int64]]
+            The dates of the simulated steps, trading days (business
+            days) from the previous date up to and including each date.
+        """
+        if any(h < 1 for h in horizons or []):
+            raise ValueError("Horizons must be at least 1 month")
+        last_date = pd.Timestamp(last_date).tz_localize(None).normalize()
+        months = max([months, *(horizons or [])])
+        horizon = last_date + pd.DateOffset(months=months)
+        future_index = pd.date_range(last_date, horizon, freq=MonteCarlo.STEPS[step])
+        future_index = future_index[future_index > last_date]
+        future_index = future_index.union(
+            pd.DatetimeIndex([last_date + pd.DateOffset(months=h) for h in {months, *(horizons or [])}]),
+        )
+
+        previous = future_index[:-1].insert(0, last_date)
+        one_day = np.timedelta64(1, "D")
+        step_days = np.busday_count(
+            previous.values.astype("datetime64[D]") + one_day,
+            future_index.values.astype("datetime64[D]") + one_day,
+        )
+        return future_index, step_days
+
+    @staticmethod
+    def bootstrap_returns(
+            log_returns: np._typing.NDArray[np.float64],
+            step_days: np._typing.NDArray[np.int64],
+            n: int,
+            block_size: int,
+            rng: Optional[np.random.Generator]=None,
+    ) -> np._typing.NDArray[np.float64]:
+        """
+        Moving block bootstrap of historical log returns. Every path is
+        built from blocks of "block_size" consecutive historical steps,
+        so volatility clustering and fat tails of the history are kept.
+        The return of a step is a difference of the cumulative sum of
+        the daily returns, so all paths are a single gather of block
+        indices (no loop over paths), whatever the length of the steps.
+
+        Parameters
+        ----------
+        log_returns: np.typing.NDArray[np.float64]
+            Daily historical log returns.
+        step_days: np.typing.NDArray[np.int64]
+            Trading days in every simulation step.
+        n: int
+            Number of paths.
+        block_size: int
+            Steps per resampled block.
+        rng: Optional[np.random.Generator]
+            Source of the random numbers.
+
+        Returns
+        -------
+        np.typing.NDArray[np.float64]
+            A (steps, n) matrix of log returns per step.
+        """
+        if block_size < 1:
+            raise ValueError("Block size must be at least 1")
+        rng = rng if rng is not None else np.random.default_rng()
+        steps = len(step_days)
+        cumulative = np.concatenate(([0.0], np.cumsum(log_returns)))
+
+        n_blocks = -(-steps // block_size)
+        blocks = np.zeros(n_blocks * block_size, dtype=np.int64)
+        blocks[:steps] = step_days
+        blocks = blocks.reshape(n_blocks, block_size)
+        # Days from the start of a block to the start of each of its steps.
+        offsets = np.cumsum(blocks, axis=1) - blocks
+        n_starts = len(log_returns) - blocks.sum(axis=1) + 1
+        if (n_starts <= 0).any():
+            raise ValueError(
+                "Historical data is too short for the block size, choose an earlier start date",
+            )
+
+        starts = (rng.random((n_blocks, 1, n)) * n_starts[:, None, None]).astype(np.int64)
+        begin = (starts + offsets[:, :, None]).reshape(n_blocks * block_size, n)[:steps]
+        return cumulative[begin + step_days[:, None]] - cumulative[begin]
+
+    @staticmethod
+    def horizon_rows(
+            future_index: pd.DatetimeIndex,
+            start: pd.Timestamp,
+            horizons: list[int],
+    ) -> np._typing.NDArray[np.int64]:
+        """
+        Steps of a simulation that end at the horizons. A shorter
+        horizon is a prefix of the longest path, so its terminal
+        values are a row of the path matrix, no simulation is repeated.
+
+        Parameters
+        ----------
+        future_index: pd.DatetimeIndex
+            The dates of the simulated paths, simulated with these
+            horizons, see simulate_paths.
+        start: pd.Timestamp
+            Start of the simulation, the last date of the history.
+        horizons: list[int]
+            Horizons in months.
+
+        Returns
+        -------
+        np.typing.NDArray[np.int64]
+            The row of the path matrix per horizon.
+        """
+        start = pd.Timestamp(start).tz_localize(None).normalize()
+        rows = future_index.get_indexer([start + pd.DateOffset(months=h) for h in horizons])
+        if (rows < 0).any():
+            raise ValueError("The horizons are not dates of the simulation, pass them to simulate_paths")
+        return rows
+
+    @staticmethod
+    def horizon_statistics(
+            terminals: np._typing.NDArray[np.float64],
+            last_price: float,
+            horizons: list[int],
+            dates: pd.DatetimeIndex,
+    ) -> pd.DataFrame:
+        """
+        Summary of the terminal distributions of several horizons,
+        all computed at once over the (horizons, n) matrix.
+
+        Parameters
+        ----------
+        terminals: np.typing.NDArray[np.float64]
+            Simulated values at every horizon (one row per horizon),
+            e.g. the rows of horizon_rows of the path matrix.
+        last_price: float
+            Value at the start of the simulation.
+        horizons: list[int]
+            Horizons in months.
+        dates: pd.DatetimeIndex
+            Date of every horizon.
+
+        Returns
+        -------
+        pd.DataFrame
+            Per horizon (rows): the date, mean, MonteCarlo.QUANTILES,
+            probability of a loss and median annual return.
+        """
+        terminals = np.asarray(terminals)
+        years = np.asarray(horizons) / 12
+        summary = pd.DataFrame(
+            np.percentile(terminals, MonteCarlo.QUANTILES, axis=1).T,
+            index=[f"{y:g}Y" for y in years],
+            columns=[f"{q}%" for q in MonteCarlo.QUANTILES],
+        )
+        summary.insert(0, "Date", [str(date.date()) for date in dates])
+        summary.insert(1, "Mean", terminals.mean(axis=1))
+        summary["P(Loss)"] = (terminals < last_price).mean(axis=1)
+        summary["Median Annual Return"] = (summary["50%"].to_numpy() / last_price) ** (1 / years) - 1
+        return summary
@@ -0,0 +1,505 @@
+from models.FX import get_converter
+from models.Portfolio import Portfolio
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+
+
+class Optimizer:
+    """
+    Searches for better allocations of the assets of the portfolio:
+    the minimum variance portfolio, the maximum Sharpe ratio portfolio
+    and the efficient frontier. Uses the same closing prices as
+    models.Portfolio.get_portfolio_prices. Portfolios are long only and
+    fully invested, and can be constrained per asset class and sector.
+
+    The optimal portfolios and the frontier are solved exactly as
+    quadratic programs (see solve_qp). Random candidate portfolios only
+    show the feasible region in the graph: they are evaluated many at
+    once, their returns and volatilities are a few matrix products per
+    batch.
+
+    Parameters
+    ----------
+    portfolio: models.Portfolio
+        The portfolio whose assets are allocated.
+
+    Attributes
+    ----------
+    portfolio: models.Portfolio
+        Stored from the constructor.
+    """
+    TRADING_DAYS = 252
+    # Columns of the results before the weights.
+    STATISTICS = ["Return", "Volatility", "Sharpe"]
+
+    def __init__(self, portfolio: Portfolio):
+        self.portfolio = portfolio
+
+    def asset_returns(
+            self,
+            restrictions: Optional[dict[str, str]],
+            date1: str,
+            date2: Optional[str]=None,
+    ) -> pd.DataFrame:
+        """
+        Daily returns of the assets under "restrictions".
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            To filter the portfolio by asset class and/or sector.
+        date1: str
+            Starting date for the data.
+        date2: Optional[str]
+            Ending date for the data. ("None" retrieves most recent.)
+
+        Returns
+        -------
+        pd.DataFrame
+            Daily returns per date (rows) and ticker (columns), of
+            the prices in the base currency.
+        """
+        weights, _, _ = self.portfolio.get_portfolio_weights(restrictions)
+        tickers = list(weights.keys())
+        if len(tickers) == 0:
+            raise ValueError("No assets to optimize")
+        marketData = self.portfolio.provider.download_close(tickers, date1, date2)[tickers]
+        marketData = get_converter(self.portfolio.provider).convert_prices(marketData.dropna())
+        return marketData.pct_change().dropna()
+
+    def asset_groups(self, tickers: list[str]) -> dict[str, dict[str, str]]:
+        """
+        Asset class and sector of every ticker, the groups that
+        can be constrained.
+
+        Parameters
+        ----------
+        tickers: list[str]
+            Tickers in the portfolio.
+
+        Returns
+        -------
+        dict[str, dict[str, str]]
+            Group per ticker, for "asset_class" and "sector".
+        """
+        return {
+            "asset_class": {ticker: self.portfolio.assets[ticker].asset_class for ticker in tickers},
+            "sector": {ticker: self.portfolio.assets[ticker].sector for ticker in tickers},
+        }
+
+    def optimize(
+            self,
+            restrictions: Optional[dict[str, str]],
+            date1: str,
+            date2: Optional[str]=None,
+            n: int=100000,
+            constraints: Optional[dict[str, dict[str, Tuple[float, float]]]]=None,
+            risk_free: float=0.0,
+            seed: Optional[int]=None,
+    ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """
+        Optimizes the allocation of the assets under "restrictions".
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            To filter the portfolio by asset class and/or sector.
+        date1: str
+            Starting date for the data.
+        date2: Optional[str]
+            Ending date for the data. ("None" retrieves most recent.)
+        n: int
+            Number of candidate portfolios.
+        constraints: Optional[dict[str, dict[str, Tuple[float, float]]]]
+            Minimum and maximum total weight per group, e.g.
+            {"asset_class": {"Equities": (0.0, 0.6)},
+            "sector": {"Energy": (0.1, 1.0)}}.
+        risk_free: float
+            Annual risk free rate for the Sharpe ratio.
+        seed: Optional[int]
+            Seed of the random numbers, None for a random seed.
+
+        Returns
+        -------
+        Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]
+            See optimize_returns.
+        """
+        returns = self.asset_returns(restrictions, date1, date2)
+        weights, _, _ = self.portfolio.get_portfolio_weights(restrictions)
+        return self.optimize_returns(
+            returns,
+            pd.Series(weights),
+            self.asset_groups(list(returns.columns)),
+            n=n,
+            constraints=constraints,
+            risk_free=risk_free,
+            seed=seed,
+        )
+
+    @staticmethod
+    def optimize_returns(
+            returns: pd.DataFrame,
+            current: pd.Series,
+            groups: dict[str, dict[str, str]],
+            n: int=100000,
+            constraints: Optional[dict[str, dict[str, Tuple[float, float]]]]=None,
+            risk_free: float=0.0,
+            seed: Optional[int]=None,
+            batch_size: int=20000,
+            frontier_points: int=50,
+            cloud_size: int=5000,
+    ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """
+        Optimizes from already retrieved returns. Does not access
+        market data, so it can run in a separate worker process.
+
+        Parameters
+        ----------
+        returns: pd.DataFrame
+            Daily returns per date (rows) and ticker (columns).
+        current: pd.Series
+            Current weight per ticker.
+        groups: dict[str, dict[str, str]]
+            Group of every ticker, per kind of group ("asset_class"
+            and "sector").
+        n: int
+            Number of candidate portfolios.
+        constraints: Optional[dict[str, dict[str, Tuple[float, float]]]]
+            Minimum and maximum total weight per group, see optimize.
+        risk_free: float
+            Annual risk free rate for the Sharpe ratio.
+        seed: Optional[int]
+            Seed of the random numbers, None for a random seed.
+        batch_size: int
+            Candidates evaluated per matrix product, bounds the memory.
+        frontier_points: int
+            Number of return levels of the frontier.
+        cloud_size: int
+            Number of feasible candidates returned for plotting.
+
+        Returns
+        -------
+        Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]
+            The current, minimum variance and maximum Sharpe
+            portfolios (rows), the efficient frontier (one row per
+            point, increasing return) and a sample of feasible
+            candidates. Columns are the annual return, volatility,
+            Sharpe ratio and the weight per ticker.
+        """
+        if n < 1:
+            raise ValueError("Provide at least 1 candidate")
+        tickers = list(returns.columns)
+        k = len(tickers)
+        mu = returns.mean().to_numpy() * Optimizer.TRADING_DAYS
+        cov = returns.cov().to_numpy() * Optimizer.TRADING_DAYS
+        membership, lower, upper = Optimizer.constraint_matrix(tickers, groups, constraints)
+        columns = Optimizer.STATISTICS + tickers
+
+        def records(weights: np._typing.NDArray[np.float64]) -> np._typing.NDArray[np.float64]:
+            port_returns, port_vols = Optimizer.evaluate(weights, mu, cov)
+            sharpe = Optimizer.sharpe(port_returns, port_vols, risk_free)
+            return np.column_stack((port_returns, port_vols, sharpe, weights))
+
+        # Long only and the group bounds as G w <= h, fully invested as sum(w) = 1.
+        G = np.vstack((-np.eye(k), membership, -membership))
+        h = np.concatenate((np.zeros(k), upper, -lower))
+        budget, zeros = np.ones((1, k)), np.zeros(k)
+        try:
+            min_variance = Optimizer.normalise(Optimizer.solve_qp(cov, zeros, budget, np.ones(1), G, h))
+            max_return = Optimizer.normalise(
+                Optimizer.solve_qp(np.zeros((k, k)), -mu, budget, np.ones(1), G, h),
+            )
+        except ValueError:
+            raise ValueError("No allocation satisfies the constraints, loosen them")
+
+        # Minimum variance per return level, from the minimum variance to the maximum return.
+        frontier = [min_variance]
+        for target in np.linspace(mu @ min_variance, mu @ max_return, frontier_points)[1:-1]:
+            try:
+                weights = Optimizer.solve_qp(
+                    cov, zeros, np.vstack((budget, mu)), np.array([1.0, target]), G, h,
+                )
+            except ValueError:
+                continue
+            frontier.append(Optimizer.normalise(weights))
+        frontier.append(max_return)
+        frontier = records(np.array(frontier))
+        frontier = frontier[np.argsort(frontier[:, 0], kind="stable")]
+
+        excess = mu - risk_free
+        if excess @ max_return > 0 and k > 1:
+            # Maximising the Sharpe ratio is a quadratic program in y = w / (excess' w): minimise
+            # y' cov y with excess' y = 1, and the (homogeneous) bounds scaled by sum(y).
+            sharpe_G = np.vstack((-np.eye(k), membership - upper[:, None], lower[:, None] - membership))
+            try:
+                best_sharpe = records(Optimizer.normalise(Optimizer.solve_qp(
+                    cov, zeros, excess[None, :], np.ones(1), sharpe_G, np.zeros(len(sharpe_G)),
+                ))[None, :])[0]
+            except ValueError:
+                best_sharpe = frontier[np.nanargmax(frontier[:, 2])]
+        else:
+            # No allocation beats the risk free rate, the best point of the frontier is taken.
+            best_sharpe = frontier[np.nanargmax(frontier[:, 2])] if np.isfinite(frontier[:, 2]).any() else frontier[0]
+
+        rng = np.random.default_rng(seed)
+        cloud = []
+        for start in range(0, n, batch_size):
+            size = min(batch_size, n - start)
+            candidates = Optimizer.sample_weights(k, size, rng)
+            exposure = candidates @ membership.T
+            feasible = ((exposure >= lower - 1e-12) & (exposure <= upper + 1e-12)).all(axis=1)
+            candidates = candidates[feasible]
+            keep = min(len(candidates), -(-cloud_size * size // n))
+            cloud.append(records(candidates[rng.choice(len(candidates), size=keep, replace=False)]))
+
+        current = current.reindex(tickers).fillna(0.0).to_numpy()
+        portfolios = pd.DataFrame(
+            [records(current[None, :])[0], records(min_variance[None, :])[0], best_sharpe],
+            index=["Current", "Min Variance", "Max Sharpe"],
+            columns=columns,
+        )
+        return (
+            portfolios,
+            pd.DataFrame(frontier, columns=columns),
+            pd.DataFrame(np.concatenate(cloud), columns=columns),
+        )
+
+    @staticmethod
+    def solve_qp(
+            Q: np._typing.NDArray[np.float64],
+            c: np._typing.NDArray[np.float64],
+            A: np._typing.NDArray[np.float64],
+            b: np._typing.NDArray[np.float64],
+            G: np._typing.NDArray[np.float64],
+            h: np._typing.NDArray[np.float64],
+            tolerance: float=1e-10,
+            max_iterations: int=100,
+    ) -> np._typing.NDArray[np.float64]:
+        """
+        Solves the convex quadratic program: minimise 1/2 x'Qx + c'x
+        subject to Ax = b and Gx <= h.
+
+        Parameters
+        ----------
+        Q: np.typing.NDArray[np.float64]
+            Positive semidefinite (k, k) matrix.
+        c: np.typing.NDArray[np.float64]
+            Linear term, k values.
+        A: np.typing.NDArray[np.float64]
+            Equality constraints, a (p, k) matrix.
+        b: np.typing.NDArray[np.float64]
+            Right hand side of the equalities.
+        G: np.typing.NDArray[np.float64]
+            Inequality constraints, a (m, k) matrix.
+        h: np.typing.NDArray[np.float64]
+            Right hand side of the inequalities.
+        tolerance: float
+            Residuals and duality gap (relative) at which x is optimal.
+        max_iterations: int
+            Maximum number of Newton steps.
+
+        Returns
+        -------
+        np.typing.NDArray[np.float64]
+            The optimal x.
+
+        Raises
+        ------
+        ValueError
+            If the constraints cannot be satisfied (no convergence).
+
+        Notes
+        -----
+        Primal-dual interior point method with Mehrotra's predictor
+        corrector steps. Every step solves one dense (k + p) system,
+        the slacks and multipliers of the inequalities are eliminated.
+        Converges in a few tens of steps regardless of k.
+        """
+        k, p, m = len(c), len(b), len(h)
+        x = np.zeros(k)
+        y = np.zeros(p)
+        s = np.maximum(h - G @ x, 1.0)
+        z = np.ones(m)
+        scale = 1.0 + max(np.abs(c).max(initial=0.0), np.abs(b).max(initial=0.0), np.abs(h).max(initial=0.0))
+
+        def max_step(values: np._typing.NDArray[np.float64], steps: np._typing.NDArray[np.float64]) -> float:
+            shrinking = steps < 0
+            return min(1.0, (-values[shrinking] / steps[shrinking]).min(initial=np.inf))
+
+        # An infeasible program diverges: stop at the first overflow instead of warning.
+        with np.errstate(all="ignore"):
+            for _ in range(max_iterations):
+                if not (np.isfinite(x).all() and np.isfinite(z).all()):
+                    break
+                r_dual = Q @ x + c + A.T @ y + G.T @ z
+                r_eq = A @ x - b
+                r_ineq = G @ x + s - h
+                gap = s @ z / m
+                if (max(np.abs(r_dual).max(), np.abs(r_eq).max(initial=0.0), np.abs(r_ineq).max()) <= tolerance * scale
+                        and gap <= tolerance * scale):
+                    return x
+
+                weight = z / s
+                kkt = np.block([[Q + (G.T * weight) @ G, A.T], [A, np.zeros((p, p))]])
+
+                def newton(r_comp: np._typing.NDArray[np.float64]) -> Tuple[np._typing.NDArray[np.float64], ...]:
+                    rhs = np.concatenate((-r_dual - G.T @ ((z * r_ineq - r_comp) / s), -r_eq))
+                    try:
+                        step = np.linalg.solve(kkt, rhs)
+                    except np.linalg.LinAlgError:
+                        step = np.linalg.lstsq(kkt, rhs, rcond=None)[0]
+                    dx, dy = step[:k], step[k:]
+                    dz = (z * r_ineq - r_comp) / s + weight * (G @ dx)
+                    return dx, dy, -r_ineq - G @ dx, dz
+
+                # Predictor: the affine scaling direction, it sets the centering of the corrector.
+                _, _, ds, dz = newton(s * z)
+                alpha = min(max_step(s, ds), max_step(z, dz))
+                sigma = ((s + alpha * ds) @ (z + alpha * dz) / m / gap) ** 3
+                dx, dy, ds, dz = newton(s * z + ds * dz - sigma * gap)
+                alpha = min(1.0, 0.99 * min(max_step(s, ds), max_step(z, dz)))
+                x, y, s, z = x + alpha * dx, y + alpha * dy, s + alpha * ds, z + alpha * dz
+        raise ValueError("The quadratic program did not converge, its constraints may be infeasible")
+
+    @staticmethod
+    def normalise(weights: np._typing.NDArray[np.float64]) -> np._typing.NDArray[np.float64]:
+        """
+        Removes the rounding of a solution: long only weights that sum
+        to 1.
+
+        Parameters
+        ----------
+        weights: np.typing.NDArray[np.float64]
+            Weights per ticker, as solved (slightly negative weights
+            or a sum slightly off 1).
+
+        Returns
+        -------
+        np.typing.NDArray[np.float64]
+            Non-negative weights per ticker that sum to 1.
+        """
+        weights = np.maximum(weights, 0.0)
+        return weights / weights.sum()
+
+    @staticmethod
+    def constraint_matrix(
+            tickers: list[str],
+            groups: dict[str, dict[str, str]],
+            constraints: Optional[dict[str, dict[str, Tuple[float, float]]]],
+    ) -> Tuple[np._typing.NDArray[np.float64], np._typing.NDArray[np.float64], np._typing.NDArray[np.float64]]:
+        """
+        Turns the constraints into a group x ticker membership matrix
+        and bounds, so the total weight of every group of many
+        candidates is one matrix product.
+
+        Parameters
+        ----------
+        tickers: list[str]
+            The tickers, in the order of the weights.
+        groups: dict[str, dict[str, str]]
+            Group of every ticker, per kind of group.
+        constraints: Optional[dict[str, dict[str, Tuple[float, float]]]]
+            Minimum and maximum total weight per group.
+
+        Returns
+        -------
+        Tuple[np.typing.NDArray[np.float64], np.typing.NDArray[np.float64], np.typing.NDArray[np.float64]]
+            Membership (groups x tickers), lower and upper bounds.
+        """
+        rows, lower, upper = [], [], []
+        for kind, bounds in (constraints or {}).items():
+            if kind not in groups:
+                raise ValueError(f"Invalid constraint {kind}, choose one of {set(groups)}")
+            for group, (low, high) in bounds.items():
+                if not 0 <= low <= high <= 1:
+                    raise ValueError(f"Bounds of {group} must satisfy 0 <= min <= max <= 1")
+                rows.append([float(groups[kind][ticker] == group) for ticker in tickers])
+                lower.append(low)
+                upper.append(high)
+        membership = np.array(rows, dtype=float).reshape(len(rows), len(tickers))
+        return membership, np.array(lower, dtype=float), np.array(upper, dtype=float)
+
+    @staticmethod
+    def sample_weights(
+            k: int,
+            n: int,
+            rng: np.random.Generator,
+    ) -> np._typing.NDArray[np.float64]:
+        """
+        Random long only, fully invested portfolios. Half are drawn
+        uniformly from all allocations, half are concentrated in a few
+        assets, so the extremes of the frontier are reached as well.
+
+        Parameters
+        ----------
+        k: int
+            Number of assets.
+        n: int
+            Number of portfolios.
+        rng: np.random.Generator
+            Source of the random numbers.
+
+        Returns
+        -------
+        np.typing.NDArray[np.float64]
+            A (n, k) matrix of weights, every row sums to 1.
+        """
+        alpha = np.where(np.arange(n) % 2 == 0, 1.0, 0.1)[:, None]
+        # A Dirichlet sample is a normalised Gamma sample, drawn for all rows at once.
+        weights = rng.standard_gamma(np.broadcast_to(alpha, (n, k)))
+        weights += 1e-300
+        return weights / weights.sum(axis=1, keepdims=True)
+
+    @staticmethod
+    def evaluate(
+            weights: np._typing.NDArray[np.float64],
+            mu: np._typing.NDArray[np.float64],
+            cov: np._typing.NDArray[np.float64],
+    ) -> Tuple[np._typing.NDArray[np.float64], np._typing.NDArray[np.float64]]:
+        """
+        Annual return and volatility of many portfolios at once.
+
+        Parameters
+        ----------
+        weights: np.typing.NDArray[np.float64]
+            A (n, k) matrix of weights.
+        mu: np.typing.NDArray[np.float64]
+            Annual expected return per asset.
+        cov: np.typing.NDArray[np.float64]
+            Annual covariance matrix of the assets.
+
+        Returns
+        -------
+        Tuple[np.typing.NDArray[np.float64], np.typing.NDArray[np.float64]]
+            Return and volatility per portfolio.
+        """
+        variances = np.einsum("ij,ij->i", weights @ cov, weights)
+        return weights @ mu, np.sqrt(np.maximum(variances, 0.0))
+
+    @staticmethod
+    def sharpe(
+            returns: np._typing.NDArray[np.float64],
+            vols: np._typing.NDArray[np.float64],
+            risk_free: float,
+    ) -> np._typing.NDArray[np.float64]:
+        """
+        Sharpe ratio per portfolio.
+
+        Parameters
+        ----------
+        returns: np.typing.NDArray[np.float64]
+            Expected annual return per portfolio.
+        vols: np.typing.NDArray[np.float64]
+            Annual volatility per portfolio.
+        risk_free: float
+            Annual risk free rate.
+
+        Returns
+        -------
+        np.typing.NDArray[np.float64]
+            Excess return per unit of volatility, NaN for a zero
+            volatility.
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(vols > 0, (returns - risk_free) / vols, np.nan)
@@ -1,7 +1,11 @@
 from models.Asset import Asset
+from models.BarStore import BarStore
+from models.FX import get_converter
+from models.MarketData import MarketDataProvider, get_provider
+from datetime import date
 from typing import Optional, Tuple
+import numpy as np
 import pandas as pd
-import yfinance as yf
 
 
 class Portfolio:
@@ -10,15 +14,30 @@ class Portfolio:
 
     Parameters
     ----------
-    None
+    provider: Optional[models.MarketData.MarketDataProvider]
+        Source of market data, defaults to the application wide provider.
 
     Attributes
     ----------
     assets: dict[str, Asset]
         Storage for the assets.
+    provider: models.MarketData.MarketDataProvider
+        Stored from the constructor.
+    sales: list[tuple]
+        Ledger of the sales, one SALE_COLUMNS tuple per sale.
+        Prices and realised profits are in the currency of the asset.
+    closed: list[tuple]
+        Purchases of the assets that have been sold entirely, one
+        PURCHASE_COLUMNS tuple per purchase.
     """
-    def __init__(self):
+    SALE_COLUMNS = ["ticker", "asset_class", "sector", "date", "quantity", "price", "realised"]
+    PURCHASE_COLUMNS = ["ticker", "asset_class", "sector", "date", "quantity", "price"]
+
+    def __init__(self, provider: Optional[MarketDataProvider]=None):
         self.assets = {}
+        self.provider = provider if provider is not None else get_provider()
+        self.sales = []
+        self.closed = []
     
     def get_portfolio_weights(
             self,
@@ -109,6 +128,8 @@ class Portfolio:
             restrictions: Optional[dict[str, str]],
             date1: str,
             date2: Optional[str]=None,
+            interval: Optional[str]=None,
+            rule: Optional[str]=None,
     ) -> pd.DataFrame:
         """
         Get prices of the portfolio (or a subset of it).
@@ -122,20 +143,261 @@ class Portfolio:
             Starting date for the data.
         date2: Optional[str]
             Ending date for the data. ("None" retrieves most recent.)
+        interval: Optional[str]
+            Intraday bars ("1m", "5m" or "1h") from the bar store
+            instead of daily closes, see models.BarStore.
+        rule: Optional[str]
+            Frequency to resample the bars to (e.g. "15min" or "4h").
 
         Returns
         -------
         pd.DataFrame
             A dataframe containing the NAV of
-            the rebalanced filtered portfolio.
+            the rebalanced filtered portfolio, in the base currency.
+
+        Notes
+        -----
+        Intraday prices are converted at the daily exchange rate.
         """
         weights, _, _ = self.get_portfolio_weights(restrictions)
         tickers = list(weights.keys())
-        marketData = yf.download(tickers, start=date1, end=date2, progress=False, auto_adjust=False)
-        marketData = marketData["Close"][tickers]
-        marketData.dropna(inplace=True)
+        if interval is None:
+            marketData = self.provider.download_close(tickers, date1, date2)[tickers].dropna()
+        else:
+            # Assets trading in other sessions keep their last close.
+            marketData = BarStore(self.provider).bars(tickers, date1, date2, interval, rule)[tickers]
+            marketData = marketData.ffill().dropna()
+        marketData = get_converter(self.provider).convert_prices(marketData)
         return marketData.mul(pd.Series(weights)).sum(axis=1).to_frame("Portfolio Price")
     
+    def sell(
+            self,
+            ticker: str,
+            quantity: float,
+            price: float,
+            method: str="FIFO",
+            sale_date: Optional[str]=None,
+    ) -> float:
+        """
+        Sells a quantity of an asset, the lots are matched by "method".
+        An asset sold entirely is removed from the portfolio, its
+        realised profit stays in self.sales.
+
+        Parameters
+        ----------
+        ticker: str
+            Ticker of the asset.
+        quantity: float
+            Quantity to sell, at most the quantity held.
+        price: float
+            Sale price, in the currency of the asset.
+        method: str
+            Lot matching rule: FIFO, LIFO or Average.
+        sale_date: Optional[str]
+            Date of the sale (YYYY-MM-DD), defaults to today.
+
+        Returns
+        -------
+        float
+            Realised profit of the sale, in the currency of the asset.
+
+        Notes
+        -----
+        Adjusts self.assets, self.sales and self.closed.
+        """
+        if ticker not in self.assets:
+            raise ValueError(f"{ticker} is not in the portfolio")
+        asset = self.assets[ticker]
+        realised = asset.sell(quantity, price, method)
+        self.sales.append(
+            (ticker, asset.asset_class, asset.sector, sale_date or str(date.today()), quantity, price, realised),
+        )
+        if not asset.lots:
+            self.close_asset(ticker)
+        return realised
+
+    def process_trades(self, trades: pd.DataFrame, method: str="FIFO") -> pd.Series:
+        """
+        Applies a batch of buys and sells of assets in the portfolio,
+        in the order of the rows. Either all trades are applied or,
+        on an invalid trade, none.
+
+        Parameters
+        ----------
+        trades: pd.DataFrame
+            Columns ticker, side (BUY or SELL), quantity, price
+            (in the currency of the asset) and optionally date
+            (YYYY-MM-DD, defaults to today).
+        method: str
+            Lot matching rule of the sells: FIFO, LIFO or Average.
+
+        Returns
+        -------
+        pd.Series
+            Realised profit per trade (0 for buys), in the currency
+            of the asset.
+
+        Notes
+        -----
+        Adjusts self.assets, self.sales and self.closed. Lot matching is sequential,
+        the realised profits are computed from all matched lots at once.
+        """
+        tickers = trades["ticker"].to_numpy()
+        sides = trades["side"].str.upper().to_numpy()
+        quantities = trades["quantity"].to_numpy(dtype=float)
+        prices = trades["price"].to_numpy(dtype=float)
+        dates = (trades["date"].astype(str).to_numpy() if "date" in trades
+                 else np.full(len(trades), str(date.today())))
+        missing = set(tickers) - set(self.assets)
+        if missing:
+            raise ValueError(f"Not in the portfolio, ADD them first: {' '.join(sorted(missing))}")
+        invalid = set(sides) - {"BUY", "SELL"}
+        if invalid:
+            raise ValueError(f"Invalid side {' '.join(sorted(invalid))}, use BUY or SELL")
+
+        queues = {}
+        for ticker in set(tickers):
+            asset = self.assets[ticker]
+            # Applied to copies, so an invalid trade leaves the lots of the assets untouched.
+            queues[ticker] = asset.lots.copy()
+        rows, sold, costs, bought = [], [], [], []
+        trades_list = zip(tickers.tolist(), sides.tolist(), quantities.tolist(), prices.tolist(), dates.tolist())
+        for row, (ticker, side, quantity, price, day) in enumerate(trades_list):
+            if side == "BUY":
+                queues[ticker].buy(quantity, price, day)
+                bought.append((ticker, day, quantity, price))
+            else:
+                for matched, cost in queues[ticker].sell(quantity, method):
+                    rows.append(row)
+                    sold.append(matched)
+                    costs.append(cost)
+
+        rows = np.asarray(rows, dtype=int)
+        realised = np.bincount(
+            rows,
+            weights=np.asarray(sold) * (prices[rows] - np.asarray(costs)),
+            minlength=len(trades),
+        )
+        classes = {ticker: (self.assets[ticker].asset_class, self.assets[ticker].sector) for ticker in queues}
+        for ticker, day, quantity, price in bought:
+            self.assets[ticker].purchases.append((day, quantity, price))
+        # Assets without holdings have no value to scale, their unit values are retrieved in one batch.
+        unpriced = [ticker for ticker in queues if not self.assets[ticker].held]
+        unit_values = (get_converter(self.provider).convert_values(self.provider.last_prices(unpriced))
+                       if unpriced else pd.Series(dtype=float))
+        for ticker, queue in queues.items():
+            asset = self.assets[ticker]
+            held = asset.held
+            asset.set_lots(queue, asset.current_value / held if held else float(unit_values[ticker]))
+            if not asset.lots:
+                self.close_asset(ticker)
+
+        sells = sides == "SELL"
+        sold_tickers = tickers[sells].tolist()
+        self.sales.extend(zip(
+            sold_tickers,
+            [classes[ticker][0] for ticker in sold_tickers],
+            [classes[ticker][1] for ticker in sold_tickers],
+            dates[sells].tolist(),
+            quantities[sells].tolist(),
+            prices[sells].tolist(),
+            realised[sells].tolist(),
+        ))
+        return pd.Series(realised, index=trades.index, name="realised")
+
+    def close_asset(self, ticker: str) -> None:
+        """
+        Removes an asset that has been sold entirely, its purchases
+        are kept in self.closed for the returns of the portfolio.
+
+        Parameters
+        ----------
+        ticker: str
+            Ticker of the asset.
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Adjusts self.assets and self.closed.
+        """
+        asset = self.assets.pop(ticker)
+        self.closed.extend(
+            (ticker, asset.asset_class, asset.sector, *purchase) for purchase in asset.purchases
+        )
+
+    def pnl(self, restrictions: Optional[dict[str, str]]=None) -> pd.DataFrame:
+        """
+        Realised and unrealised profit per asset (including assets
+        sold entirely), in the base currency.
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            To filter the assets by asset class and/or sector.
+
+        Returns
+        -------
+        pd.DataFrame
+            Columns Quantity, Cost, Value, Realised, Unrealised and
+            Total indexed by ticker.
+
+        Notes
+        -----
+        Amounts in the currency of the asset are converted at the
+        latest exchange rate, also realised profits of past sales.
+        """
+        columns = ["Quantity", "Cost", "Value", "Realised", "Unrealised", "Total"]
+        held = pd.DataFrame(
+            [(ticker, asset.asset_class, asset.sector, asset.held, asset.transaction_value, asset.current_value)
+             for ticker, asset in self.assets.items()],
+            columns=["ticker", "asset_class", "sector", "quantity", "cost", "value"],
+        )
+        sales = pd.DataFrame(self.sales, columns=self.SALE_COLUMNS)
+        for key, value in (restrictions or {}).items():
+            held = held[held[key] == value]
+            sales = sales[sales[key] == value]
+        held = held.set_index("ticker")
+        realised = sales.groupby("ticker", sort=False)["realised"].sum()
+        tickers = held.index.append(realised.index.difference(held.index))
+        if tickers.empty:
+            return pd.DataFrame(columns=columns, dtype=float)
+
+        rates = get_converter(self.provider).latest_rates(list(tickers)).to_numpy()
+        table = pd.DataFrame(index=tickers, columns=columns, dtype=float)
+        table["Quantity"] = held["quantity"].reindex(tickers, fill_value=0)
+        table["Cost"] = held["cost"].reindex(tickers, fill_value=0).to_numpy() * rates
+        table["Value"] = held["value"].reindex(tickers, fill_value=0)
+        table["Realised"] = realised.reindex(tickers, fill_value=0).to_numpy() * rates
+        table["Unrealised"] = table["Value"] - table["Cost"]
+        table["Total"] = table["Realised"] + table["Unrealised"]
+        table.index.name = "Ticker"
+        return table
+
+    def remove_asset(self, ticker: str) -> Asset:
+        """
+        Removes an asset from the portfolio entirely, as if it was
+        never bought (unlike a sale, nothing is kept in self.closed).
+
+        Parameters
+        ----------
+        ticker: str
+            Ticker of the asset.
+
+        Returns
+        -------
+        models.Asset
+            The removed asset.
+
+        Raises
+        ------
+        KeyError
+            If the ticker is not in the portfolio.
+        """
+        return self.assets.pop(ticker)
+
     def delete_asset(self, ticker: str) -> None:
         """
         Deletes an asset from the portfolio.
@@ -154,7 +416,7 @@ class Portfolio:
         Prints to the terminal.
         """
         if ticker in self.assets:
-            del self.assets[ticker]
+            self.remove_asset(ticker)
             print("Ticker deleted")
         else:
             collection_of_assets = ""
@@ -0,0 +1,253 @@
+from models.FX import get_converter
+from models.MarketData import CachedProvider, MarketDataProvider, get_provider
+from models.Portfolio import Portfolio
+from typing import Optional
+import numpy as np
+import pandas as pd
+import threading
+
+
+class PortfolioManager:
+    """
+    Manages named portfolios (books) side by side. All books share one
+    CachedProvider, so a ticker is retrieved once no matter how many
+    books hold it. Cross-portfolio operations retrieve the union of all
+    tickers in a single request and compute all books at once as
+    book x ticker matrices.
+
+    Parameters
+    ----------
+    provider: Optional[models.MarketData.MarketDataProvider]
+        Source of market data, wrapped in a shared cache.
+        Defaults to the application wide provider.
+
+    Attributes
+    ----------
+    provider: models.MarketData.CachedProvider
+        The store shared by all books.
+    portfolios: dict[str, models.Portfolio]
+        Storage for the books by name.
+    fx: models.FX.FXConverter
+        Converts prices to the base currency, with the exchange rates
+        cached in the shared store.
+    lock: threading.RLock
+        Held while the books or their assets change, e.g. by a trade
+        or by a models.QuoteRefresher revaluing them from another
+        thread.
+    """
+    def __init__(self, provider: Optional[MarketDataProvider]=None):
+        provider = provider if provider is not None else get_provider()
+        if not isinstance(provider, CachedProvider):
+            provider = CachedProvider(provider)
+        self.provider = provider
+        self.portfolios = {}
+        self.fx = get_converter(provider)
+        self.lock = threading.RLock()
+
+    def get_or_create(self, name: str) -> Portfolio:
+        """
+        Retrieves a book, creating an empty one if it does not exist.
+
+        Parameters
+        ----------
+        name: str
+            Name of the book.
+
+        Returns
+        -------
+        models.Portfolio
+            The book.
+        """
+        with self.lock:
+            if name not in self.portfolios:
+                self.portfolios[name] = Portfolio(self.provider)
+            return self.portfolios[name]
+
+    def delete_portfolio(self, name: str) -> None:
+        """
+        Deletes a book.
+
+        Parameters
+        ----------
+        name: str
+            Name of the book.
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Prints to the terminal.
+        """
+        if name in self.portfolios:
+            with self.lock:
+                del self.portfolios[name]
+            print("Portfolio deleted")
+        else:
+            print(
+                f"Portfolio not present, so no deletion.\n"
+                f"Delete options: {' '.join(self.portfolios)}"
+            )
+
+    def holdings(self, restrictions: Optional[dict[str, str]]=None) -> pd.DataFrame:
+        """
+        Quantity held per book and ticker.
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            Contains the Asset Class and/or the Sector.
+            Used to filter the Assets.
+
+        Returns
+        -------
+        pd.DataFrame
+            A book x ticker matrix of quantities, 0 if not held.
+        """
+        restrictions = restrictions or {}
+        with self.lock:
+            quantities = {
+                name: {
+                    ticker: asset.held
+                    for ticker, asset in portfolio.assets.items()
+                    if (asset.sector == restrictions.get("sector", asset.sector)
+                        and asset.asset_class == restrictions.get("asset_class", asset.asset_class))
+                }
+                for name, portfolio in self.portfolios.items()
+            }
+        return pd.DataFrame.from_dict(quantities, orient="index").fillna(0.0)
+
+    def revalue_all(self, prices: Optional[pd.Series]=None) -> pd.Series:
+        """
+        Updates the current value of every asset in every book with
+        one quote request for the union of all tickers, and one product
+        of the book x ticker quantities with the converted quotes.
+
+        Parameters
+        ----------
+        prices: Optional[pd.Series]
+            Latest price per ticker in the currency of the ticker,
+            e.g. from a models.QuoteRefresher. Tickers without a price
+            keep their current value. None requests the quotes.
+
+        Returns
+        -------
+        pd.Series
+            Total current value per book.
+
+        Notes
+        -----
+        Adjusts current_value of all assets. The quotes are retrieved
+        without holding self.lock, the values are written with the
+        quantities held at that moment, so trades in the meantime are
+        not undone.
+        """
+        holdings = self.holdings()
+        if holdings.empty:
+            return pd.Series(0.0, index=list(self.portfolios))
+        if prices is None:
+            prices = self.provider.last_prices(list(holdings.columns))
+        prices = pd.to_numeric(prices, errors="coerce").reindex(holdings.columns)
+        prices = self.fx.convert_values(prices).dropna()
+
+        with self.lock:
+            names = list(self.portfolios)
+            assets = [
+                (row, ticker, asset)
+                for row, name in enumerate(names) for ticker, asset in self.portfolios[name].assets.items()
+            ]
+            rows = np.array([row for row, _, _ in assets], dtype=int)
+            # Tickers bought since the quotes were requested (column -1) keep their value.
+            columns = prices.index.get_indexer([ticker for _, ticker, _ in assets])
+            priced = columns >= 0
+            # Book x ticker quantities held now, valued with one product.
+            quantities = np.zeros((len(names), len(prices)))
+            quantities[rows[priced], columns[priced]] = [
+                asset.held for (_, _, asset), keep in zip(assets, priced) if keep
+            ]
+            values = quantities * prices.to_numpy()
+            for (row, _, asset), column in zip(assets, columns):
+                if column >= 0:
+                    asset.current_value = float(values[row, column])
+            totals = np.bincount(
+                rows, weights=[asset.current_value for _, _, asset in assets], minlength=len(names),
+            )
+            return pd.Series(totals, index=names, dtype=float)
+
+    def aggregate_exposure(self, by: str="asset_class") -> pd.DataFrame:
+        """
+        Current value per book, grouped by asset class, sector or
+        ticker, plus the total over all books.
+
+        Parameters
+        ----------
+        by: str
+            One of "asset_class", "sector" or "ticker".
+
+        Returns
+        -------
+        pd.DataFrame
+            A book x group matrix of current values, with a "Total" row.
+        """
+        if by not in {"asset_class", "sector", "ticker"}:
+            raise ValueError(f"Invalid grouping {by}, choose one of asset_class, sector, ticker")
+        records = pd.DataFrame(
+            [
+                (name, getattr(asset, by), asset.current_value)
+                for name, portfolio in self.portfolios.items()
+                for asset in portfolio.assets.values()
+            ],
+            columns=["portfolio", by, "value"],
+        )
+        exposure = records.pivot_table(
+            index="portfolio", columns=by, values="value", aggfunc="sum", fill_value=0.0,
+        )
+        exposure.loc["Total"] = exposure.sum(axis=0)
+        return exposure
+
+    def get_portfolio_prices(
+            self,
+            restrictions: Optional[dict[str, str]],
+            date1: str,
+            date2: Optional[str]=None,
+    ) -> pd.DataFrame:
+        """
+        NAV of every book (or a subset of each book), continuously
+        rebalanced like models.Portfolio.get_portfolio_prices, from one
+        price request and one matrix product for all books.
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            To filter the books by asset class and/or sector.
+        date1: str
+            Starting date for the data.
+        date2: Optional[str]
+            Ending date for the data. ("None" retrieves most recent.)
+
+        Returns
+        -------
+        pd.DataFrame
+            NAV per date (rows) and book (columns). NaN on dates where
+            a book misses prices of one of its tickers.
+        """
+        book_weights = {
+            name: portfolio.get_portfolio_weights(restrictions)[0]
+            for name, portfolio in self.portfolios.items()
+        }
+        weights = pd.DataFrame.from_dict(
+            {name: weight for name, weight in book_weights.items() if weight},
+            orient="index",
+        ).fillna(0.0)
+        if weights.empty:
+            return pd.DataFrame()
+        marketData = self.provider.download_close(list(weights.columns), date1, date2)
+        marketData = self.fx.convert_prices(marketData[list(weights.columns)])
+
+        prices = marketData.to_numpy()
+        held = weights.to_numpy().T != 0
+        nav = np.nan_to_num(prices) @ weights.to_numpy().T
+        # A book is only valued on dates where all of its own tickers have a price.
+        nav[np.isnan(prices).astype(float) @ held > 0] = np.nan
+        return pd.DataFrame(nav, index=marketData.index, columns=weights.index)
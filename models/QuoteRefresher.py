@@ -0,0 +1,255 @@
+from models.MarketData import CachedProvider
+from models.PortfolioManager import PortfolioManager
+from typing import Optional
+import config
+import asyncio
+import logging
+import pandas as pd
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class QuoteRefresher:
+    """
+    Keeps the latest price of every held ticker up to date in the
+    background. Every refresh requests the union of the tickers of all
+    books in batches, spaced out to respect the rate limit of the data
+    provider, and revalues all assets at once with the new quotes.
+    Concurrent requests for a ticker that is already being retrieved
+    share that request instead of sending another one.
+
+    Parameters
+    ----------
+    manager: models.PortfolioManager
+        The books to keep up to date.
+    interval: float
+        Seconds between two refreshes.
+    batch_size: int
+        Maximum number of tickers per quote request.
+    rate_limit: float
+        Maximum number of quote requests per second.
+
+    Attributes
+    ----------
+    manager: models.PortfolioManager
+        Stored from the constructor.
+    interval: float
+        Stored from the constructor.
+    batch_size: int
+        Stored from the constructor.
+    rate_limit: float
+        Stored from the constructor.
+    quotes: pd.Series
+        Snapshot of the latest price per ticker, replaced (never
+        modified in place) by every refresh.
+    updated_at: Optional[pd.Timestamp]
+        Time of the last completed refresh.
+    """
+    def __init__(
+            self,
+            manager: PortfolioManager,
+            interval: float=config.QUOTE_REFRESH_SECONDS,
+            batch_size: int=config.QUOTE_BATCH_SIZE,
+            rate_limit: float=config.QUOTE_RATE_LIMIT,
+    ):
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1")
+        if rate_limit <= 0:
+            raise ValueError("Rate limit must be positive")
+        self.manager = manager
+        self.interval = interval
+        self.batch_size = batch_size
+        self.rate_limit = rate_limit
+        self.quotes = pd.Series(dtype=float)
+        self.updated_at: Optional[pd.Timestamp] = None
+        self._pending: dict[str, asyncio.Future] = {}
+        self._next_request = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    async def get_quotes(self, tickers: list[str]) -> pd.Series:
+        """
+        Retrieves fresh prices, in batches of at most self.batch_size
+        tickers within the rate limit. Tickers already being retrieved
+        are awaited instead of requested again.
+
+        Parameters
+        ----------
+        tickers: list[str]
+            Tickers of the assets.
+
+        Returns
+        -------
+        pd.Series
+            The latest price per ticker, NaN if it could not be retrieved.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        loop = asyncio.get_running_loop()
+        owned = [ticker for ticker in tickers if ticker not in self._pending]
+        for ticker in owned:
+            self._pending[ticker] = loop.create_future()
+        futures = [self._pending[ticker] for ticker in tickers]
+
+        batches = [
+            owned[i:i + self.batch_size] for i in range(0, len(owned), self.batch_size)
+        ]
+        await asyncio.gather(*(self._fetch_batch(batch) for batch in batches))
+        prices = await asyncio.gather(
+            *(asyncio.shield(future) for future in futures), return_exceptions=True,
+        )
+        return pd.to_numeric(
+            pd.Series(
+                [None if isinstance(price, BaseException) else price for price in prices],
+                index=tickers,
+                dtype=object,
+            ),
+            errors="coerce",
+        )
+
+    async def _fetch_batch(self, batch: list[str]) -> None:
+        """
+        Requests one batch once the rate limit allows it and resolves
+        the pending futures of its tickers.
+
+        Parameters
+        ----------
+        batch: list[str]
+            The tickers of the request.
+
+        Returns
+        -------
+        None
+        """
+        # Every request reserves the next free slot, so requests started together are spaced out.
+        now = time.monotonic()
+        start = max(now, self._next_request)
+        self._next_request = start + 1 / self.rate_limit
+
+        provider = self.manager.provider
+        fetch = provider.refresh_quotes if isinstance(provider, CachedProvider) else provider.last_prices
+        try:
+            await asyncio.sleep(start - now)
+            prices = await asyncio.to_thread(fetch, batch)
+            error = None
+        except asyncio.CancelledError:
+            for ticker in batch:
+                self._pending.pop(ticker).cancel()
+            raise
+        except Exception as e:
+            prices, error = None, e
+        for ticker in batch:
+            future = self._pending.pop(ticker)
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(prices.get(ticker, float("nan")))
+            # Nobody may await it, so the exception must not be reported as unretrieved.
+            future.exception()
+
+    async def refresh(self) -> pd.Series:
+        """
+        Retrieves the quotes of all held tickers and revalues every
+        asset in every book with them.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        pd.Series
+            Total current value per book.
+
+        Notes
+        -----
+        Adjusts current_value of all assets, holding the lock of the
+        manager (in a thread, so the event loop is not blocked).
+        """
+        holdings = await asyncio.to_thread(self.manager.holdings)
+        prices = await self.get_quotes(list(holdings.columns))
+        self.quotes = pd.concat([self.quotes.drop(prices.index, errors="ignore"), prices.dropna()])
+        self.updated_at = pd.Timestamp.now()
+        return await asyncio.to_thread(self.manager.revalue_all, prices)
+
+    async def run(self) -> None:
+        """
+        Refreshes every self.interval seconds until cancelled. A failed
+        refresh is logged and retried at the next interval.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Logs a warning when a refresh fails.
+        """
+        while not self._stop.is_set():
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Quote refresh failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> asyncio.Task:
+        """
+        Starts refreshing on the running event loop.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        asyncio.Task
+            The background task.
+        """
+        if self._task is None or self._task.done():
+            self._stop.clear()
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return self._task
+
+    def start_in_thread(self) -> threading.Thread:
+        """
+        Starts refreshing on an event loop in a daemon thread, for
+        the synchronous command line interface.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        threading.Thread
+            The background thread.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=asyncio.run, args=(self.run(),), name="quote-refresher", daemon=True,
+            )
+            self._thread.start()
+        return self._thread
+
+    def stop(self) -> None:
+        """
+        Stops refreshing after the current refresh.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
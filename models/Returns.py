@@ -0,0 +1,292 @@
+from models.FX import get_converter
+from models.Portfolio import Portfolio
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+
+
+class ReturnCalculator:
+    """
+    Time-weighted (TWR) and money-weighted (MWR) returns of a portfolio
+    per asset, asset class or sector and in total, derived from the
+    purchases and sales of the assets and the (cached) price history.
+
+    The cash flows and daily market values of all tickers are put in
+    date x ticker matrices in the base currency, and summed per group
+    with one matrix product with the ticker x group membership matrix.
+
+    - TWR chains the daily returns of the market value. Purchases enter
+      at the start of the day (at the purchase price) and sales leave
+      at the end of the day (at the sale price), so the size and timing
+      of the cash flows do not affect it.
+    - MWR is the internal rate of return of the cash flows and the
+      market value at the last close. The rates of all groups are
+      solved together with Newton iterations, kept inside a bracket of
+      the root by bisection.
+
+    Parameters
+    ----------
+    portfolio: models.Portfolio
+        The portfolio to measure.
+
+    Attributes
+    ----------
+    portfolio: models.Portfolio
+        Stored from the constructor.
+    """
+    LEVELS = ["asset_class", "sector", "ticker"]
+    DAYS_PER_YEAR = 365.25
+    # Bracket of the yearly internal rate of return (-99.99% to 100000%).
+    IRR_BOUNDS = (-0.9999, 1e3)
+
+    def __init__(self, portfolio: Portfolio):
+        self.portfolio = portfolio
+
+    def flows(self, restrictions: Optional[dict[str, str]]=None) -> pd.DataFrame:
+        """
+        All purchases (positive quantity) and sales (negative quantity)
+        of the assets under "restrictions", also of the assets that
+        have been sold entirely.
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            To filter the portfolio by asset class and/or sector.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per purchase or sale with the ticker, asset class,
+            sector, date, quantity and amount (quantity * price, in the
+            currency of the asset).
+        """
+        columns = Portfolio.PURCHASE_COLUMNS
+        purchases = pd.DataFrame(
+            [(ticker, asset.asset_class, asset.sector, *purchase)
+             for ticker, asset in self.portfolio.assets.items() for purchase in asset.purchases]
+            + self.portfolio.closed,
+            columns=columns,
+        )
+        sales = pd.DataFrame(self.portfolio.sales, columns=Portfolio.SALE_COLUMNS)[columns]
+        sales["quantity"] = -sales["quantity"]
+        flows = pd.concat([frame for frame in (purchases, sales) if not frame.empty] or [purchases], ignore_index=True)
+        for key, value in (restrictions or {}).items():
+            flows = flows[flows[key] == value]
+        flows = flows.reset_index(drop=True)
+        flows["date"] = pd.to_datetime(flows["date"])
+        flows["amount"] = flows["quantity"].astype(float) * flows["price"].astype(float)
+        return flows.drop(columns="price")
+
+    def valuation(
+            self,
+            flows: pd.DataFrame,
+    ) -> Tuple[pd.DatetimeIndex, list[str], np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Daily market values, purchases and sales per ticker in the base
+        currency, from the first purchase to the last close.
+
+        Parameters
+        ----------
+        flows: pd.DataFrame
+            Purchases and sales, as returned by flows.
+
+        Returns
+        -------
+        Tuple[pd.DatetimeIndex, list[str], np.ndarray, np.ndarray, np.ndarray]
+            Dates, tickers, and the date x ticker matrices of the market
+            value at the close, the amount bought and the amount sold.
+            Trades on days without a close count on the next close (or
+            the last close).
+        """
+        tickers = list(dict.fromkeys(flows["ticker"]))
+        start = str(flows["date"].min().date())
+        prices = self.portfolio.provider.download_close(tickers, start, None)[tickers]
+        if prices.index.tz is not None:
+            prices.index = prices.index.tz_localize(None)
+        prices = prices.ffill().bfill()
+        index = prices.index
+        rates = get_converter(self.portfolio.provider).rates(tickers, index).to_numpy()
+
+        rows = np.minimum(index.searchsorted(flows["date"].to_numpy()), len(index) - 1)
+        columns = pd.Index(tickers).get_indexer(flows["ticker"])
+        quantities = flows["quantity"].to_numpy(dtype=float)
+        amounts = np.abs(flows["amount"].to_numpy(dtype=float)) * rates[rows, columns]
+
+        held = np.zeros((len(index), len(tickers)))
+        np.add.at(held, (rows, columns), quantities)
+        bought = np.zeros_like(held)
+        np.add.at(bought, (rows, columns), np.where(quantities > 0, amounts, 0.0))
+        sold = np.zeros_like(held)
+        np.add.at(sold, (rows, columns), np.where(quantities < 0, amounts, 0.0))
+        values = np.cumsum(held, axis=0) * prices.to_numpy() * rates
+        return index, tickers, values, bought, sold
+
+    @staticmethod
+    def time_weighted(
+            values: np.ndarray,
+            bought: np.ndarray,
+            sold: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Time-weighted return of every column.
+
+        Parameters
+        ----------
+        values: np.ndarray
+            Market value at the close per date (rows) and group
+            (columns).
+        bought: np.ndarray
+            Amount bought per date and group.
+        sold: np.ndarray
+            Amount sold per date and group.
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray, np.ndarray]
+            Cumulative return per group, and the first and last row
+            with holdings per group (-1 without purchases).
+        """
+        previous = np.vstack([np.zeros((1, values.shape[1])), values[:-1]])
+        capital = previous + bought
+        with np.errstate(divide="ignore", invalid="ignore"):
+            growth = np.where(capital > 0, (values + sold) / capital, 1.0)
+        growth[np.isnan(capital)] = np.nan
+        invested = capital > 0
+        any_invested = invested.any(axis=0)
+        first = np.where(any_invested, invested.argmax(axis=0), -1)
+        last = np.where(any_invested, len(invested) - 1 - invested[::-1].argmax(axis=0), -1)
+        return np.prod(growth, axis=0) - 1, first, last
+
+    @staticmethod
+    def irr(
+            amounts: np.ndarray,
+            years: np.ndarray,
+            tolerance: float=1e-10,
+            max_iterations: int=100,
+    ) -> np.ndarray:
+        """
+        Yearly internal rate of return of every row of cash flows,
+        solved for all rows at once.
+
+        Parameters
+        ----------
+        amounts: np.ndarray
+            Cash flows per group (rows) and date (columns), negative
+            for money invested and positive for money received
+            (including the final value).
+        years: np.ndarray
+            Time from each date to the last date, in years.
+        tolerance: float
+            Relative change of the rates at which a row has converged.
+        max_iterations: int
+            Maximum number of iterations.
+
+        Returns
+        -------
+        np.ndarray
+            The rate per row, NaN if the cash flows have no root
+            within ReturnCalculator.IRR_BOUNDS.
+
+        Notes
+        -----
+        Each iteration evaluates the value of the cash flows at the
+        last date and its derivative for all unconverged rows with one
+        matrix operation. The Newton step is replaced by the midpoint
+        of the bracket when it leaves the bracket.
+        """
+        def future_value(flows: np.ndarray, rates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            growth = np.exp(np.log1p(rates)[:, None] * years)
+            value = (flows * growth).sum(axis=1)
+            return value, (flows * years * growth).sum(axis=1) / (1 + rates)
+
+        n = len(amounts)
+        low = np.full(n, ReturnCalculator.IRR_BOUNDS[0])
+        high = np.full(n, ReturnCalculator.IRR_BOUNDS[1])
+        value_low, _ = future_value(amounts, low)
+        value_high, _ = future_value(amounts, high)
+        active = np.flatnonzero(np.sign(value_low) * np.sign(value_high) < 0)
+        result = np.full(n, np.nan)
+
+        flows, rates = amounts[active], np.full(len(active), 0.1)
+        low, high, value_low = low[active], high[active], value_low[active]
+        for _ in range(max_iterations):
+            if not len(active):
+                break
+            value, slope = future_value(flows, rates)
+            # Keep the root between low and high.
+            same = np.sign(value) == np.sign(value_low)
+            low, value_low = np.where(same, rates, low), np.where(same, value, value_low)
+            high = np.where(same, high, rates)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                step = rates - value / slope
+            step = np.where(np.isfinite(step) & (step >= low) & (step <= high), step, (low + high) / 2)
+            result[active] = step
+            running = (np.abs(step - rates) > tolerance * (1 + np.abs(rates))) & (value != 0)
+            active, flows, rates = active[running], flows[running], step[running]
+            low, high, value_low = low[running], high[running], value_low[running]
+        return result
+
+    def run(self, restrictions: Optional[dict[str, str]]=None, by: str="asset_class") -> pd.DataFrame:
+        """
+        Returns of the assets under "restrictions" per group and in
+        total.
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            To filter the portfolio by asset class and/or sector.
+        by: str
+            Group of the breakdown, one of "asset_class", "sector" or
+            "ticker".
+
+        Returns
+        -------
+        pd.DataFrame
+            Per group and "Total" (rows): the date of the first
+            purchase, the amounts bought and sold, the market value
+            (base currency), the cumulative and yearly TWR and the
+            yearly MWR in percent.
+
+        Notes
+        -----
+        Yearly figures of periods shorter than a year are extrapolated.
+        """
+        if by not in self.LEVELS:
+            raise ValueError(f"Invalid grouping {by}, choose one of {self.LEVELS}")
+        flows = self.flows(restrictions)
+        if flows.empty:
+            raise ValueError("No purchases in the portfolio (under these restrictions)")
+        index, tickers, values, bought, sold = self.valuation(flows)
+
+        groups = flows.drop_duplicates("ticker").set_index("ticker", drop=False).loc[tickers, by]
+        names, codes = np.unique(groups.to_numpy(dtype=str), return_inverse=True)
+        # Ticker x group membership, the last group is the total.
+        members = np.zeros((len(tickers), len(names) + 1))
+        members[np.arange(len(tickers)), codes] = 1.0
+        members[:, -1] = 1.0
+        values, bought, sold = values @ members, bought @ members, sold @ members
+
+        twr, first, last = self.time_weighted(values, bought, sold)
+        years = (index[-1] - index).days.to_numpy() / self.DAYS_PER_YEAR
+        amounts = (sold - bought).T
+        amounts[:, -1] += values[-1]
+        # Only the dates with cash flows matter for the internal rate of return.
+        dates = np.flatnonzero((amounts != 0).any(axis=0))
+        mwr = self.irr(amounts[:, dates], years[dates])
+
+        # Assets sold entirely are annualised over the period they were held.
+        span = np.where(first >= 0, years[np.maximum(first, 0)] - years[np.maximum(last, 0)], 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            yearly = np.where(span > 0, (1 + twr) ** (1 / span) - 1, np.nan)
+        return pd.DataFrame(
+            {
+                "Start": [str(index[row].date()) if row >= 0 else None for row in first],
+                "Bought": bought.sum(axis=0),
+                "Sold": sold.sum(axis=0),
+                "Value": values[-1],
+                "TWR %": 100 * twr,
+                "TWR % p.a.": 100 * yearly,
+                "MWR % p.a.": 100 * mwr,
+            },
+            index=pd.Index([*names, "Total"], name=by),
+        )
@@ -0,0 +1,299 @@
+from models.Portfolio import Portfolio
+from typing import Any, Optional, Tuple
+import config
+import numpy as np
+import pandas as pd
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+
+class SimulationCache:
+    """
+    Memoizes Monte Carlo results on disk. Every result is stored in its
+    own folder as .npy files, which are memory-mapped when loaded, so
+    a warm rerun neither downloads nor simulates and large path matrices
+    are never read into memory as a whole. The least recently used
+    results are evicted when the folder exceeds max_bytes.
+
+    Parameters
+    ----------
+    directory: str
+        Folder to store the results in.
+    max_bytes: int
+        Maximum size of all stored results.
+    store_paths: bool
+        Also store the full path matrix, not only the quantile bands
+        and the sample paths needed for the graph.
+
+    Attributes
+    ----------
+    directory: str
+        Stored from the constructor.
+    max_bytes: int
+        Stored from the constructor.
+    store_paths: bool
+        Stored from the constructor.
+    """
+    QUANTILES = [5, 25, 50, 75, 95]
+    SAMPLES = 20
+
+    def __init__(
+            self,
+            directory: str=config.SIMULATION_CACHE_DIR,
+            max_bytes: int=config.SIMULATION_CACHE_MAX_MB * 1024**2,
+            store_paths: bool=config.SIMULATION_CACHE_PATHS,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.store_paths = store_paths
+
+    @staticmethod
+    def key(portfolio: Portfolio, restrictions: Optional[dict[str, str]], **params: Any) -> str:
+        """
+        Hash of everything a simulation depends on: the holdings (the
+        lots of every ticker), the restrictions, the simulation
+        parameters (dates, n, months, seed, engine, ...), the source
+        of the prices and the base currency. An open ending date
+        depends on the day.
+
+        Live values are left out on purpose, so refreshed quotes do not
+        invalidate the results; the weights follow from the quantities.
+
+        Parameters
+        ----------
+        portfolio: models.Portfolio
+            The simulated portfolio.
+        restrictions: Optional[dict[str, str]]
+            Filter of the portfolio by asset class and/or sector.
+        **params: Any
+            The parameters of the simulation.
+
+        Returns
+        -------
+        str
+            Hexadecimal key.
+        """
+        holdings = sorted(
+            (
+                ticker,
+                asset.sector,
+                asset.asset_class,
+                list(asset.quantity),
+                list(asset.purchase_price),
+                list(asset.purchase_date),
+            )
+            for ticker, asset in portfolio.assets.items()
+        )
+        if params.get("endDate") is None:
+            params["today"] = str(pd.Timestamp.today().date())
+        payload = json.dumps(
+            {
+                "holdings": holdings,
+                "restrictions": restrictions,
+                "params": params,
+                "source": portfolio.provider.source(),
+                "currency": config.BASE_CURRENCY,
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    @staticmethod
+    def summarize(
+            sims: np._typing.NDArray[np.float64],
+    ) -> Tuple[np._typing.NDArray[np.float64], np._typing.NDArray[np.float64]]:
+        """
+        The parts of a simulation needed for the graph.
+
+        Parameters
+        ----------
+        sims: np.typing.NDArray[np.float64]
+            The simulated paths (steps*n matrix).
+
+        Returns
+        -------
+        Tuple[np.typing.NDArray[np.float64], np.typing.NDArray[np.float64]]
+            Quantile bands (one row per SimulationCache.QUANTILES) and
+            the first SimulationCache.SAMPLES paths.
+        """
+        bands = np.percentile(sims, SimulationCache.QUANTILES, axis=1)
+        samples = np.ascontiguousarray(sims[:, :SimulationCache.SAMPLES])
+        return bands, samples
+
+    def contains(self, key: str) -> bool:
+        """
+        Checks if a result is stored.
+
+        Parameters
+        ----------
+        key: str
+            Key of the result.
+
+        Returns
+        -------
+        bool
+            If it is present True, else False.
+        """
+        return os.path.exists(os.path.join(self.directory, key, "meta.json"))
+
+    def load(self, key: str) -> Optional[Tuple[Any, ...]]:
+        """
+        Loads a stored result, memory-mapped.
+
+        Parameters
+        ----------
+        key: str
+            Key of the result.
+
+        Returns
+        -------
+        Optional[Tuple[Any, ...]]
+            None if not stored, else the historical data, the dates of
+            the simulation, the quantile bands, the sample paths, the
+            full path matrix (None if it was not stored) and the values
+            at the horizons (None if there were none).
+        """
+        folder = os.path.join(self.directory, key)
+        meta_path = os.path.join(folder, "meta.json")
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            load = lambda name: np.load(os.path.join(folder, f"{name}.npy"), mmap_mode="r")
+            history = pd.DataFrame(
+                np.asarray(load("history_values")),
+                index=pd.DatetimeIndex(np.asarray(load("history_index"))),
+                columns=meta["history_columns"],
+            )
+            future_index = pd.DatetimeIndex(np.asarray(load("future_index")))
+            bands = load("bands")
+            samples = load("samples")
+            paths = load("paths") if meta["paths"] else None
+            terminals = load("terminals") if meta.get("terminals") else None
+        except (OSError, ValueError, KeyError):
+            return None
+        # The modification time of meta.json is the last access, used for eviction.
+        os.utime(meta_path)
+        return history, future_index, bands, samples, paths, terminals
+
+    def store(
+            self,
+            key: str,
+            history: pd.DataFrame,
+            future_index: pd.DatetimeIndex,
+            sims: np._typing.NDArray[np.float64],
+            terminals: Optional[np._typing.NDArray[np.float64]]=None,
+    ) -> Tuple[Any, ...]:
+        """
+        Stores a result and evicts the least recently used results
+        when the cache is too large.
+
+        Parameters
+        ----------
+        key: str
+            Key of the result.
+        history: pd.DataFrame
+            Historical data of the simulation.
+        future_index: pd.DatetimeIndex
+            Dates of the simulation.
+        sims: np.typing.NDArray[np.float64]
+            The simulated paths (steps*n matrix).
+        terminals: Optional[np.typing.NDArray[np.float64]]
+            The rows of sims at the horizons of a multi-horizon
+            simulation, see models.MonteCarlo.horizon_rows.
+
+        Returns
+        -------
+        Tuple[Any, ...]
+            The stored result, as returned by load.
+
+        Notes
+        -----
+        Writes files to self.directory.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        bands, samples = self.summarize(sims)
+        # Written to a temporary folder first, so readers never see a partial result.
+        tmp = tempfile.mkdtemp(dir=self.directory, prefix=".tmp-")
+        try:
+            np.save(os.path.join(tmp, "history_values.npy"), history.to_numpy())
+            np.save(
+                os.path.join(tmp, "history_index.npy"),
+                history.index.tz_localize(None).values.astype("datetime64[ns]"),
+            )
+            np.save(
+                os.path.join(tmp, "future_index.npy"),
+                future_index.values.astype("datetime64[ns]"),
+            )
+            np.save(os.path.join(tmp, "bands.npy"), bands)
+            np.save(os.path.join(tmp, "samples.npy"), samples)
+            if self.store_paths:
+                np.save(os.path.join(tmp, "paths.npy"), sims)
+            if terminals is not None:
+                np.save(os.path.join(tmp, "terminals.npy"), terminals)
+            with open(os.path.join(tmp, "meta.json"), "w") as f:
+                json.dump(
+                    {
+                        "history_columns": [str(column) for column in history.columns],
+                        "paths": self.store_paths,
+                        "terminals": terminals is not None,
+                        "created": time.time(),
+                    },
+                    f,
+                )
+            folder = os.path.join(self.directory, key)
+            shutil.rmtree(folder, ignore_errors=True)
+            os.replace(tmp, folder)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        self.evict(keep=key)
+        return (
+            history,
+            future_index,
+            bands,
+            samples,
+            sims if self.store_paths else None,
+            terminals,
+        )
+
+    def evict(self, keep: Optional[str]=None) -> None:
+        """
+        Removes the least recently used results until all results
+        together are at most self.max_bytes.
+
+        Parameters
+        ----------
+        keep: Optional[str]
+            Key that is never evicted (the result just stored).
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Removes folders from self.directory.
+        """
+        entries = []
+        for key in os.listdir(self.directory):
+            folder = os.path.join(self.directory, key)
+            meta_path = os.path.join(folder, "meta.json")
+            if key.startswith(".") or not os.path.exists(meta_path):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(folder))
+            entries.append((os.path.getmtime(meta_path), size, key))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+            total -= size
@@ -0,0 +1,361 @@
+from models.FX import get_converter
+from models.Portfolio import Portfolio
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+
+class StressTester:
+    """
+    Applies scenarios to the current holdings of a portfolio. A
+    scenario is a set of shocks (relative price changes, e.g. -0.3)
+    keyed by ticker, sector and/or asset class:
+
+        {"sector": {"Information Technology": -0.3},
+         "asset_class": {"Fixed Income": -0.05}}
+
+    The most specific shock applies to an asset (ticker before sector
+    before asset class), assets without a shock are unchanged. All
+    scenarios are applied at once: the scenario x asset shock matrix is
+    multiplied with the asset x group matrix of current values, which
+    gives the P&L of every scenario in total and per group.
+
+    Historical scenarios replay the price changes of past periods,
+    computed from the (cached) price history of the held tickers.
+
+    Parameters
+    ----------
+    portfolio: models.Portfolio
+        The portfolio to stress.
+
+    Attributes
+    ----------
+    portfolio: models.Portfolio
+        Stored from the constructor.
+    """
+    # From the least to the most specific, a more specific shock overrides.
+    LEVELS = ["asset_class", "sector", "ticker"]
+    # Hypothetical scenarios shipped with the application.
+    SCENARIOS = {
+        "Equities -20%": {"asset_class": {"Equities": -0.20}},
+        "IT -30%, Rates Up": {
+            "sector": {"Information Technology": -0.30},
+            "asset_class": {"Fixed Income": -0.08, "Real Estate": -0.10},
+        },
+        "Rates Up 200bp": {
+            "asset_class": {"Fixed Income": -0.12, "Real Estate": -0.15, "Equities": -0.05},
+        },
+        "Oil Shock": {
+            "sector": {"Energy": 0.30, "Industrials": -0.08, "Consumer Discretionary": -0.10},
+            "asset_class": {"Commodities": 0.20},
+        },
+        "Flight To Safety": {
+            "asset_class": {
+                "Equities": -0.15,
+                "Fixed Income": 0.05,
+                "Commodities": 0.05,
+                "Digital Assets": -0.40,
+            },
+        },
+        "Crypto Winter": {"asset_class": {"Digital Assets": -0.60}},
+    }
+    # Historical periods replayed from the price history (peak to trough).
+    HISTORICAL = {
+        "Dot-com Crash": ("2000-03-24", "2002-10-09"),
+        "Global Financial Crisis": ("2007-10-09", "2009-03-09"),
+        "Euro Debt Crisis": ("2011-04-29", "2011-10-03"),
+        "Covid Crash": ("2020-02-19", "2020-03-23"),
+        "2022 Rate Hikes": ("2022-01-03", "2022-10-12"),
+    }
+
+    def __init__(self, portfolio: Portfolio):
+        self.portfolio = portfolio
+
+    def holdings(self, restrictions: Optional[dict[str, str]]=None) -> pd.DataFrame:
+        """
+        The assets under "restrictions" with their groups and current
+        value.
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            To filter the portfolio by asset class and/or sector.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per ticker with the asset class, sector and
+            current value (in the base currency).
+        """
+        weights, _, _ = self.portfolio.get_portfolio_weights(restrictions)
+        return pd.DataFrame.from_records(
+            [
+                (
+                    ticker,
+                    self.portfolio.assets[ticker].asset_class,
+                    self.portfolio.assets[ticker].sector,
+                    float(self.portfolio.assets[ticker].current_value),
+                )
+                for ticker in weights
+            ],
+            columns=["ticker", "asset_class", "sector", "value"],
+        ).set_index("ticker", drop=False)
+
+    @staticmethod
+    def shock_matrix(
+            scenarios: dict[str, dict[str, dict[str, float]]],
+            holdings: pd.DataFrame,
+    ) -> pd.DataFrame:
+        """
+        Resolves a library of scenarios to the shock of every asset.
+
+        Parameters
+        ----------
+        scenarios: dict[str, dict[str, dict[str, float]]]
+            Shocks per scenario, keyed by level ("ticker", "sector"
+            or "asset_class") and name.
+        holdings: pd.DataFrame
+            The assets, as returned by holdings.
+
+        Returns
+        -------
+        pd.DataFrame
+            Shock per scenario (rows) and ticker (columns).
+        """
+        for name, shocks in scenarios.items():
+            if set(shocks) - set(StressTester.LEVELS):
+                raise ValueError(
+                    f"Invalid level in scenario {name}, choose from {StressTester.LEVELS}",
+                )
+        names = list(scenarios)
+        matrix = np.full((len(names), len(holdings)), np.nan)
+        for level in StressTester.LEVELS:
+            table = pd.DataFrame([scenarios[name].get(level, {}) for name in names], index=names)
+            if table.columns.empty:
+                continue
+            # Scenario x group to scenario x asset, assets of a group without a shock are NaN.
+            column = table.columns.get_indexer(holdings[level])
+            shocks = np.where(column >= 0, table.to_numpy(dtype=float)[:, column], np.nan)
+            matrix = np.where(np.isnan(shocks), matrix, shocks)
+        return pd.DataFrame(np.nan_to_num(matrix), index=names, columns=holdings.index)
+
+    def historical_scenarios(
+            self,
+            holdings: pd.DataFrame,
+            events: Optional[dict[str, tuple[str, str]]]=None,
+    ) -> pd.DataFrame:
+        """
+        Price changes of the held tickers over past periods, from one
+        price request that covers all periods. A ticker without prices
+        in a period (e.g. listed afterwards, or quoted in a currency
+        without exchange rates that far back) gets the average change
+        of the tickers in its asset class, or 0 if none has prices.
+
+        Parameters
+        ----------
+        holdings: pd.DataFrame
+            The assets, as returned by holdings.
+        events: Optional[dict[str, tuple[str, str]]]
+            Start and end date per period, defaults to
+            StressTester.HISTORICAL.
+
+        Returns
+        -------
+        pd.DataFrame
+            Shock per period (rows) and ticker (columns).
+        """
+        events = events if events is not None else self.HISTORICAL
+        tickers = list(holdings.index)
+        if not events or not tickers:
+            return pd.DataFrame(columns=tickers, dtype=float)
+        starts = pd.to_datetime([start for start, _ in events.values()])
+        ends = pd.to_datetime([end for _, end in events.values()])
+        prices = self.portfolio.provider.download_close(
+            tickers,
+            str(starts.min().date() - pd.Timedelta(days=10)),
+            str(ends.max().date() + pd.Timedelta(days=1)),
+        )[tickers]
+        # Each period is converted at its own rates, dates before a rate exists count as without a price.
+        prices = get_converter(self.portfolio.provider).convert_prices(prices.ffill(), strict=False)
+        index = prices.index.tz_localize(None) if prices.index.tz is not None else prices.index
+        return self.replay(prices.to_numpy(dtype=float), index, starts, ends, holdings, list(events))
+
+    def rolling_scenarios(
+            self,
+            holdings: pd.DataFrame,
+            date1: str,
+            date2: Optional[str]=None,
+            window: int=21,
+    ) -> pd.DataFrame:
+        """
+        Price changes of the held tickers over every window of
+        "window" trading days in the history, one scenario per window
+        end date. Tickers without prices (or exchange rates) in a
+        window are handled as in historical_scenarios.
+
+        Parameters
+        ----------
+        holdings: pd.DataFrame
+            The assets, as returned by holdings.
+        date1: str
+            Starting date of the history.
+        date2: Optional[str]
+            Ending date of the history. ("None" retrieves most recent.)
+        window: int
+            Length of a scenario in trading days.
+
+        Returns
+        -------
+        pd.DataFrame
+            Shock per window (rows) and ticker (columns).
+        """
+        if window < 1:
+            raise ValueError("Window must be at least 1 trading day")
+        tickers = list(holdings.index)
+        prices = self.portfolio.provider.download_close(tickers, date1, date2)[tickers]
+        prices = get_converter(self.portfolio.provider).convert_prices(prices.ffill(), strict=False)
+        if len(prices) <= window:
+            raise ValueError("Not enough prices between the dates for the window")
+        index = prices.index.tz_localize(None) if prices.index.tz is not None else prices.index
+        names = [f"{date.date()} ({window}d)" for date in index[window:]]
+        return self.replay(
+            prices.to_numpy(dtype=float), index, index[:-window], index[window:], holdings, names,
+        )
+
+    @staticmethod
+    def replay(
+            prices: np._typing.NDArray[np.float64],
+            index: pd.DatetimeIndex,
+            starts: pd.DatetimeIndex,
+            ends: pd.DatetimeIndex,
+            holdings: pd.DataFrame,
+            names: list[str],
+    ) -> pd.DataFrame:
+        """
+        Price changes between pairs of dates, for all pairs at once.
+        The price of a date is the last price on or before it.
+
+        Parameters
+        ----------
+        prices: np.typing.NDArray[np.float64]
+            Prices per date (rows) and ticker (columns of holdings).
+        index: pd.DatetimeIndex
+            Dates of the prices.
+        starts: pd.DatetimeIndex
+            First date per scenario.
+        ends: pd.DatetimeIndex
+            Last date per scenario.
+        holdings: pd.DataFrame
+            The assets, as returned by holdings.
+        names: list[str]
+            Name per scenario.
+
+        Returns
+        -------
+        pd.DataFrame
+            Shock per scenario (rows) and ticker (columns).
+        """
+        first = np.searchsorted(index.values, starts.values, side="right") - 1
+        last = np.searchsorted(index.values, ends.values, side="right") - 1
+        valid = (first >= 0) & (last > first)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shocks = prices[np.maximum(last, 0)] / prices[np.maximum(first, 0)] - 1
+        shocks[~valid] = np.nan
+        shocks = pd.DataFrame(shocks, index=names, columns=holdings.index)
+        # Missing history is approximated by the asset class average of the period.
+        proxy = shocks.T.groupby(holdings["asset_class"]).transform("mean").T
+        return shocks.fillna(proxy).fillna(0.0)
+
+    @staticmethod
+    def stress_values(
+            shocks: pd.DataFrame,
+            holdings: pd.DataFrame,
+            by: str="asset_class",
+    ) -> pd.DataFrame:
+        """
+        P&L of every scenario, from one matrix product.
+
+        Parameters
+        ----------
+        shocks: pd.DataFrame
+            Shock per scenario (rows) and ticker (columns).
+        holdings: pd.DataFrame
+            The assets, as returned by holdings.
+        by: str
+            Group of the P&L breakdown, one of "asset_class",
+            "sector" or "ticker".
+
+        Returns
+        -------
+        pd.DataFrame
+            P&L per scenario (rows) in total, in percent of the
+            current value and per group (columns).
+        """
+        if by not in StressTester.LEVELS:
+            raise ValueError(f"Invalid grouping {by}, choose one of {StressTester.LEVELS}")
+        groups, codes = np.unique(holdings[by].to_numpy(dtype=str), return_inverse=True)
+        # Asset x group matrix of current values.
+        exposure = np.zeros((len(holdings), len(groups)))
+        exposure[np.arange(len(holdings)), codes] = holdings["value"].to_numpy()
+        pnl = shocks.reindex(columns=holdings.index).fillna(0.0).to_numpy() @ exposure
+        total = pnl.sum(axis=1)
+        value = holdings["value"].sum()
+        return pd.concat(
+            [
+                pd.DataFrame(
+                    {"Total": total, "Total %": 100 * total / value if value else np.nan},
+                    index=shocks.index,
+                ),
+                pd.DataFrame(pnl, index=shocks.index, columns=groups),
+            ],
+            axis=1,
+        )
+
+    def run(
+            self,
+            restrictions: Optional[dict[str, str]]=None,
+            scenarios: Optional[dict[str, dict[str, dict[str, float]]]]=None,
+            by: str="asset_class",
+            historical: bool=True,
+            window: Optional[int]=None,
+            date1: str="2000-01-01",
+            date2: Optional[str]=None,
+    ) -> pd.DataFrame:
+        """
+        Stresses the assets under "restrictions" with a library of
+        scenarios and, optionally, historical replays.
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            To filter the portfolio by asset class and/or sector.
+        scenarios: Optional[dict[str, dict[str, dict[str, float]]]]
+            Shocks per scenario, see shock_matrix. Defaults to
+            StressTester.SCENARIOS.
+        by: str
+            Group of the P&L breakdown, see stress_values.
+        historical: bool
+            If the periods of StressTester.HISTORICAL are replayed.
+        window: Optional[int]
+            Also replays every window of this many trading days
+            between date1 and date2, None to skip.
+        date1: str
+            Starting date of the rolling windows.
+        date2: Optional[str]
+            Ending date of the rolling windows.
+
+        Returns
+        -------
+        pd.DataFrame
+            See stress_values, one row per scenario.
+        """
+        holdings = self.holdings(restrictions)
+        if holdings.empty:
+            raise ValueError("No assets to stress")
+        scenarios = scenarios if scenarios is not None else self.SCENARIOS
+        shocks = [self.shock_matrix(scenarios, holdings)]
+        if historical:
+            shocks.append(self.historical_scenarios(holdings))
+        if window is not None:
+            shocks.append(self.rolling_scenarios(holdings, date1, date2, window))
+        return self.stress_values(pd.concat(shocks), holdings, by)
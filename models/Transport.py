@@ -0,0 +1,312 @@
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Optional
+import config
+import yfinance as yf
+import random
+import threading
+import time
+
+
+class CircuitOpenError(ConnectionError):
+    """
+    Raised instead of calling the data source while the circuit
+    breaker is open, after too many consecutive failures.
+    """
+
+
+class TransportBusyError(TimeoutError):
+    """
+    Raised when no connection of the transport became free within the
+    timeout, e.g. because earlier calls hang past their own timeout.
+    Transient, so the call is retried.
+    """
+
+
+class HTTPStatusError(OSError):
+    """
+    Raised by Transport.get for a response with an error status.
+
+    Parameters
+    ----------
+    status: int
+        The status code of the response.
+    url: str
+        The requested url.
+
+    Attributes
+    ----------
+    status: int
+        Stored from the constructor.
+    """
+    def __init__(self, status: int, url: str):
+        super().__init__(f"HTTP {status} for {url}")
+        self.status = status
+
+
+class Transport:
+    """
+    Shared transport for all calls to a remote data source. Calls run
+    on a bounded pool of worker threads that share one HTTP session
+    (connection pool), each call has a timeout, transient failures are
+    retried with exponential backoff and jitter, and a circuit breaker
+    fails fast while the source keeps failing, instead of piling up
+    requests that would time out anyway.
+
+    Parameters
+    ----------
+    max_concurrency: int
+        Maximum number of calls running at the same time.
+    timeout: float
+        Seconds a single attempt may take.
+    retries: int
+        Extra attempts after a transient failure.
+    backoff: float
+        Seconds before the first retry, doubled for every next retry.
+    max_backoff: float
+        Maximum seconds between two attempts.
+    failure_threshold: int
+        Consecutive failed calls that open the circuit.
+    reset_timeout: float
+        Seconds the circuit stays open before one trial call is allowed.
+    session: Optional[Any]
+        HTTP session to share, created on first use if None.
+
+    Attributes
+    ----------
+    max_concurrency: int
+        Stored from the constructor.
+    timeout: float
+        Stored from the constructor.
+    retries: int
+        Stored from the constructor.
+    backoff: float
+        Stored from the constructor.
+    max_backoff: float
+        Stored from the constructor.
+    failure_threshold: int
+        Stored from the constructor.
+    reset_timeout: float
+        Stored from the constructor.
+    """
+    # Failures worth another attempt: network errors, timeouts and rate limiting.
+    TRANSIENT = (OSError, getattr(yf.exceptions, "YFRateLimitError", OSError))
+    TRANSIENT_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+    def __init__(
+            self,
+            max_concurrency: int=config.TRANSPORT_CONCURRENCY,
+            timeout: float=config.TRANSPORT_TIMEOUT,
+            retries: int=config.TRANSPORT_RETRIES,
+            backoff: float=0.5,
+            max_backoff: float=8.0,
+            failure_threshold: int=5,
+            reset_timeout: float=30.0,
+            session: Optional[Any]=None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._session = session
+        self._executor = ThreadPoolExecutor(max_concurrency, thread_name_prefix="transport")
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def session(self) -> Any:
+        """
+        The shared HTTP session. yfinance requires a curl_cffi session,
+        a pooled requests session is used when it is not installed.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Any
+            The session, created on first use.
+        """
+        with self._lock:
+            if self._session is None:
+                self._session = self._create_session()
+            return self._session
+
+    def _create_session(self) -> Any:
+        try:
+            from curl_cffi import requests as curl_requests
+            return curl_requests.Session(impersonate="chrome")
+        except ImportError:
+            import requests
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=self.max_concurrency, pool_maxsize=self.max_concurrency,
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            return session
+
+    def call(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Calls fn through the transport, with the timeout, retries and
+        circuit breaker applied.
+
+        Parameters
+        ----------
+        fn: Callable[..., Any]
+            The call to the data source.
+        *args: Any
+            Positional arguments of fn.
+        **kwargs: Any
+            Keyword arguments of fn.
+
+        Returns
+        -------
+        Any
+            The result of fn.
+
+        Raises
+        ------
+        CircuitOpenError
+            While the circuit breaker is open.
+        TransportBusyError
+            If no connection became free within the timeout on the
+            last attempt.
+        """
+        for attempt in range(self.retries + 1):
+            self._before_call()
+            try:
+                # A call that timed out keeps its slot until it returns, so the bound always
+                # holds. Waiting for a slot is bounded too, hanging calls cannot block the rest.
+                if not self._slots.acquire(timeout=self.timeout):
+                    raise TransportBusyError(
+                        f"No free connection within {self.timeout} seconds,"
+                        f" {self.max_concurrency} calls are still running",
+                    )
+                try:
+                    future = self._executor.submit(fn, *args, **kwargs)
+                except BaseException:
+                    self._slots.release()
+                    raise
+                future.add_done_callback(lambda _: self._slots.release())
+                result = future.result(timeout=self.timeout)
+            except TransportBusyError as e:
+                error = e
+            except FutureTimeoutError:
+                error = TimeoutError(f"No response within {self.timeout} seconds")
+            except self.TRANSIENT as e:
+                error = e
+            except Exception:
+                # Not a failure of the source (e.g. an unknown ticker), so not retried.
+                self._record(success=True)
+                raise
+            else:
+                self._record(success=True)
+                return result
+
+            self._record(success=False)
+            if attempt == self.retries:
+                raise error
+            delay = min(self.max_backoff, self.backoff * 2**attempt)
+            # Full jitter, so clients that failed together do not retry together.
+            time.sleep(random.uniform(0, delay))
+
+    def get(self, url: str, params: Optional[dict[str, Any]]=None) -> Any:
+        """
+        HTTP GET through the shared session and the transport.
+        Responses with a transient error status are retried.
+
+        Parameters
+        ----------
+        url: str
+            The url to request.
+        params: Optional[dict[str, Any]]
+            Query parameters.
+
+        Returns
+        -------
+        Any
+            The response of the session.
+        """
+        def request() -> Any:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            if response.status_code in self.TRANSIENT_STATUS:
+                raise HTTPStatusError(response.status_code, url)
+            return response
+
+        return self.call(request)
+
+    def _before_call(self) -> None:
+        """
+        Fails fast while the circuit is open. Once reset_timeout has
+        passed a single trial call is let through (half open).
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if not self._trial and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._trial = True
+                return
+        raise CircuitOpenError("Market data source unavailable, try again later")
+
+    def _record(self, success: bool) -> None:
+        """
+        Updates the circuit breaker with the outcome of an attempt.
+
+        Parameters
+        ----------
+        success: bool
+            If the source answered.
+
+        Returns
+        -------
+        None
+        """
+        with self._lock:
+            self._trial = False
+            if success:
+                self._failures = 0
+                self._opened_at = None
+                return
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+_transport: Optional[Transport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> Transport:
+    """
+    Retrieves the application wide transport, created on first use.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    Transport
+        The shared transport.
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = Transport()
+        return _transport
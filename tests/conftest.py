@@ -0,0 +1,25 @@
+import pytest
+
+from models.Asset import Asset
+from models.MarketData import SyntheticProvider
+from models.Portfolio import Portfolio
+
+
+@pytest.fixture
+def provider():
+    return SyntheticProvider(seed=11, start="2018-01-01")
+
+
+@pytest.fixture
+def portfolio(provider):
+    """
+    Two US equities bought in 2023, with a partial sale of AAPL and
+    XOM sold entirely.
+    """
+    portfolio = Portfolio(provider)
+    portfolio.add_new_asset(Asset("AAPL", "Information Technology", "Equities", 10, 100.0, provider, "2023-01-03"))
+    portfolio.assets["AAPL"].buy(5, 110.0, "2023-02-01")
+    portfolio.add_new_asset(Asset("XOM", "Energy", "Equities", 8, 50.0, provider, "2023-01-03"))
+    portfolio.sell("AAPL", 6, 120.0, "FIFO", "2023-06-01")
+    portfolio.sell("XOM", 8, 60.0, "FIFO", "2023-09-01")
+    return portfolio
@@ -0,0 +1,179 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.BarStore import BarStore
+from models.MarketData import SyntheticProvider, YahooProvider
+from models.Transport import Transport
+
+
+class RecordingProvider(SyntheticProvider):
+    """
+    Synthetic bars that records every download and can fail the
+    downloads of one month.
+    """
+    def __init__(self, fail_month=None, seed=5):
+        super().__init__(seed=seed, start="2023-01-01")
+        self.fail_month = fail_month
+        self.requests = []
+
+    def download_bars(self, tickers, start, end=None, interval="1m"):
+        self.requests.append((tuple(tickers), start, end))
+        if self.fail_month is not None and pd.Timestamp(start).strftime("%Y-%m") == self.fail_month:
+            raise ConnectionError("No bars returned")
+        return super().download_bars(tickers, start, end, interval)
+
+
+def intervals(store, ticker, interval="1h"):
+    with open(os.path.join(store._folder(interval, ticker), "manifest.json")) as f:
+        return json.load(f)["intervals"]
+
+
+def test_gap_between_stored_periods_is_retrieved(tmp_path):
+    provider = RecordingProvider()
+    store = BarStore(provider, str(tmp_path))
+    store.bars(["AAPL"], "2024-01-02", "2024-01-10", "1h")
+    store.bars(["AAPL"], "2024-03-04", "2024-03-08", "1h")
+
+    bars = store.bars(["AAPL"], "2024-01-02", "2024-03-08", "1h")
+    requests = [(start, end) for _, start, end in provider.requests[-3:]]
+
+    # 48 trading days of 7 hourly bars.
+    assert len(bars) == 336
+    expected = provider.download_bars(["AAPL"], "2024-01-02", "2024-03-08", "1h")
+    pd.testing.assert_frame_equal(bars, expected, check_freq=False, check_index_type=False)
+    assert intervals(store, "AAPL") == [["2024-01-02 00:00:00", "2024-03-08 00:00:00"]]
+    # Only the gap was retrieved by the last request.
+    assert requests == [
+        ("2024-01-10 00:00:00", "2024-02-01 00:00:00"),
+        ("2024-02-01 00:00:00", "2024-03-01 00:00:00"),
+        ("2024-03-01 00:00:00", "2024-03-04 00:00:00"),
+    ]
+
+
+def test_resampled_periods_are_merged_across_the_gap(tmp_path):
+    provider = RecordingProvider()
+    store = BarStore(provider, str(tmp_path))
+    # Both stored periods end in the middle of a week.
+    store.bars(["AAPL"], "2024-01-02", "2024-01-10", "1h", "W-FRI")
+    store.bars(["AAPL"], "2024-01-17", "2024-01-24", "1h", "W-FRI")
+
+    weekly = store.bars(["AAPL"], "2024-01-02", "2024-01-31", "1h", "W-FRI")
+
+    expected = provider.download_bars(["AAPL"], "2024-01-02", "2024-01-31", "1h").resample("W-FRI").last()
+    pd.testing.assert_frame_equal(weekly, expected, check_freq=False, check_index_type=False)
+
+
+def test_failed_month_is_not_recorded(tmp_path):
+    store = BarStore(RecordingProvider(fail_month="2024-02"), str(tmp_path))
+    with pytest.raises(ConnectionError):
+        store.ingest(["AAPL", "MSFT"], "2024-01-15", "2024-03-15", "1h")
+
+    assert intervals(store, "AAPL") == [["2024-01-15 00:00:00", "2024-02-01 00:00:00"]]
+
+    provider = RecordingProvider()
+    store = BarStore(provider, str(tmp_path))
+    store.ingest(["AAPL", "MSFT"], "2024-01-15", "2024-03-15", "1h")
+
+    assert provider.requests[0] == (("AAPL", "MSFT"), "2024-02-01 00:00:00", "2024-03-01 00:00:00")
+    assert intervals(store, "MSFT") == [["2024-01-15 00:00:00", "2024-03-15 00:00:00"]]
+
+
+def test_earlier_manifest_is_extended(tmp_path):
+    provider = RecordingProvider()
+    store = BarStore(provider, str(tmp_path))
+    store.ingest(["AAPL"], "2024-01-08", "2024-01-12", "1h")
+    folder = store._folder("1h", "AAPL")
+    # The single stored period of earlier versions.
+    with open(os.path.join(folder, "manifest.json"), "w") as f:
+        json.dump({"start": "2024-01-08 00:00:00", "until": "2024-01-12 00:00:00"}, f)
+
+    bars = store.bars(["AAPL"], "2024-01-02", "2024-01-19", "1h")
+
+    assert len(bars) == 13 * 7
+    assert intervals(store, "AAPL") == [["2024-01-02 00:00:00", "2024-01-19 00:00:00"]]
+
+
+def test_today_is_retrieved_until_it_has_passed(tmp_path):
+    provider = RecordingProvider()
+    store = BarStore(provider, str(tmp_path))
+    today = pd.Timestamp.now("UTC").tz_localize(None).normalize()
+    start = str((today - pd.Timedelta(days=3)).date())
+
+    store.ingest(["AAPL"], start, None, "1h")
+    store.ingest(["AAPL"], start, None, "1h")
+
+    assert intervals(store, "AAPL")[-1][1] == str(today)
+    assert provider.requests[-1][1] == str(today)
+
+
+def test_sources_are_stored_apart(tmp_path):
+    BarStore(RecordingProvider(), str(tmp_path)).bars(["AAPL"], "2024-01-02", "2024-01-10", "1h")
+    other = RecordingProvider(seed=6)
+
+    bars = BarStore(other, str(tmp_path)).bars(["AAPL"], "2024-01-02", "2024-01-10", "1h")
+
+    # Nothing is shared with the bars of the first source.
+    assert other.requests == [(("AAPL",), "2024-01-02 00:00:00", "2024-01-10 00:00:00")]
+    pd.testing.assert_frame_equal(
+        bars, other.download_bars(["AAPL"], "2024-01-02", "2024-01-10", "1h"),
+        check_freq=False, check_index_type=False,
+    )
+
+
+def test_merge_keeps_the_latest_bar_of_a_period():
+    periods = np.zeros(3, BarStore.RESAMPLED_DTYPE)
+    periods["label"] = [1, 1, 2]
+    periods["time"] = [10, 5, 20]
+    periods["close"] = [1.0, 2.0, 3.0]
+
+    merged = BarStore.merge([periods[1:], periods[:1]])
+
+    assert merged["close"].tolist() == [1.0, 3.0]
+
+
+class EmptyBarsProvider(YahooProvider):
+    """
+    Yahoo provider without network access: intraday downloads return
+    no bars, daily downloads return the given closes.
+    """
+    def __init__(self, daily):
+        super().__init__(Transport(retries=0))
+        self.daily = daily
+        self.daily_requests = []
+
+    def _download(self, tickers, allow_empty=False, **kwargs):
+        if kwargs.get("interval", "1d") != "1d":
+            return pd.DataFrame()
+        self.daily_requests.append((kwargs["start"], kwargs["end"]))
+        return self.daily
+
+
+def recent_monday():
+    today = pd.Timestamp.now("UTC").tz_localize(None).normalize()
+    return today - pd.Timedelta(days=today.weekday() + 7)
+
+
+def test_yahoo_empty_bars_on_a_trading_day_raise():
+    monday = recent_monday()
+    daily = pd.DataFrame({("Close", "AAPL"): [190.0]}, index=[monday])
+    provider = EmptyBarsProvider(daily)
+
+    with pytest.raises(ConnectionError, match="AAPL"):
+        provider.download_bars(["AAPL"], str(monday), str(monday + pd.Timedelta(days=1)), "5m")
+
+
+def test_yahoo_empty_bars_without_trading_are_accepted():
+    monday = recent_monday()
+    provider = EmptyBarsProvider(pd.DataFrame())
+
+    # A holiday: no daily close either.
+    bars = provider.download_bars(["AAPL"], str(monday), str(monday + pd.Timedelta(days=1)), "5m")
+    # A weekend: no daily closes are requested.
+    weekend = provider.download_bars(["AAPL"], str(monday - pd.Timedelta(days=2)), str(monday), "5m")
+
+    assert bars.empty and weekend.empty
+    assert len(provider.daily_requests) == 1
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.Asset import Asset
+from models.FX import FXConverter, get_converter
+from models.MarketData import SyntheticProvider
+from models.Portfolio import Portfolio
+
+
+class RecordingProvider(SyntheticProvider):
+    """
+    Synthetic market that records quote requests, and can hide the
+    exchange rates before a date or altogether.
+    """
+    def __init__(self, rates_from=None, quotes=True):
+        super().__init__(seed=3, start="2020-01-01")
+        self.rates_from = rates_from
+        self.quotes = quotes
+        self.requests = []
+        self.currency_requests = []
+
+    def currency(self, ticker):
+        self.currency_requests.append(ticker)
+        return super().currency(ticker)
+
+    def last_prices(self, tickers):
+        self.requests.append(list(tickers))
+        prices = super().last_prices(tickers)
+        if not self.quotes:
+            prices[[ticker for ticker in tickers if ticker.endswith("=X")]] = np.nan
+        return prices
+
+    def download_close(self, tickers, start, end=None):
+        closes = super().download_close(tickers, start, end)
+        if self.rates_from is not None:
+            pairs = [ticker for ticker in closes.columns if ticker.endswith("=X")]
+            closes.loc[closes.index < pd.Timestamp(self.rates_from), pairs] = np.nan
+        return closes
+
+
+def test_rates_follow_the_pair_and_minor_units():
+    provider = RecordingProvider()
+    dates = pd.bdate_range("2023-03-01", "2023-03-31")
+    rates = FXConverter(provider, base="USD").rates(["ASML.AS", "VOD.L", "AAPL"], dates)
+    closes = provider.download_close(["EURUSD=X", "GBPUSD=X"], "2023-02-01", "2023-04-01").reindex(dates)
+
+    np.testing.assert_allclose(rates["ASML.AS"], closes["EURUSD=X"])
+    np.testing.assert_allclose(rates["VOD.L"], closes["GBPUSD=X"] * 0.01)
+    assert (rates["AAPL"] == 1.0).all()
+
+
+def test_rates_carry_forward_only():
+    provider = RecordingProvider()
+    weekend = pd.DatetimeIndex(["2023-03-03", "2023-03-04", "2023-03-05", "2023-03-06"])
+    rates = FXConverter(provider, base="USD").rates(["ASML.AS"], weekend)["ASML.AS"]
+    friday = provider.download_close(["EURUSD=X"], "2023-03-03", "2023-03-04")["EURUSD=X"].iloc[0]
+
+    assert rates.iloc[1] == rates.iloc[2] == friday
+
+    # A rate known only from a later date is never applied to earlier prices.
+    provider = RecordingProvider(rates_from="2023-03-15")
+    with pytest.raises(ValueError, match="EURUSD=X on or before 2023-03-01"):
+        FXConverter(provider, base="USD").rates(["ASML.AS"], pd.bdate_range("2023-03-01", "2023-03-31"))
+
+
+def test_missing_rate_raises():
+    provider = RecordingProvider(quotes=False)
+    with pytest.raises(ValueError, match="EURUSD=X"):
+        FXConverter(provider, base="USD").latest_rates(["ASML.AS"])
+
+    provider = RecordingProvider(rates_from="2100-01-01")
+    with pytest.raises(ValueError, match="No exchange rate found for EURUSD=X"):
+        FXConverter(provider, base="USD").rates(["ASML.AS"], pd.bdate_range("2023-03-01", "2023-03-31"))
+
+
+def test_converter_is_shared_per_provider():
+    provider = RecordingProvider()
+    asset = Asset("ASML.AS", "Information Technology", "Equities", 1, 600.0, provider=provider)
+    for _ in range(3):
+        asset.buy(1, 600.0)
+
+    assert get_converter(provider) is get_converter(provider)
+    assert get_converter(provider) is not get_converter(RecordingProvider())
+    # One exchange rate request for all four purchases.
+    assert provider.requests == [["EURUSD=X"]]
+    assert asset.current_value == pytest.approx(4 * asset.last_price() * asset.fx_rate())
+
+
+def test_currencies_are_retrieved_once():
+    provider = RecordingProvider()
+    portfolio = Portfolio(provider)
+    for ticker in ["ASML.AS", "VOD.L", "AAPL"]:
+        portfolio.add_new_asset(Asset(ticker, "Information Technology", "Equities", 1, 10.0, provider=provider))
+    converter = get_converter(provider)
+
+    converter.convert_values(pd.Series(1.0, index=["ASML.AS", "VOD.L", "AAPL"]))
+    converter.rates(["ASML.AS", "VOD.L", "AAPL", "SAP.DE"], pd.bdate_range("2023-03-01", "2023-03-31"))
+    converter.rates(["SAP.DE", "AAPL"], pd.bdate_range("2023-03-01", "2023-03-31"))
+
+    # Once per asset when it is added, once for the ticker that is not held.
+    assert provider.currency_requests == ["ASML.AS", "VOD.L", "AAPL", "SAP.DE"]
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.Backtester import Backtester
+from models.LotQueue import LotQueue
+
+
+def make_queue():
+    return LotQueue([10, 5, 5], [100.0, 110.0, 130.0], ["2023-01-03", "2023-02-01", "2023-03-01"])
+
+
+def test_fifo_sells_oldest_lots_first():
+    queue = make_queue()
+
+    assert queue.sell(12, "FIFO") == [(10, 100.0), (2, 110.0)]
+    assert queue.lots() == ([3, 5], [110.0, 130.0], ["2023-02-01", "2023-03-01"])
+    assert queue.cost == pytest.approx(3 * 110 + 5 * 130)
+
+
+def test_lifo_sells_newest_lots_first():
+    queue = make_queue()
+
+    assert queue.sell(7, "LIFO") == [(5, 130.0), (2, 110.0)]
+    assert queue.lots() == ([10, 3], [100.0, 110.0], ["2023-01-03", "2023-02-01"])
+
+
+def test_average_reduces_every_lot():
+    queue = make_queue()
+    average = (10 * 100 + 5 * 110 + 5 * 130) / 20
+
+    assert queue.sell(5, "Average") == [(5, pytest.approx(average))]
+    quantities, prices, _ = queue.lots()
+    np.testing.assert_allclose(quantities, [7.5, 3.75, 3.75])
+    assert prices == [100.0, 110.0, 130.0]
+    assert queue.cost == pytest.approx(15 * average)
+
+
+def test_selling_everything_and_too_much():
+    queue = make_queue()
+    with pytest.raises(ValueError, match="only 20 held"):
+        queue.sell(21, "FIFO")
+
+    queue.sell(20, "LIFO")
+    assert queue.quantity == 0 and queue.cost == 0
+    assert queue.lots() == ([], [], [])
+
+
+def test_portfolio_sale_realises_against_matched_lots(portfolio):
+    # AAPL: 6 of the first lot (bought at 100) sold at 120, XOM: all 8 (at 50) sold at 60.
+    realised = {sale[0]: sale[-1] for sale in portfolio.sales}
+
+    assert realised == {"AAPL": pytest.approx(6 * 20), "XOM": pytest.approx(8 * 10)}
+    assert portfolio.assets["AAPL"].quantity == [4, 5]
+    assert "XOM" not in portfolio.assets
+    assert [purchase[0] for purchase in portfolio.closed] == ["XOM"]
+
+
+def test_sales_update_the_lots_of_the_asset_in_place(portfolio):
+    asset = portfolio.assets["AAPL"]
+    lots = asset.lots
+    clone = asset.copy()
+
+    portfolio.sell("AAPL", 5, 130.0, "LIFO", "2023-07-03")
+
+    assert asset.lots is lots
+    assert (asset.quantity, asset.purchase_price) == ([4], [100.0])
+    assert asset.held == 4 and asset.transaction_value == pytest.approx(400.0)
+    # The copy keeps its own lots.
+    assert clone.quantity == [4, 5]
+
+
+def test_rejected_trades_leave_the_lots_untouched(portfolio):
+    trades = pd.DataFrame({
+        "ticker": ["AAPL", "AAPL"],
+        "side": ["SELL", "SELL"],
+        "quantity": [4, 6],
+        "price": [130.0, 130.0],
+    })
+    with pytest.raises(ValueError, match="only 5 held"):
+        portfolio.process_trades(trades)
+
+    assert portfolio.assets["AAPL"].quantity == [4, 5]
+    realised = portfolio.process_trades(trades.iloc[:1], "FIFO")
+    assert realised.tolist() == [pytest.approx(4 * 30.0)]
+    assert portfolio.assets["AAPL"].quantity == [5]
+
+
+def test_backtest_lots_include_closed_assets_and_sales(portfolio):
+    lots = Backtester(portfolio).lots()
+
+    assert sorted(zip(lots["ticker"], lots["date"].dt.strftime("%Y-%m-%d"), lots["quantity"])) == [
+        ("AAPL", "2023-01-03", 10.0),
+        ("AAPL", "2023-02-01", 5.0),
+        ("AAPL", "2023-06-01", -6.0),
+        ("XOM", "2023-01-03", 8.0),
+        ("XOM", "2023-09-01", -8.0),
+    ]
+
+
+def test_backtest_replays_the_trades(portfolio, provider):
+    navs = Backtester(portfolio).run(None, "2023-01-01", "2023-12-30")
+    closes = provider.download_close(["AAPL", "XOM"], "2023-01-01", "2023-12-30")
+    dates = closes.index
+    holdings = pd.DataFrame(
+        {
+            "AAPL": 10.0 * (dates >= "2023-01-03") + 5 * (dates >= "2023-02-01") - 6 * (dates >= "2023-06-01"),
+            "XOM": 8.0 * (dates >= "2023-01-03") - 8 * (dates >= "2023-09-01"),
+        },
+        index=dates,
+    )
+
+    np.testing.assert_allclose(navs["Buy and Hold"], (holdings * closes).sum(axis=1))
+    assert navs["Invested"].iloc[-1] == pytest.approx(10 * 100 + 5 * 110 + 8 * 50 - 6 * 120 - 8 * 60)
+
+
+def test_single_asset_strategies_agree(portfolio):
+    # With one asset every strategy holds the same, sales leave all of them alike.
+    navs = Backtester(portfolio).run({"sector": "Information Technology"}, "2023-01-01", "2023-12-30", "Weekly")
+
+    np.testing.assert_allclose(navs["Weekly Rebalance"], navs["Buy and Hold"])
+    np.testing.assert_allclose(navs["Continuous Rebalance"], navs["Buy and Hold"])
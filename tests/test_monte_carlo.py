@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.MonteCarlo import MonteCarlo
+
+
+@pytest.fixture
+def nav(provider):
+    return provider.download_close(["SPY"], "2019-01-01", "2024-01-01")
+
+
+def window_sums(log_returns, days):
+    cumulative = np.concatenate(([0.0], np.cumsum(log_returns)))
+    return cumulative[days:] - cumulative[:-days]
+
+
+def test_bootstrap_steps_are_historical_windows():
+    log_returns = np.random.default_rng(0).normal(0, 0.01, 300)
+    step_days = np.array([5, 5, 4, 6, 5])
+
+    shocks = MonteCarlo.bootstrap_returns(log_returns, step_days, 200, 5, np.random.default_rng(1))
+
+    assert shocks.shape == (5, 200)
+    for row, days in enumerate(step_days):
+        assert np.isin(shocks[row], window_sums(log_returns, days)).all()
+
+
+def test_bootstrap_blocks_are_consecutive():
+    log_returns = np.random.default_rng(0).normal(0, 0.01, 300)
+    step_days = np.ones(7, dtype=np.int64)
+
+    shocks = MonteCarlo.bootstrap_returns(log_returns, step_days, 100, 3, np.random.default_rng(2))
+
+    # Within a block of 3 steps the returns follow each other in the history.
+    order = np.abs(shocks[:, :, None] - log_returns).argmin(axis=2)
+    for block in (slice(0, 3), slice(3, 6)):
+        assert (np.diff(order[block], axis=0) == 1).all()
+
+
+def test_bootstrap_is_reproducible_and_needs_enough_history():
+    log_returns = np.random.default_rng(0).normal(0, 0.01, 50)
+    step_days = np.full(4, 5)
+    first = MonteCarlo.bootstrap_returns(log_returns, step_days, 10, 2, np.random.default_rng(3))
+    second = MonteCarlo.bootstrap_returns(log_returns, step_days, 10, 2, np.random.default_rng(3))
+
+    np.testing.assert_array_equal(first, second)
+    with pytest.raises(ValueError, match="too short"):
+        MonteCarlo.bootstrap_returns(log_returns, np.full(4, 21), 10, 4)
+
+
+def test_bootstrap_engine_starts_from_the_last_price(nav):
+    _, paths, dates = MonteCarlo.simulate_from_prices(
+        nav, n=500, months=12, engine="Bootstrap", block_size=3, step="Monthly", seed=4,
+    )
+    _, step_days = MonteCarlo.future_steps(nav.index[-1], 12, "Monthly")
+    log_returns = np.diff(np.log(nav.to_numpy().ravel()))
+
+    assert paths.shape == (len(dates), 500)
+    # The history ends on Friday 29 December, the first step (to 31 December) has no trading days.
+    assert step_days[0] == 0
+    np.testing.assert_allclose(paths[0], nav.iloc[-1].item())
+    second_step = np.log(paths[1] / paths[0])
+    assert np.isclose(second_step[:, None], window_sums(log_returns, step_days[1])).any(axis=1).all()
+
+
+@pytest.mark.parametrize("step", list(MonteCarlo.STEPS))
+def test_steps_cover_the_horizon_exactly(step):
+    last_date = pd.Timestamp("2023-12-29")
+    dates, step_days = MonteCarlo.future_steps(last_date, 18, step, horizons=[6, 12])
+
+    assert dates[-1] == pd.Timestamp("2025-06-29")
+    assert (dates > last_date).all() and dates.is_monotonic_increasing
+    assert step_days.sum() == np.busday_count("2023-12-30", "2025-06-30")
+    rows = MonteCarlo.horizon_rows(dates, last_date, [6, 12, 18])
+    assert list(dates[rows]) == [pd.Timestamp("2024-06-29"), pd.Timestamp("2024-12-29"), dates[-1]]
+
+
+def test_gbm_terminal_distribution_does_not_depend_on_the_step(nav):
+    log_returns = np.diff(np.log(nav.to_numpy().ravel()))
+    mu, sigma = log_returns.mean(), log_returns.std()
+    days = np.busday_count("2023-12-30", "2024-12-30")
+
+    for step in ["Daily", "Quarterly"]:
+        _, paths, _ = MonteCarlo.simulate_from_prices(nav, n=20000, months=12, step=step, seed=5)
+        terminal = np.log(paths[-1] / nav.iloc[-1].item())
+        assert terminal.mean() == pytest.approx(mu * days, abs=4 * sigma * np.sqrt(days / 20000))
+        assert terminal.std() == pytest.approx(sigma * np.sqrt(days), rel=0.03)
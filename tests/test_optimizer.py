@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.Optimizer import Optimizer
+
+
+TICKERS = ["AAA", "BBB", "CCC", "DDD"]
+GROUPS = {
+    "asset_class": {"AAA": "Equities", "BBB": "Equities", "CCC": "Fixed Income", "DDD": "Fixed Income"},
+    "sector": {ticker: "Other" for ticker in TICKERS},
+}
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(7)
+    daily = rng.normal(0.0, 1.0, (750, len(TICKERS))) * [0.012, 0.015, 0.006, 0.008]
+    daily += rng.normal(0.0, 0.004, (750, 1))
+    # Exact mean daily returns, so the closed form solutions are known to be long only.
+    daily += [0.0006, 0.0007, 0.0002, 0.0003] - daily.mean(axis=0)
+    return pd.DataFrame(daily, columns=TICKERS)
+
+
+def optimize(returns, **kwargs):
+    current = pd.Series(0.25, index=TICKERS)
+    return Optimizer.optimize_returns(returns, current, GROUPS, n=20000, seed=1, **kwargs)
+
+
+def statistics(returns):
+    return returns.mean().to_numpy() * Optimizer.TRADING_DAYS, returns.cov().to_numpy() * Optimizer.TRADING_DAYS
+
+
+def test_solve_qp_known_solution():
+    # Closest point to (1, 3) with x1 + x2 = 1 and x >= 0 is (0, 1).
+    x = Optimizer.solve_qp(
+        2 * np.eye(2), np.array([-2.0, -6.0]), np.ones((1, 2)), np.ones(1), -np.eye(2), np.zeros(2),
+    )
+    np.testing.assert_allclose(x, [0.0, 1.0], atol=1e-8)
+
+
+def test_solve_qp_infeasible_raises():
+    # x >= 0.6 and x <= 0.4 cannot both hold.
+    with pytest.raises(ValueError):
+        Optimizer.solve_qp(
+            np.eye(1), np.zeros(1), np.ones((1, 1)), np.array([0.5]),
+            np.array([[-1.0], [1.0]]), np.array([-0.6, 0.4]),
+        )
+
+
+def test_min_variance_and_max_sharpe_match_closed_form(returns):
+    mu, cov = statistics(returns)
+    ones = np.ones(len(TICKERS))
+    min_variance = np.linalg.solve(cov, ones)
+    tangency = np.linalg.solve(cov, mu - 0.01)
+    # Both unconstrained solutions are long only here, so the bounds are not active.
+    assert (min_variance > 0).all() and (tangency > 0).all()
+
+    portfolios, _, _ = optimize(returns, risk_free=0.01)
+
+    np.testing.assert_allclose(portfolios.loc["Min Variance", TICKERS], min_variance / min_variance.sum(), atol=1e-6)
+    np.testing.assert_allclose(portfolios.loc["Max Sharpe", TICKERS], tangency / tangency.sum(), atol=1e-6)
+
+
+def test_samples_never_beat_the_optimum(returns):
+    constraints = {"asset_class": {"Equities": (0.2, 0.5)}}
+    portfolios, frontier, cloud = optimize(returns, constraints=constraints, risk_free=0.02)
+
+    assert len(cloud) > 0
+    assert (cloud["Volatility"] >= portfolios.loc["Min Variance", "Volatility"] - 1e-9).all()
+    assert (cloud["Sharpe"] <= portfolios.loc["Max Sharpe", "Sharpe"] + 1e-9).all()
+    assert frontier["Return"].is_monotonic_increasing
+    for name in ["Min Variance", "Max Sharpe"]:
+        weights = portfolios.loc[name, TICKERS]
+        assert weights.min() >= 0 and weights.sum() == pytest.approx(1.0)
+        assert 0.2 - 1e-9 <= weights[["AAA", "BBB"]].sum() <= 0.5 + 1e-9
+
+
+def test_binding_group_constraint(returns):
+    # The unconstrained minimum variance portfolio holds mostly fixed income.
+    constraints = {"asset_class": {"Equities": (0.7, 1.0)}}
+    portfolios, frontier, _ = optimize(returns, constraints=constraints)
+
+    assert portfolios.loc["Min Variance", ["AAA", "BBB"]].sum() == pytest.approx(0.7, abs=1e-6)
+    equities = frontier[["AAA", "BBB"]].sum(axis=1)
+    assert (equities >= 0.7 - 1e-6).all()
+
+
+def test_infeasible_constraints_raise(returns):
+    constraints = {"asset_class": {"Equities": (0.7, 1.0), "Fixed Income": (0.5, 1.0)}}
+    with pytest.raises(ValueError):
+        optimize(returns, constraints=constraints)
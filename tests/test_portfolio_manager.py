@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.Asset import Asset
+from models.PortfolioManager import PortfolioManager
+
+
+@pytest.fixture
+def manager(provider):
+    manager = PortfolioManager(provider)
+    growth = manager.get_or_create("growth")
+    growth.add_new_asset(Asset("AAPL", "Information Technology", "Equities", 10, 100.0, manager.provider, "2023-01-03"))
+    growth.assets["AAPL"].buy(5, 110.0, "2023-02-01")
+    growth.add_new_asset(Asset("ASML.AS", "Information Technology", "Equities", 2, 600.0, manager.provider, "2023-01-03"))
+    income = manager.get_or_create("income")
+    income.add_new_asset(Asset("AAPL", "Information Technology", "Equities", 3, 100.0, manager.provider, "2023-01-03"))
+    income.add_new_asset(Asset("XOM", "Energy", "Equities", 8, 50.0, manager.provider, "2023-01-03"))
+    manager.get_or_create("empty")
+    return manager
+
+
+def test_revalue_all_values_every_book_at_the_quotes(manager):
+    prices = pd.Series({"AAPL": 200.0, "ASML.AS": 700.0})
+    xom = manager.portfolios["income"].assets["XOM"].current_value
+    rate = manager.fx.latest_rates(["ASML.AS"]).iloc[0]
+
+    totals = manager.revalue_all(prices)
+
+    assert manager.portfolios["growth"].assets["AAPL"].current_value == pytest.approx(15 * 200.0)
+    assert manager.portfolios["growth"].assets["ASML.AS"].current_value == pytest.approx(2 * 700.0 * rate)
+    # Without a quote the value is kept.
+    assert manager.portfolios["income"].assets["XOM"].current_value == xom
+    np.testing.assert_allclose(totals[["growth", "income", "empty"]], [3000.0 + 1400.0 * rate, 600.0 + xom, 0.0])
+
+
+def test_revalue_all_retrieves_the_quotes(manager, provider):
+    totals = manager.revalue_all()
+    prices = provider.last_prices(["AAPL", "ASML.AS", "XOM"])
+    prices["ASML.AS"] *= manager.fx.latest_rates(["ASML.AS"]).iloc[0]
+
+    expected = manager.holdings().reindex(columns=prices.index).fillna(0.0) @ prices
+    np.testing.assert_allclose(totals[expected.index], expected)
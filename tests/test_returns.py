@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.Asset import Asset
+from models.Portfolio import Portfolio
+from models.Returns import ReturnCalculator
+
+
+def bisect_irr(amounts, years):
+    """
+    Root of the future value of one row of cash flows by plain
+    bisection, assuming a single root within the bounds.
+    """
+    def value(rate):
+        return (amounts * (1 + rate) ** years).sum()
+
+    low, high = ReturnCalculator.IRR_BOUNDS
+    for _ in range(200):
+        middle = (low + high) / 2
+        if np.sign(value(middle)) == np.sign(value(low)):
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def test_irr_of_known_cash_flows():
+    amounts = np.array([
+        [-100.0, 0.0, 121.0],
+        [-100.0, -100.0, 250.0],
+        [-100.0, 0.0, -5.0],
+        [-100.0, 0.0, 10.0],
+    ])
+    years = np.array([2.0, 1.0, 0.0])
+
+    rates = ReturnCalculator.irr(amounts, years)
+
+    assert rates[0] == pytest.approx(0.1)
+    # 100 (1 + r)^2 + 100 (1 + r) = 250.
+    assert rates[1] == pytest.approx((np.sqrt(11) - 1) / 2 - 1)
+    # Money is only lost: no root within the bounds.
+    assert np.isnan(rates[2])
+    assert rates[3] == pytest.approx(np.sqrt(0.1) - 1)
+
+
+def test_irr_agrees_with_bisection():
+    rng = np.random.default_rng(0)
+    amounts = -rng.uniform(10, 100, (50, 12))
+    amounts[:, -1] = -amounts[:, :-1].sum(axis=1) * rng.uniform(0.5, 2.0, 50)
+    years = np.linspace(3.0, 0.0, 12)
+
+    rates = ReturnCalculator.irr(amounts, years)
+
+    expected = [bisect_irr(row, years) for row in amounts]
+    np.testing.assert_allclose(rates, expected, rtol=1e-7, atol=1e-9)
+
+
+def test_time_weighted_return_ignores_the_cash_flows():
+    # 100 bought, +10%; 1000 bought at the start of day 2, +10%; 605 sold at the end of day 3, +0%.
+    values = np.array([[110.0], [1221.0], [616.0]])
+    bought = np.array([[100.0], [1000.0], [0.0]])
+    sold = np.array([[0.0], [0.0], [605.0]])
+
+    twr, first, last = ReturnCalculator.time_weighted(values, bought, sold)
+
+    assert twr[0] == pytest.approx(0.21)
+    assert (first[0], last[0]) == (0, 2)
+    twr, first, last = ReturnCalculator.time_weighted(np.zeros((3, 1)), np.zeros((3, 1)), np.zeros((3, 1)))
+    assert twr[0] == 0 and first[0] == last[0] == -1
+
+
+def test_buy_and_hold_returns_follow_the_price(provider):
+    portfolio = Portfolio(provider)
+    portfolio.add_new_asset(Asset("MSFT", "Information Technology", "Equities", 4, 250.0, provider, "2023-03-01"))
+    closes = provider.download_close(["MSFT"], "2023-03-01")["MSFT"]
+
+    result = ReturnCalculator(portfolio).run()
+
+    assert result.loc["Total", "Start"] == str(closes.index[0].date())
+    assert result.loc["Total", "Value"] == pytest.approx(4 * closes.iloc[-1])
+    assert result.loc["Total", "TWR %"] == pytest.approx(100 * (closes.iloc[-1] / 250.0 - 1))
+    years = (closes.index[-1] - closes.index[0]).days / ReturnCalculator.DAYS_PER_YEAR
+    assert result.loc["Total", "MWR % p.a."] == pytest.approx(100 * ((closes.iloc[-1] / 250.0) ** (1 / years) - 1))
+
+
+def test_returns_include_sales_and_closed_assets(portfolio):
+    calculator = ReturnCalculator(portfolio)
+    flows = calculator.flows()
+    result = calculator.run(by="ticker")
+
+    assert sorted(flows["amount"]) == [-720.0, -480.0, 400.0, 550.0, 1000.0]
+    assert result.loc["Total", "Bought"] == pytest.approx(1950.0)
+    assert result.loc["Total", "Sold"] == pytest.approx(1200.0)
+    assert result.loc["XOM", "Value"] == 0
+    # XOM was held from the purchase to the sale, its return is the price change in between.
+    assert result.loc["XOM", "TWR %"] == pytest.approx(20.0)
+    assert result.loc["XOM", "MWR % p.a."] == pytest.approx(
+        100 * (1.2 ** (ReturnCalculator.DAYS_PER_YEAR / (pd.Timestamp("2023-09-01") - pd.Timestamp("2023-01-03")).days) - 1),
+    )
+    index, tickers, values, bought, sold = calculator.valuation(flows)
+    amounts = sold.sum(axis=1) - bought.sum(axis=1)
+    amounts[-1] += values[-1].sum()
+    years = (index[-1] - index).days.to_numpy() / ReturnCalculator.DAYS_PER_YEAR
+    assert result.loc["Total", "MWR % p.a."] == pytest.approx(100 * bisect_irr(amounts, years), rel=1e-6)
+    with pytest.raises(ValueError, match="No purchases"):
+        calculator.run({"sector": "Utilities"})
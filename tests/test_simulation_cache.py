@@ -0,0 +1,118 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from models.Asset import Asset
+from models.MarketData import CachedProvider, SyntheticProvider
+from models.Portfolio import Portfolio
+from models.SimulationCache import SimulationCache
+
+
+PARAMS = dict(startDate="2020-01-01", endDate="2024-01-01", n=1000, months=12, engine="GBM", seed=1)
+
+
+def key(portfolio, restrictions=None, **params):
+    return SimulationCache.key(portfolio, restrictions, **{**PARAMS, **params})
+
+
+def test_key_ignores_live_values(portfolio):
+    before = key(portfolio)
+    portfolio.assets["AAPL"].current_value *= 1.05
+
+    assert key(portfolio) == before
+
+
+def test_key_follows_the_lots(portfolio):
+    before = key(portfolio)
+    portfolio.assets["AAPL"].buy(1, 150.0, "2023-11-01")
+    bought = key(portfolio)
+    portfolio.sell("AAPL", 1, 160.0, "FIFO", "2023-12-01")
+    sold = key(portfolio)
+
+    assert len({before, bought, sold}) == 3
+    # Selling the new lot again restores the earlier holdings.
+    portfolio.assets["AAPL"].buy(1, 100.0, "2023-01-03")
+    portfolio.sell("AAPL", 1, 160.0, "LIFO", "2023-12-01")
+    assert key(portfolio) == sold
+
+
+def test_key_follows_filter_and_parameters(portfolio):
+    keys = {
+        key(portfolio),
+        key(portfolio, {"sector": "Information Technology"}),
+        key(portfolio, seed=2),
+        key(portfolio, engine="Bootstrap", block_size=6),
+        key(portfolio, months=24),
+    }
+
+    assert len(keys) == 5
+
+
+def test_key_ignores_the_order_of_the_assets(provider):
+    first, second = Portfolio(provider), Portfolio(provider)
+    aapl = Asset("AAPL", "Information Technology", "Equities", 10, 100.0, provider, "2023-01-03")
+    xom = Asset("XOM", "Energy", "Equities", 8, 50.0, provider, "2023-01-03")
+    for asset in (aapl, xom):
+        first.add_new_asset(asset)
+    for asset in (xom, aapl):
+        second.add_new_asset(asset)
+
+    assert key(first) == key(second)
+
+
+def test_key_follows_the_data_source(provider):
+    def book(provider):
+        portfolio = Portfolio(provider)
+        portfolio.add_new_asset(Asset("AAPL", "Information Technology", "Equities", 10, 100.0, provider, "2023-01-03"))
+        return portfolio
+
+    keys = {
+        key(book(provider)),
+        key(book(SyntheticProvider(seed=12, start="2018-01-01"))),
+        key(book(SyntheticProvider(seed=11, start="2019-01-01"))),
+        key(book(CachedProvider(SyntheticProvider(seed=12, start="2018-01-01")))),
+    }
+
+    assert len(keys) == 3
+
+
+def simulation(seed, steps=13, n=500):
+    history = pd.DataFrame({"Price": np.linspace(100, 120, 30)}, index=pd.bdate_range("2023-11-20", periods=30))
+    future_index = pd.date_range("2024-01-31", periods=steps, freq="ME")
+    sims = 120 * np.exp(np.random.default_rng(seed).normal(0, 0.05, (steps, n)).cumsum(axis=0))
+    return history, future_index, sims
+
+
+def test_store_and_load_round_trip(tmp_path):
+    cache = SimulationCache(str(tmp_path), store_paths=True)
+    history, future_index, sims = simulation(0)
+    terminals = sims[[5, 12]]
+
+    cache.store("a", history, future_index, sims, terminals)
+    loaded_history, loaded_index, bands, samples, paths, loaded_terminals = cache.load("a")
+
+    pd.testing.assert_frame_equal(loaded_history, history, check_freq=False, check_index_type=False)
+    assert list(loaded_index) == list(future_index)
+    np.testing.assert_allclose(bands, np.percentile(sims, SimulationCache.QUANTILES, axis=1))
+    np.testing.assert_array_equal(samples, sims[:, :SimulationCache.SAMPLES])
+    np.testing.assert_array_equal(paths, sims)
+    np.testing.assert_array_equal(loaded_terminals, terminals)
+    assert cache.load("missing") is None
+
+
+def test_least_recently_used_results_are_evicted(tmp_path):
+    cache = SimulationCache(str(tmp_path), store_paths=True)
+    for i, name in enumerate(["a", "b"]):
+        cache.store(name, *simulation(i))
+        # Distinct access times, regardless of the resolution of the file system.
+        os.utime(os.path.join(str(tmp_path), name, "meta.json"), (i, i))
+    size = sum(entry.stat().st_size for entry in os.scandir(os.path.join(str(tmp_path), "a")))
+
+    # Room for two results, the sizes differ by a few bytes of metadata.
+    cache.max_bytes = 2 * size + 1024
+    assert cache.load("a") is not None
+    cache.store("c", *simulation(2))
+
+    assert cache.contains("a") and cache.contains("c")
+    assert not cache.contains("b")
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.Asset import Asset
+from models.MarketData import SyntheticProvider
+from models.Portfolio import Portfolio
+from models.StressTest import StressTester
+
+
+@pytest.fixture
+def stressed(provider):
+    portfolio = Portfolio(provider)
+    portfolio.add_new_asset(Asset("AAPL", "Information Technology", "Equities", 10, 100.0, provider, "2019-01-02"))
+    portfolio.add_new_asset(Asset("XOM", "Energy", "Equities", 20, 50.0, provider, "2019-01-02"))
+    portfolio.add_new_asset(Asset("TLT", "Government Bonds", "Fixed Income", 30, 90.0, provider, "2019-01-02"))
+    return StressTester(portfolio)
+
+
+def holdings(values=(1000.0, 500.0, 2000.0)):
+    return pd.DataFrame(
+        {
+            "ticker": ["AAPL", "XOM", "TLT"],
+            "asset_class": ["Equities", "Equities", "Fixed Income"],
+            "sector": ["Information Technology", "Energy", "Government Bonds"],
+            "value": list(values),
+        },
+    ).set_index("ticker", drop=False)
+
+
+def test_most_specific_shock_applies():
+    scenarios = {
+        "Mixed": {
+            "asset_class": {"Equities": -0.2},
+            "sector": {"Information Technology": -0.3},
+            "ticker": {"AAPL": -0.5},
+        },
+        "Sector": {"asset_class": {"Equities": -0.2}, "sector": {"Energy": 0.1}},
+        "None": {},
+    }
+
+    shocks = StressTester.shock_matrix(scenarios, holdings())
+
+    np.testing.assert_allclose(shocks.loc["Mixed"], [-0.5, -0.2, 0.0])
+    np.testing.assert_allclose(shocks.loc["Sector"], [-0.2, 0.1, 0.0])
+    np.testing.assert_allclose(shocks.loc["None"], [0.0, 0.0, 0.0])
+    with pytest.raises(ValueError, match="Invalid level"):
+        StressTester.shock_matrix({"Bad": {"country": {"US": -0.1}}}, holdings())
+
+
+def test_stress_values_match_the_scenario_by_scenario_sums():
+    shocks = StressTester.shock_matrix(StressTester.SCENARIOS, holdings())
+
+    for by in StressTester.LEVELS:
+        values = StressTester.stress_values(shocks, holdings(), by)
+        for name, row in shocks.iterrows():
+            pnl = row * holdings()["value"]
+            assert values.loc[name, "Total"] == pytest.approx(pnl.sum())
+            assert values.loc[name, "Total %"] == pytest.approx(100 * pnl.sum() / 3500.0)
+            for group, group_pnl in pnl.groupby(holdings()[by]).sum().items():
+                assert values.loc[name, group] == pytest.approx(group_pnl)
+    with pytest.raises(ValueError, match="Invalid grouping"):
+        StressTester.stress_values(shocks, holdings(), "country")
+
+
+def test_replay_uses_the_last_price_and_proxies_missing_history():
+    index = pd.to_datetime(["2024-01-02", "2024-01-03", "2024-01-05", "2024-01-08"])
+    prices = np.array([
+        [100.0, np.nan, 50.0],
+        [110.0, np.nan, 55.0],
+        [121.0, 20.0, 45.0],
+        [99.0, 22.0, 40.0],
+    ])
+    starts = pd.to_datetime(["2024-01-03", "2024-01-04", "2024-01-01"])
+    ends = pd.to_datetime(["2024-01-06", "2024-01-08", "2024-01-05"])
+
+    shocks = StressTester.replay(prices, index, starts, ends, holdings(), ["a", "b", "c"])
+
+    # Weekend and holiday dates take the last price before them.
+    np.testing.assert_allclose(shocks.loc["a"], [0.1, 0.1, 45 / 55 - 1])
+    np.testing.assert_allclose(shocks.loc["b"], [0.9 - 1, 0.9 - 1, 40 / 55 - 1])
+    # No price on or before the start: nothing to replay.
+    np.testing.assert_allclose(shocks.loc["c"], [0.0, 0.0, 0.0])
+
+
+def test_run_stresses_the_current_values(stressed):
+    result = stressed.run(by="ticker", historical=False)
+    shocks = StressTester.shock_matrix(StressTester.SCENARIOS, stressed.holdings())
+    values = pd.Series({ticker: asset.current_value for ticker, asset in stressed.portfolio.assets.items()})
+
+    assert list(result.index) == list(StressTester.SCENARIOS)
+    np.testing.assert_allclose(result[list(values.index)], shocks[list(values.index)] * values)
+    only_bonds = stressed.run({"asset_class": "Fixed Income"}, historical=False)
+    assert list(only_bonds.columns) == ["Total", "Total %", "Fixed Income"]
+
+
+def test_historical_and_rolling_scenarios_replay_the_prices(stressed, provider):
+    held = stressed.holdings()
+    historical = stressed.historical_scenarios(held)
+    closes = provider.download_close(list(held.index), "2020-02-19", "2020-03-24")
+
+    # The synthetic history starts in 2018, earlier periods have no prices.
+    np.testing.assert_allclose(historical.loc["Global Financial Crisis"], 0.0)
+    np.testing.assert_allclose(historical.loc["Covid Crash"], closes.iloc[-1] / closes.iloc[0] - 1)
+
+    rolling = stressed.rolling_scenarios(held, "2023-01-02", "2023-03-01", window=5)
+    closes = provider.download_close(list(held.index), "2023-01-02", "2023-03-01")
+    np.testing.assert_allclose(rolling.to_numpy(), closes.pct_change(5).iloc[5:].to_numpy())
+    assert rolling.index[0] == f"{closes.index[5].date()} (5d)"
+    with pytest.raises(ValueError, match="Not enough prices"):
+        stressed.rolling_scenarios(held, "2023-01-02", "2023-01-05", window=5)
+
+
+class LateRatesProvider(SyntheticProvider):
+    """
+    Synthetic market whose exchange rates only start in December 2003,
+    like EURUSD=X on yahoo finance.
+    """
+    def download_close(self, tickers, start, end=None):
+        closes = super().download_close(tickers, start, end)
+        rates = [ticker for ticker in closes.columns if ticker.endswith("=X")]
+        closes.loc[closes.index < "2003-12-01", rates] = np.nan
+        return closes
+
+
+def test_periods_before_the_exchange_rates_use_the_proxy():
+    provider = LateRatesProvider(seed=3, start="1999-01-04")
+    portfolio = Portfolio(provider)
+    portfolio.add_new_asset(Asset("AAPL", "Information Technology", "Equities", 10, 100.0, provider, "2019-01-02"))
+    portfolio.add_new_asset(Asset("SAP.DE", "Information Technology", "Equities", 10, 100.0, provider, "2019-01-02"))
+    stressed = StressTester(portfolio)
+    held = stressed.holdings()
+
+    historical = stressed.historical_scenarios(held)
+
+    # Without a EUR rate, the euro asset follows the other equities.
+    dot_com = historical.loc["Dot-com Crash"]
+    assert dot_com["SAP.DE"] == pytest.approx(dot_com["AAPL"]) and dot_com["AAPL"] != 0
+    # Later periods are converted at the rates of the period.
+    start, end = StressTester.HISTORICAL["Euro Debt Crisis"]
+    prices = provider.download_close(["SAP.DE", "EURUSD=X"], start, str(pd.Timestamp(end).date() + pd.Timedelta(days=1)))
+    converted = prices["SAP.DE"] * prices["EURUSD=X"]
+    assert historical.loc["Euro Debt Crisis", "SAP.DE"] == pytest.approx(converted.iloc[-1] / converted.iloc[0] - 1)
+    result = stressed.run(window=21, date1="2003-10-01", date2="2004-03-01")
+    assert np.isfinite(result.to_numpy(dtype=float)).all()
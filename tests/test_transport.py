@@ -0,0 +1,143 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from models import Transport as transport_module
+from models.Transport import CircuitOpenError, HTTPStatusError, Transport, TransportBusyError
+import requests
+import pytest
+import threading
+import time
+import types
+
+
+class StubServer:
+    """
+    Local HTTP server answering with a scripted list of status codes,
+    the last status is repeated once the script runs out.
+    """
+    def __init__(self, statuses: list[int]):
+        self.statuses = list(statuses)
+        self.hits = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status = stub.statuses[min(stub.hits, len(stub.statuses) - 1)]
+                stub.hits += 1
+                self.send_response(status)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"ok")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/quote"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(statuses: list[int]) -> StubServer:
+        servers.append(StubServer(statuses))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    """Records the backoff delays instead of sleeping, jitter at its maximum."""
+    recorded = []
+    monkeypatch.setattr(transport_module.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(
+        transport_module, "time", types.SimpleNamespace(sleep=recorded.append, monotonic=time.monotonic),
+    )
+    return recorded
+
+
+def make_transport(**kwargs) -> Transport:
+    options = dict(max_concurrency=2, timeout=2.0, retries=3, backoff=0.1, max_backoff=0.25)
+    options.update(kwargs)
+    return Transport(session=requests.Session(), **options)
+
+
+def test_transient_status_is_retried_until_success(stub, delays):
+    server = stub([503, 429, 200])
+    response = make_transport().get(server.url)
+    assert response.status_code == 200
+    assert server.hits == 3
+    assert delays == [0.1, 0.2]
+
+
+def test_backoff_doubles_up_to_the_maximum_and_gives_up(stub, delays):
+    server = stub([503])
+    with pytest.raises(HTTPStatusError) as error:
+        make_transport(failure_threshold=100).get(server.url)
+    assert error.value.status == 503
+    assert server.hits == 4
+    assert delays == [0.1, 0.2, 0.25]
+
+
+def test_client_errors_are_not_retried(stub, delays):
+    server = stub([404])
+    response = make_transport().get(server.url)
+    assert response.status_code == 404
+    assert server.hits == 1
+    assert delays == []
+
+
+def test_circuit_opens_half_opens_and_closes(stub, delays):
+    server = stub([503, 503, 200])
+    transport = make_transport(retries=0, failure_threshold=2, reset_timeout=0.2)
+    for _ in range(2):
+        with pytest.raises(HTTPStatusError):
+            transport.get(server.url)
+
+    # Open: fails fast without reaching the server.
+    with pytest.raises(CircuitOpenError):
+        transport.get(server.url)
+    assert server.hits == 2
+
+    # Half open after reset_timeout: a single trial call is let through and closes it.
+    time.sleep(0.25)
+    assert transport.get(server.url).status_code == 200
+    assert transport.get(server.url).status_code == 200
+    assert server.hits == 4
+
+
+def test_failed_trial_call_reopens_the_circuit(stub, delays):
+    server = stub([503])
+    transport = make_transport(retries=0, failure_threshold=1, reset_timeout=0.2)
+    with pytest.raises(HTTPStatusError):
+        transport.get(server.url)
+    time.sleep(0.25)
+    with pytest.raises(HTTPStatusError):
+        transport.get(server.url)
+    with pytest.raises(CircuitOpenError):
+        transport.get(server.url)
+    assert server.hits == 2
+
+
+def test_hanging_calls_do_not_block_later_calls():
+    release = threading.Event()
+    transport = make_transport(max_concurrency=1, timeout=0.2, retries=0, failure_threshold=100)
+    with pytest.raises(TimeoutError):
+        transport.call(release.wait)
+
+    # The hanging call still holds the only slot, the next call gives up instead of waiting forever.
+    start = time.monotonic()
+    with pytest.raises(TransportBusyError):
+        transport.call(lambda: "quote")
+    assert time.monotonic() - start < 1.0
+
+    release.set()
+    time.sleep(0.05)
+    assert transport.call(lambda: "quote") == "quote"
@@ -1,15 +1,126 @@
 from models.Portfolio import Portfolio
 from models.Asset import Asset
+from models.Backtester import Backtester
+from models.BarStore import BarStore
 from models.MonteCarlo import MonteCarlo
-from typing import Optional
-import yfinance as yf
+from models.Optimizer import Optimizer
+from models.PortfolioManager import PortfolioManager
+from models.Returns import ReturnCalculator
+from models.SimulationCache import SimulationCache
+from models.StressTest import StressTester
+from typing import Any, Iterable, Iterator, Optional, Tuple
+import config
 import matplotlib.pyplot as plt
+import heapq
+import itertools
 import math
 import pandas as pd
 import numpy as np
 import os
 
 
+def _sort_key(row: tuple, index: int, weights: Optional[int]=None) -> Tuple[bool, Any]:
+    """
+    Sort key of a table cell. Lots (lists) sort by their total, lots of
+    dates by the latest date and, with the index of a weights column
+    (e.g. the quantities of purchase prices), by their weighted
+    average. Empty cells sort before all others.
+
+    Parameters
+    ----------
+    row: tuple
+        The row of the table.
+    index: int
+        Index of the sorted column.
+    weights: Optional[int]
+        Index of the column that weighs the lots of the sorted column.
+
+    Returns
+    -------
+    Tuple[bool, Any]
+        False for an empty cell, and the value to sort by.
+    """
+    value = row[index]
+    if not isinstance(value, list):
+        return True, value
+    if not value:
+        return False, 0
+    if isinstance(value[0], str):
+        return True, max(value)
+    if weights is not None:
+        quantities = row[weights] if isinstance(row[weights], list) else [row[weights]]
+        if len(quantities) == len(value) and sum(quantities):
+            return True, float(np.dot(quantities, value) / sum(quantities))
+    return True, sum(value)
+
+
+def _format_cell(value: Any) -> str:
+    """
+    Formats a table cell, floats like tabulate does.
+
+    Parameters
+    ----------
+    value: Any
+        Content of the cell.
+
+    Returns
+    -------
+    str
+        The formatted cell.
+    """
+    if isinstance(value, (float, np.floating)):
+        return f"{value:g}"
+    return str(value)
+
+
+def _pyarrow() -> Any:
+    """
+    Imports pyarrow, which is only needed for Arrow and Parquet exports.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    Any
+        The pyarrow module, with its ipc and parquet modules loaded.
+
+    Raises
+    ------
+    ImportError
+        If pyarrow is not installed.
+    """
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Arrow and Parquet exports require pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def _is_number(cell: str) -> bool:
+    """
+    Checks if a formatted cell is numeric (and right aligned).
+
+    Parameters
+    ----------
+    cell: str
+        The formatted cell.
+
+    Returns
+    -------
+    bool
+        If it is a number True, else False.
+    """
+    try:
+        float(cell)
+        return True
+    except ValueError:
+        return False
+
+
 class Viewer:
     """
     A Class which saves and/or prints visualisations.
@@ -19,14 +130,22 @@ class Viewer:
     portfolio: models.Portfolio
         An object which stores information and can calulate
         information on the portfolio.
+    cache: Optional[models.SimulationCache]
+        Memoizes Monte Carlo results. Defaults to the folder in
+        config.SIMULATION_CACHE_DIR, disabled if that is empty.
     
     Attributes
     ----------
     portfolio: models.Portfolio
         Saved from the constructor
+    cache: Optional[models.SimulationCache]
+        Saved from the constructor
     """
-    def __init__(self, portfolio: Portfolio):
+    def __init__(self, portfolio: Portfolio, cache: Optional[SimulationCache]=None):
         self.portfolio = portfolio
+        if cache is None and config.SIMULATION_CACHE_DIR:
+            cache = SimulationCache()
+        self.cache = cache
 
     def create_individual_asset_graphs(
             self,
@@ -34,6 +153,8 @@ class Viewer:
             assets: list[str],
             date1: str,
             date2: Optional[str]=None,
+            interval: Optional[str]=None,
+            rule: Optional[str]=None,
     ) -> None:
         """
         Creates graphs of individual assets on a grid from Date1 until
@@ -50,6 +171,10 @@ class Viewer:
         date2: Optional[str]
             Ending date for the visualisations.
             ("None" gives most recent)
+        interval: Optional[str]
+            Intraday bars ("1m", "5m" or "1h") instead of daily closes.
+        rule: Optional[str]
+            Frequency to resample the bars to (e.g. "15min" or "4h").
         
         Returns
         -------
@@ -60,9 +185,37 @@ class Viewer:
         Saves to location graphs/{name}.png, prints to terminal.
         Creates folder graphs if it doesn't exist already.
         """
-        marketData = yf.download(assets, start=date1, end=date2, progress=False, auto_adjust=False)
-        marketData = marketData["Close"]
-        
+        if interval is None:
+            marketData = self.portfolio.provider.download_close(assets, date1, date2)
+        else:
+            marketData = BarStore(self.portfolio.provider).bars(assets, date1, date2, interval, rule)
+        self.plot_individual_assets(name, assets, marketData)
+
+    @staticmethod
+    def plot_individual_assets(name: str, assets: list[str], marketData: pd.DataFrame) -> None:
+        """
+        Renders already retrieved closing prices of individual assets
+        on a grid. Does not access market data, so it can run in a
+        separate worker process.
+
+        Parameters
+        ----------
+        name: str
+            Name of the file to be saved (excluding extension.)
+        assets: list[str]
+            A list of tickers, columns of marketData.
+        marketData: pd.DataFrame
+            Closing prices with one column per ticker.
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Saves to location graphs/{name}.png, prints to terminal.
+        Creates folder graphs if it doesn't exist already.
+        """
         n_assets = len(assets)
         # Determine grid size (rows and columns) to make it as "square" as possible
         cols = math.ceil(math.sqrt(n_assets))
@@ -96,6 +249,10 @@ class Viewer:
             name: str,
             date1: str,
             date2: Optional[str]=None,
+            export_folder: Optional[str]=None,
+            export_format: str="Arrow",
+            interval: Optional[str]=None,
+            rule: Optional[str]=None,
     ) -> None:
         """
         Creates a graph of the NAV of the portfolio. Assumes
@@ -112,6 +269,15 @@ class Viewer:
             starting date for the data.
         date2: str
             ending date for the data. ("None" gives most recent).
+        export_folder: Optional[str]
+            Also writes the NAV history to this folder, see
+            export_frame.
+        export_format: str
+            "Arrow" or "Parquet".
+        interval: Optional[str]
+            Intraday bars ("1m", "5m" or "1h") instead of daily closes.
+        rule: Optional[str]
+            Frequency to resample the bars to (e.g. "15min" or "4h").
         
         Returns
         -------
@@ -122,7 +288,43 @@ class Viewer:
         Saves a file to graphs/{name}.png, prints to terminal.
         Creates folder graphs if it doesn't exist already.
         """
-        portfolio_p = self.portfolio.get_portfolio_prices(restrictions, date1, date2)
+        portfolio_p = self.portfolio.get_portfolio_prices(restrictions, date1, date2, interval, rule)
+        self.plot_portfolio(restrictions, name, portfolio_p)
+        if export_folder is not None:
+            self.export_frame(
+                os.path.join(export_folder, f"{name}_history{self.EXPORT_EXTENSIONS[export_format]}"),
+                portfolio_p,
+            )
+
+    @staticmethod
+    def plot_portfolio(
+            restrictions: Optional[dict[str, str]],
+            name: str,
+            portfolio_p: pd.DataFrame,
+    ) -> None:
+        """
+        Renders an already retrieved NAV of the portfolio. Does not
+        access market data, so it can run in a separate worker process.
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            The filter used for portfolio_p, used for the title.
+        name: str
+            Name for the to be saved file (excluding extension).
+        portfolio_p: pd.DataFrame
+            NAV of the portfolio as returned by
+            models.Portfolio.get_portfolio_prices.
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Saves a file to graphs/{name}.png, prints to terminal.
+        Creates folder graphs if it doesn't exist already.
+        """
         plt.figure(figsize=(10,5))
         plt.plot(
             portfolio_p.index,
@@ -143,6 +345,7 @@ class Viewer:
         save_path = os.path.join("graphs", f"{name}.png")
         os.makedirs(os.path.dirname(save_path), exist_ok=True)
         plt.savefig(save_path)
+        plt.close()
         print(f"Portfolio NAV graph written to graphs/{name}.png")
     
     def create_monte_carlo_graph(
@@ -153,11 +356,23 @@ class Viewer:
             endDate: Optional[str]=None,
             n: int=100000,
             months: int=12*15,
-    ) -> None:
+            engine: str="GBM",
+            block_size: int=6,
+            step: str="Monthly",
+            seed: Optional[int]=None,
+            horizons: Optional[list[int]]=None,
+            export_folder: Optional[str]=None,
+            export_format: str="Arrow",
+            export_paths: Optional[str]=None,
+    ) -> Optional[pd.DataFrame]:
         """
         Creates a graph including historical data and Monte Carlo
         Simulations (20 realizations + quantiles) and saves them to
-        the graphs folder.
+        the graphs folder. Results are memoized in self.cache, so
+        rerunning the same simulation only renders. With several
+        horizons, one simulation to the longest horizon also gives the
+        terminal distribution of every horizon: a summary table is
+        printed and a grid of the distributions is saved.
 
         Parameters
         ----------
@@ -175,7 +390,127 @@ class Viewer:
             Number of simulations (max 100000 min 1)
         months: int
             Number of months per simulation.
+        engine: str
+            "GBM" or "Bootstrap", see models.MonteCarlo.simulate_paths.
+        block_size: int
+            Steps per resampled block (Bootstrap only).
+        step: str
+            Daily/Weekly/Monthly/Quarterly simulation step.
+        seed: Optional[int]
+            Seed of the random numbers, None for a random seed.
+        horizons: Optional[list[int]]
+            Horizons in months to summarize, e.g. [12, 60, 120, 180].
+        export_folder: Optional[str]
+            Also writes the results to this folder, see
+            export_simulation.
+        export_format: str
+            "Arrow" or "Parquet", format of the history and the
+            quantile bands.
+        export_paths: Optional[str]
+            Also writes the full path matrix as "Npy", "Arrow" or
+            "Parquet", None to skip it.
         
+        Returns
+        -------
+        Optional[pd.DataFrame]
+            Summary per horizon, see
+            models.MonteCarlo.horizon_statistics, None without horizons.
+
+        Notes
+        -----
+        Saves a file to graphs/{name}.png (and
+        graphs/{name}_horizons.png), prints to terminal.
+        Creates folder graphs if it doesn't exist already.
+        """
+        horizons = sorted(set(horizons)) if horizons else None
+        params = dict(
+            n=n,
+            months=months,
+            engine=engine,
+            block_size=block_size,
+            step=step,
+            seed=seed,
+        )
+        if horizons is not None:
+            params["horizons"] = horizons
+        result = None
+        if self.cache is not None:
+            key = self.cache.key(
+                self.portfolio, restrictions, startDate=startDate, endDate=endDate, **params,
+            )
+            result = self.cache.load(key)
+
+        paths = None
+        # The full paths are only memoized with config.SIMULATION_CACHE_PATHS.
+        if result is None or (export_paths is not None and result[4] is None):
+            montecarlo = MonteCarlo(self.portfolio)
+            history, sims, future_index = montecarlo.simulate_paths(
+                restrictions, startDate, endDate, **params,
+            )
+            terminals = None
+            if horizons is not None:
+                terminals = sims[MonteCarlo.horizon_rows(future_index, history.index[-1], horizons)]
+            if self.cache is not None:
+                result = self.cache.store(key, history, future_index, sims, terminals)
+            else:
+                result = (history, future_index, *SimulationCache.summarize(sims), sims, terminals)
+            paths = sims
+
+        history, future_index, bands, samples, stored_paths, terminals = result
+        self.plot_monte_carlo(restrictions, name, history, bands, samples, future_index)
+        if export_folder is not None:
+            self.export_simulation(
+                export_folder,
+                name,
+                history,
+                future_index,
+                bands,
+                stored_paths if stored_paths is not None else paths,
+                export_format,
+                export_paths,
+            )
+        if horizons is None:
+            return None
+        summary = MonteCarlo.horizon_statistics(
+            terminals,
+            history.iloc[-1, 0],
+            horizons,
+            future_index[MonteCarlo.horizon_rows(future_index, history.index[-1], horizons)],
+        )
+        print(summary.round(4).to_markdown(tablefmt="pipe"))
+        self.plot_horizons(restrictions, f"{name}_horizons", summary, terminals, history.iloc[-1, 0])
+        return summary
+
+    @staticmethod
+    def plot_monte_carlo(
+            restrictions: Optional[dict[str, str]],
+            name: str,
+            history: pd.DataFrame,
+            bands: np._typing.NDArray[np.float64],
+            samples: np._typing.NDArray[np.float64],
+            future_index: pd.DatetimeIndex,
+    ) -> None:
+        """
+        Renders a summarized Monte Carlo simulation (history,
+        20 realizations + quantiles). Does not access market data,
+        so it can run in a separate worker process.
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            The filter used for the simulation, used for the title.
+        name: str
+            Name of the file to be saved. (excluding extension)
+        history: pd.DataFrame
+            Historical NAV of the portfolio.
+        bands: np.typing.NDArray[np.float64]
+            The 5, 25, 50, 75 and 95% quantiles per date, as returned
+            by models.SimulationCache.summarize.
+        samples: np.typing.NDArray[np.float64]
+            A few simulated paths (one column per path).
+        future_index: pd.DatetimeIndex
+            The dates of the simulated paths.
+
         Returns
         -------
         None
@@ -185,19 +520,12 @@ class Viewer:
         Saves a file to graphs/{name}.png, prints to terminal.
         Creates folder graphs if it doesn't exist already.
         """
-        montecarlo = MonteCarlo(self.portfolio)
-        history, sims, future_index = montecarlo.simulate_paths(restrictions, startDate, endDate, n=n, months=months)
-
         plt.figure(figsize=(10, 5))
 
         plt.plot(history.index, history["Portfolio Price"], label="Historical NAV", color="black", linewidth=2)
 
         # Quantiles
-        q05 = np.percentile(sims, 5, axis=1)
-        q25 = np.percentile(sims, 25, axis=1)
-        q50 = np.percentile(sims, 50, axis=1)
-        q75 = np.percentile(sims, 75, axis=1)
-        q95 = np.percentile(sims, 95, axis=1)
+        q05, q25, q50, q75, q95 = bands
 
         # Fill percentile bands
         plt.fill_between(future_index, q05, q95, color="blue", alpha=0.1, label="5–95% range")
@@ -207,7 +535,7 @@ class Viewer:
         plt.plot(future_index, q50, color="blue", linewidth=2, label="Median path")
 
         # A few sample paths
-        plt.plot(future_index, sims[:, :20], color="blue", alpha=0.2, linewidth=1)
+        plt.plot(future_index, samples, color="blue", alpha=0.2, linewidth=1)
 
         if restrictions is None:
             title = ""
@@ -227,14 +555,505 @@ class Viewer:
         plt.close()
         print(f"Monte Carlo graph written to graphs/{name}.png")
 
-    def display_summary(self) -> None:
+    @staticmethod
+    def plot_horizons(
+            restrictions: Optional[dict[str, str]],
+            name: str,
+            summary: pd.DataFrame,
+            terminals: np._typing.NDArray[np.float64],
+            last_price: float,
+    ) -> None:
         """
-        Prints the portfolio to the terminal as a table.
+        Renders the terminal distribution of every horizon of a
+        Monte Carlo simulation in a grid, one histogram per horizon.
+        Does not access market data, so it can run in a separate
+        worker process.
 
         Parameters
         ----------
+        restrictions: Optional[dict[str, str]]
+            The filter used for the simulation, used for the title.
+        name: str
+            Name of the file to be saved. (excluding extension)
+        summary: pd.DataFrame
+            Summary per horizon, as returned by
+            models.MonteCarlo.horizon_statistics.
+        terminals: np.typing.NDArray[np.float64]
+            Simulated values per horizon (one row per horizon).
+        last_price: float
+            Value at the start of the simulation.
+
+        Returns
+        -------
         None
 
+        Notes
+        -----
+        Saves a file to graphs/{name}.png, prints to terminal.
+        Creates folder graphs if it doesn't exist already.
+        """
+        columns = min(len(summary), 2)
+        rows = math.ceil(len(summary) / columns)
+        fig, axes = plt.subplots(rows, columns, figsize=(6 * columns, 4 * rows), squeeze=False)
+        for ax, (label, row), values in zip(axes.flat, summary.iterrows(), terminals):
+            # The far right tail of a long horizon would squeeze the histogram.
+            upper = np.percentile(values, 99)
+            ax.hist(values[values <= upper], bins=100, color="blue", alpha=0.4)
+            ax.axvline(last_price, color="black", linewidth=2, label="Current value")
+            for quantile, style in [("5%", ":"), ("50%", "-"), ("95%", ":")]:
+                ax.axvline(row[quantile], color="blue", linestyle=style, label=quantile)
+            ax.set_title(f"{label} ({row['Date']}), P(Loss) {row['P(Loss)']:.1%}", fontsize=10)
+            ax.set_xlabel("Portfolio Price")
+            ax.grid(True, alpha=0.3)
+        for ax in axes.flat[len(summary):]:
+            ax.set_visible(False)
+        axes.flat[0].legend()
+
+        if restrictions is None:
+            title = ""
+        else:
+            title = f"{restrictions.get('asset_class', '')} {restrictions.get('sector', '')}"
+        fig.suptitle(f"{title} Monte Carlo Distribution per Horizon", fontsize=12)
+        fig.tight_layout()
+
+        save_path = os.path.join("graphs", f"{name}.png")
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        fig.savefig(save_path)
+        plt.close(fig)
+        print(f"Monte Carlo horizons graph written to graphs/{name}.png")
+
+    def create_frontier_graph(
+            self,
+            restrictions: Optional[dict[str, str]],
+            name: str,
+            date1: str,
+            date2: Optional[str]=None,
+            n: int=100000,
+            constraints: Optional[dict[str, dict[str, Tuple[float, float]]]]=None,
+            risk_free: float=0.0,
+            seed: Optional[int]=None,
+    ) -> None:
+        """
+        Creates a graph of the efficient frontier of the assets,
+        with the current, minimum variance and maximum Sharpe
+        portfolios, and prints the weights of these portfolios.
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            To filter the portfolio by. e.g. asset class and/or sector.
+        name: str
+            Name for the to be saved file (excluding extension).
+        date1: str
+            starting date for the data.
+        date2: str
+            ending date for the data. ("None" gives most recent).
+        n: int
+            Number of candidate portfolios.
+        constraints: Optional[dict[str, dict[str, Tuple[float, float]]]]
+            Minimum and maximum weight per asset class and/or sector,
+            see models.Optimizer.optimize.
+        risk_free: float
+            Annual risk free rate for the Sharpe ratio.
+        seed: Optional[int]
+            Seed of the random numbers, None for a random seed.
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Saves a file to graphs/{name}.png, prints to terminal.
+        Creates folder graphs if it doesn't exist already.
+        """
+        portfolios, frontier, cloud = Optimizer(self.portfolio).optimize(
+            restrictions,
+            date1,
+            date2,
+            n=n,
+            constraints=constraints,
+            risk_free=risk_free,
+            seed=seed,
+        )
+        self.plot_frontier(restrictions, name, portfolios, frontier, cloud)
+        print("\nAnnual return, volatility, Sharpe ratio and weights")
+        print(portfolios.T.round(4).to_markdown(tablefmt="pipe"))
+
+    @staticmethod
+    def plot_frontier(
+            restrictions: Optional[dict[str, str]],
+            name: str,
+            portfolios: pd.DataFrame,
+            frontier: pd.DataFrame,
+            cloud: pd.DataFrame,
+    ) -> None:
+        """
+        Renders an already computed efficient frontier. Does not
+        access market data, so it can run in a separate worker process.
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            The filter used for the optimization, used for the title.
+        name: str
+            Name for the to be saved file (excluding extension).
+        portfolios: pd.DataFrame
+            The current, minimum variance and maximum Sharpe
+            portfolios, as returned by models.Optimizer.optimize.
+        frontier: pd.DataFrame
+            The efficient frontier.
+        cloud: pd.DataFrame
+            A sample of the candidate portfolios.
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Saves a file to graphs/{name}.png, prints to terminal.
+        Creates folder graphs if it doesn't exist already.
+        """
+        plt.figure(figsize=(10, 5))
+        points = plt.scatter(
+            cloud["Volatility"],
+            cloud["Return"],
+            c=cloud["Sharpe"],
+            cmap="viridis",
+            s=4,
+            alpha=0.4,
+        )
+        plt.colorbar(points, label="Sharpe ratio")
+        plt.plot(
+            frontier["Volatility"],
+            frontier["Return"],
+            color="black",
+            linewidth=2,
+            label="Efficient frontier",
+        )
+        for label, marker, color in [
+            ("Current", "o", "red"),
+            ("Min Variance", "s", "blue"),
+            ("Max Sharpe", "*", "orange"),
+        ]:
+            plt.scatter(
+                portfolios.at[label, "Volatility"],
+                portfolios.at[label, "Return"],
+                marker=marker,
+                color=color,
+                s=120,
+                edgecolors="black",
+                label=label,
+                zorder=3,
+            )
+
+        if restrictions is None:
+            title = ""
+        else:
+            title = f"{restrictions.get('asset_class', '')} {restrictions.get('sector', '')}"
+        plt.title(f"{title} Efficient Frontier", fontsize=12)
+        plt.xlabel("Annual volatility")
+        plt.ylabel("Annual return")
+        plt.grid(True, alpha=0.3)
+        plt.legend()
+        plt.tight_layout()
+        save_path = os.path.join("graphs", f"{name}.png")
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        plt.savefig(save_path)
+        plt.close()
+        print(f"Efficient frontier graph written to graphs/{name}.png")
+
+    def create_backtest_graph(
+            self,
+            restrictions: Optional[dict[str, str]],
+            name: str,
+            date1: str,
+            date2: Optional[str]=None,
+            rebalance: str="Monthly",
+    ) -> None:
+        """
+        Creates a graph of the backtest of the lots of the portfolio:
+        buy and hold, periodic and continuous rebalancing side by side
+        with the invested capital.
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            To filter the portfolio by. e.g. asset class and/or sector.
+        name: str
+            Name for the to be saved file (excluding extension).
+        date1: str
+            starting date for the data.
+        date2: str
+            ending date for the data. ("None" gives most recent).
+        rebalance: str
+            Period of the periodic rebalancing, one of
+            Weekly/Monthly/Quarterly/Yearly.
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Saves a file to graphs/{name}.png, prints to terminal.
+        Creates folder graphs if it doesn't exist already.
+        """
+        navs = Backtester(self.portfolio).run(restrictions, date1, date2, rebalance)
+        self.plot_backtest(restrictions, name, navs)
+
+    @staticmethod
+    def plot_backtest(
+            restrictions: Optional[dict[str, str]],
+            name: str,
+            navs: pd.DataFrame,
+    ) -> None:
+        """
+        Renders an already computed backtest. Does not access market
+        data, so it can run in a separate worker process.
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            The filter used for the backtest, used for the title.
+        name: str
+            Name for the to be saved file (excluding extension).
+        navs: pd.DataFrame
+            NAV per strategy and the invested capital, as returned by
+            models.Backtester.run.
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Saves a file to graphs/{name}.png, prints to terminal.
+        Creates folder graphs if it doesn't exist already.
+        """
+        plt.figure(figsize=(10, 5))
+        for column in navs.columns:
+            if column == "Invested":
+                plt.plot(navs.index, navs[column], label=column, color="grey", linestyle="--")
+            else:
+                plt.plot(navs.index, navs[column], label=column, linewidth=1.5)
+
+        if restrictions is None:
+            title = ""
+        else:
+            title = f"{restrictions.get('asset_class', '')} {restrictions.get('sector', '')}"
+        plt.title(f"{title} Portfolio Backtest", fontsize=12)
+        plt.xlabel("Date")
+        plt.ylabel("NAV")
+        plt.grid(True, alpha=0.3)
+        plt.legend()
+        plt.tight_layout()
+        save_path = os.path.join("graphs", f"{name}.png")
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        plt.savefig(save_path)
+        plt.close()
+        print(f"Backtest graph written to graphs/{name}.png")
+
+    SUMMARY_COLUMNS = [
+        "Ticker",
+        "Asset Name",
+        "Sector",
+        "Asset Class",
+        "Currency",
+        "Quantity",
+        "Purchase Price",
+        "Purchase Date",
+        "Transaction Value",
+        "Current Value",
+    ]
+    WEIGHT_COLUMNS = ["Ticker", "Weights"]
+    # Lots of these columns sort by their average weighted by another column.
+    WEIGHTED_COLUMNS = {"Purchase Price": "Quantity"}
+    # Rows that set the column widths of a streamed table.
+    WIDTH_ROWS = 1000
+
+    def summary_rows(self, restrictions: Optional[dict[str, str]]=None) -> Iterator[tuple]:
+        """
+        Lazily yields one summary row per asset, in portfolio order.
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            To filter the portfolio by e.g. asset class and/or sector.
+
+        Returns
+        -------
+        Iterator[tuple]
+            Rows with the values of Viewer.SUMMARY_COLUMNS.
+        """
+        restrictions = restrictions or {}
+        for asset in self.portfolio.assets.values():
+            if (asset.sector == restrictions.get("sector", asset.sector)
+                and asset.asset_class == restrictions.get("asset_class", asset.asset_class)):
+                yield (
+                    asset.ticker,
+                    asset.name,
+                    asset.sector,
+                    asset.asset_class,
+                    asset.currency,
+                    asset.quantity[0] if len(asset.quantity) == 1 else asset.quantity,
+                    (asset.purchase_price[0]
+                     if len(asset.purchase_price) == 1 else asset.purchase_price),
+                    (asset.purchase_date[0]
+                     if len(asset.purchase_date) == 1 else asset.purchase_date),
+                    asset.transaction_value,
+                    asset.current_value,
+                )
+
+    def weight_rows(self, restrictions: Optional[dict[str, str]]=None) -> Iterator[tuple]:
+        """
+        Lazily yields one (ticker, weight) row per asset.
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            To filter the portfolio by e.g. asset class and/or sector.
+
+        Returns
+        -------
+        Iterator[tuple]
+            Rows with the values of Viewer.WEIGHT_COLUMNS.
+        """
+        weights, _, _ = self.portfolio.get_portfolio_weights(restrictions)
+        for ticker, weight in weights.items():
+            yield ticker, weight
+
+    @staticmethod
+    def select_rows(
+            rows: Iterable[tuple],
+            columns: list[str],
+            sort_by: Optional[str]=None,
+            descending: bool=True,
+            top: Optional[int]=None,
+            page: int=1,
+            page_size: Optional[int]=None,
+    ) -> Iterator[tuple]:
+        """
+        Sorts, limits and paginates rows. Top N is selected with a heap
+        (O(n log N)) instead of sorting all rows, and without sorting
+        pages are sliced lazily from the input.
+
+        Parameters
+        ----------
+        rows: Iterable[tuple]
+            The rows to select from.
+        columns: list[str]
+            Names of the values in a row.
+        sort_by: Optional[str]
+            Column to sort by, None keeps the input order.
+        descending: bool
+            Sort from large to small.
+        top: Optional[int]
+            Keep only the first N rows after sorting.
+        page: int
+            Page to return, starting at 1.
+        page_size: Optional[int]
+            Rows per page, None for all rows.
+
+        Returns
+        -------
+        Iterator[tuple]
+            The selected rows.
+        """
+        if page < 1:
+            raise ValueError("Page starts at 1")
+        if sort_by is not None:
+            if sort_by not in columns:
+                raise ValueError(f"Invalid column {sort_by}, choose one of {columns}")
+            index = columns.index(sort_by)
+            weights = Viewer.WEIGHTED_COLUMNS.get(sort_by)
+            weights = columns.index(weights) if weights in columns else None
+            key = lambda row: _sort_key(row, index, weights)
+            if top is not None:
+                select = heapq.nlargest if descending else heapq.nsmallest
+                rows = select(top, rows, key=key)
+            else:
+                rows = sorted(rows, key=key, reverse=descending)
+        elif top is not None:
+            rows = itertools.islice(rows, top)
+
+        if page_size is None:
+            return iter(rows)
+        return itertools.islice(rows, (page - 1) * page_size, page * page_size)
+
+    @staticmethod
+    def stream_table(columns: list[str], rows: Iterable[tuple]) -> Iterator[str]:
+        """
+        Formats rows as a markdown (pipe) table, one line at a time.
+        Column widths are taken from the first Viewer.WIDTH_ROWS rows,
+        only those are held in memory; a longer cell further down
+        widens its own line only.
+
+        Parameters
+        ----------
+        columns: list[str]
+            The header of the table.
+        rows: Iterable[tuple]
+            The rows of the table.
+
+        Returns
+        -------
+        Iterator[str]
+            The lines of the table.
+        """
+        rows = iter(rows)
+        cells = [[_format_cell(value) for value in row] for row in itertools.islice(rows, Viewer.WIDTH_ROWS)]
+        numeric = [
+            len(cells) > 0 and all(_is_number(row[i]) for row in cells)
+            for i in range(len(columns))
+        ]
+        widths = [
+            max([len(column)] + [len(row[i]) for row in cells])
+            for i, column in enumerate(columns)
+        ]
+
+        yield "| " + " | ".join(
+            column.rjust(width) if is_num else column.ljust(width)
+            for column, width, is_num in zip(columns, widths, numeric)
+        ) + " |"
+        yield "|" + "|".join(
+            "-" * (width + 1) + ":" if is_num else ":" + "-" * (width + 1)
+            for width, is_num in zip(widths, numeric)
+        ) + "|"
+        for row in itertools.chain(cells, ([_format_cell(value) for value in row] for row in rows)):
+            yield "| " + " | ".join(
+                cell.rjust(width) if is_num else cell.ljust(width)
+                for cell, width, is_num in zip(row, widths, numeric)
+            ) + " |"
+
+    def display_summary(
+            self,
+            restrictions: Optional[dict[str, str]]=None,
+            sort_by: Optional[str]=None,
+            descending: bool=True,
+            top: Optional[int]=None,
+            page: int=1,
+            page_size: Optional[int]=None,
+    ) -> None:
+        """
+        Prints the portfolio to the terminal as a table.
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            To filter the portfolio by e.g. asset class and/or sector.
+        sort_by: Optional[str]
+            Column to sort by, None keeps the portfolio order.
+        descending: bool
+            Sort from large to small.
+        top: Optional[int]
+            Show only the first N rows after sorting.
+        page: int
+            Page to show, starting at 1.
+        page_size: Optional[int]
+            Rows per page, None for all rows.
+
         Returns
         -------
         None
@@ -243,30 +1062,28 @@ class Viewer:
         -----
         Prints to the terminal.
         """
-        assets = self.portfolio.assets.values()
-        df = pd.DataFrame(
-            {
-                "Ticker": [asset.ticker for asset in assets],
-                "Asset Name": [asset.name for asset in assets],
-                "Sector": [asset.sector for asset in assets],
-                "Asset Class": [asset.asset_class for asset in assets],
-                "Quantity": [
-                    asset.quantity[0]
-                    if len(asset.quantity) == 1 else asset.quantity
-                    for asset in assets
-                ],
-                "Purchase Price": [
-                    asset.purchase_price[0]
-                    if len(asset.purchase_price) == 1 else asset.purchase_price
-                    for asset in assets],
-                "Transaction Value": [asset.transaction_value for asset in assets],
-                "Current Value": [asset.current_value for asset in assets],
-            },
+        rows = self.select_rows(
+            self.summary_rows(restrictions),
+            self.SUMMARY_COLUMNS,
+            sort_by=sort_by,
+            descending=descending,
+            top=top,
+            page=page,
+            page_size=page_size,
         )
         print()
-        print(df.to_markdown(index=False, tablefmt="pipe"))
-    
-    def display_weights(self, restrictions: Optional[dict[str, str]]=None) -> None:
+        for line in self.stream_table(self.SUMMARY_COLUMNS, rows):
+            print(line)
+
+    def display_weights(
+            self,
+            restrictions: Optional[dict[str, str]]=None,
+            sort_by: Optional[str]=None,
+            descending: bool=True,
+            top: Optional[int]=None,
+            page: int=1,
+            page_size: Optional[int]=None,
+    ) -> None:
         """
         Prints the weight of the filtered portfolio w.r.t. total
         portfolio and prints weights of the filtered portfolio to
@@ -276,7 +1093,17 @@ class Viewer:
         ----------
         restrictions: Optional[dict[str, str]]
             To filter the portfolio by e.g. asset class and/or sector.
-        
+        sort_by: Optional[str]
+            Column to sort by, None keeps the portfolio order.
+        descending: bool
+            Sort from large to small.
+        top: Optional[int]
+            Show only the first N rows after sorting.
+        page: int
+            Page to show, starting at 1.
+        page_size: Optional[int]
+            Rows per page, None for all rows.
+
         Returns
         -------
         None
@@ -285,12 +1112,7 @@ class Viewer:
         -----
         prints to the terminal.
         """
-        weights, class_sector_value, total = self.portfolio.get_portfolio_weights(restrictions)
-        tickers = []
-        weight_p_asset = []
-        for ticker, weight in weights.items():
-            tickers.append(ticker)
-            weight_p_asset.append(round(weight, 3))
+        _, class_sector_value, total = self.portfolio.get_portfolio_weights(restrictions)
 
         if restrictions is None:
             print("\nPortfolio Weights (Total):")
@@ -304,6 +1126,371 @@ class Viewer:
                 f"\n{restrictions.get('asset_class', '')} {restrictions.get('sector','')} "
                 f"portfolio weights"
             )
-        
-        df = pd.DataFrame({"Ticker": tickers, "Weights": weight_p_asset})
-        print(df.to_markdown(index=False, tablefmt="pipe"))
+
+        rows = self.select_rows(
+            self.weight_rows(restrictions),
+            self.WEIGHT_COLUMNS,
+            sort_by=sort_by,
+            descending=descending,
+            top=top,
+            page=page,
+            page_size=page_size,
+        )
+        # Sorted on the exact weights, rounded for display only.
+        rows = ((ticker, round(weight, 3)) for ticker, weight in rows)
+        for line in self.stream_table(self.WEIGHT_COLUMNS, rows):
+            print(line)
+
+    @staticmethod
+    def export_table(path: str, columns: list[str], rows: Iterable[tuple]) -> None:
+        """
+        Writes a table to CSV, Parquet or JSON (one record per line),
+        chosen by the extension of path.
+
+        Parameters
+        ----------
+        path: str
+            Location of the file, ending in .csv, .parquet or .json.
+        columns: list[str]
+            The header of the table.
+        rows: Iterable[tuple]
+            The rows of the table.
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Writes a file, prints to the terminal. Parquet requires
+        pyarrow or fastparquet to be installed.
+        """
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in {".csv", ".parquet", ".json"}:
+            raise ValueError("Unsupported file type, choose one of .csv, .parquet, .json")
+        df = pd.DataFrame.from_records(rows, columns=columns)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if extension == ".csv":
+            df.to_csv(path, index=False, chunksize=10000)
+        elif extension == ".parquet":
+            df.to_parquet(path, index=False)
+        else:
+            df.to_json(path, orient="records", lines=True)
+        print(f"{len(df)} rows written to {path}")
+
+    # File extension per export format.
+    EXPORT_EXTENSIONS = {"Arrow": ".arrow", "Parquet": ".parquet", "Npy": ".npy"}
+    # Memory used per written chunk of a path matrix.
+    EXPORT_CHUNK_BYTES = 16 * 1024**2
+
+    @staticmethod
+    def export_frame(path: str, df: pd.DataFrame) -> None:
+        """
+        Writes a table with dates as index (a NAV history, quantile
+        bands) to an Arrow IPC file or a Parquet file, chosen by the
+        extension of path. The dates become the "Date" column. Arrow
+        files are uncompressed, so readers can memory-map them
+        (pyarrow.ipc.open_file(pyarrow.memory_map(path))) without
+        parsing or copying.
+
+        Parameters
+        ----------
+        path: str
+            Location of the file, ending in .arrow or .parquet.
+        df: pd.DataFrame
+            The table, one row per date.
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Writes a file, prints to the terminal. Requires pyarrow.
+        """
+        pa = _pyarrow()
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in {".arrow", ".parquet"}:
+            raise ValueError("Unsupported file type, choose one of .arrow, .parquet")
+        index = df.index.tz_localize(None) if df.index.tz is not None else df.index
+        table = pa.table(
+            {"Date": pa.array(index.values.astype("datetime64[ns]"))}
+            | {str(column): pa.array(df[column].to_numpy()) for column in df.columns},
+        )
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        if extension == ".arrow":
+            with pa.ipc.new_file(path, table.schema) as writer:
+                writer.write_table(table)
+        else:
+            pa.parquet.write_table(table, path)
+        print(f"{len(df)} rows written to {path}")
+
+    @staticmethod
+    def export_paths(
+            path: str,
+            paths: np._typing.NDArray[np.float64],
+            future_index: pd.DatetimeIndex,
+    ) -> None:
+        """
+        Writes a simulated path matrix, chosen by the extension of path:
+
+        - .npy: the (steps, n) matrix, readable with
+          numpy.load(path, mmap_mode="r").
+        - .arrow / .parquet: one row per path and one column per
+          simulated date (e.g. "2030-12-31"), so the distribution at a
+          date is one contiguous column. Arrow files are uncompressed
+          and can be memory-mapped.
+
+        The matrix is written chunk by chunk (about
+        Viewer.EXPORT_CHUNK_BYTES each) and never copied as a whole,
+        so a memory-mapped matrix larger than memory can be exported.
+
+        Parameters
+        ----------
+        path: str
+            Location of the file, ending in .npy, .arrow or .parquet.
+        paths: np.typing.NDArray[np.float64]
+            The simulated paths (steps*n matrix), may be memory-mapped.
+        future_index: pd.DatetimeIndex
+            The dates of the simulated paths.
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Writes a file, prints to the terminal. Arrow and Parquet
+        require pyarrow.
+        """
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in {".npy", ".arrow", ".parquet"}:
+            raise ValueError("Unsupported file type, choose one of .npy, .arrow, .parquet")
+        steps, n = paths.shape
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if extension == ".npy":
+            out = np.lib.format.open_memmap(path, mode="w+", dtype=paths.dtype, shape=(steps, n))
+            chunk = max(1, Viewer.EXPORT_CHUNK_BYTES // (n * paths.itemsize))
+            for start in range(0, steps, chunk):
+                out[start:start + chunk] = paths[start:start + chunk]
+            out.flush()
+            del out
+        else:
+            pa = _pyarrow()
+            names = [str(date.date()) for date in future_index]
+            schema = pa.schema([(name, pa.from_numpy_dtype(paths.dtype)) for name in names])
+            chunk = max(1, Viewer.EXPORT_CHUNK_BYTES // (steps * paths.itemsize))
+            if extension == ".arrow":
+                writer = pa.ipc.new_file(path, schema)
+            else:
+                writer = pa.parquet.ParquetWriter(path, schema)
+            with writer:
+                for start in range(0, n, chunk):
+                    # Every column is a contiguous part of one row of the matrix.
+                    batch = pa.record_batch(
+                        [pa.array(paths[step, start:start + chunk]) for step in range(steps)],
+                        schema=schema,
+                    )
+                    writer.write_batch(batch)
+        print(f"{n} paths of {steps} steps written to {path}")
+
+    @staticmethod
+    def export_simulation(
+            folder: str,
+            name: str,
+            history: pd.DataFrame,
+            future_index: pd.DatetimeIndex,
+            bands: np._typing.NDArray[np.float64],
+            paths: Optional[np._typing.NDArray[np.float64]]=None,
+            table_format: str="Arrow",
+            paths_format: Optional[str]=None,
+    ) -> None:
+        """
+        Writes the results of a Monte Carlo simulation to
+        {folder}/{name}_history, {name}_bands and (optionally)
+        {name}_paths, so other systems can use them without
+        simulating again.
+
+        Parameters
+        ----------
+        folder: str
+            The folder to write to.
+        name: str
+            Prefix of the files.
+        history: pd.DataFrame
+            Historical NAV of the portfolio.
+        future_index: pd.DatetimeIndex
+            The dates of the simulated paths.
+        bands: np.typing.NDArray[np.float64]
+            The quantiles per date, as returned by
+            models.SimulationCache.summarize.
+        paths: Optional[np.typing.NDArray[np.float64]]
+            The simulated paths, needed when paths_format is given.
+        table_format: str
+            "Arrow" or "Parquet", format of the history and the bands.
+        paths_format: Optional[str]
+            "Npy", "Arrow" or "Parquet", None to skip the paths.
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Writes files, prints to the terminal.
+        """
+        if table_format not in {"Arrow", "Parquet"}:
+            raise ValueError("Invalid format, choose one of Arrow, Parquet")
+        if paths_format is not None and paths_format not in Viewer.EXPORT_EXTENSIONS:
+            raise ValueError(f"Invalid format, choose one of {set(Viewer.EXPORT_EXTENSIONS)}")
+        extension = Viewer.EXPORT_EXTENSIONS[table_format]
+        Viewer.export_frame(os.path.join(folder, f"{name}_history{extension}"), history)
+        Viewer.export_frame(
+            os.path.join(folder, f"{name}_bands{extension}"),
+            pd.DataFrame(
+                np.asarray(bands).T,
+                index=future_index,
+                columns=[f"{q}%" for q in SimulationCache.QUANTILES],
+            ),
+        )
+        if paths_format is not None:
+            if paths is None:
+                raise ValueError("No simulated paths to export")
+            Viewer.export_paths(
+                os.path.join(folder, f"{name}_paths{Viewer.EXPORT_EXTENSIONS[paths_format]}"),
+                paths,
+                future_index,
+            )
+
+    def display_books(self, manager: PortfolioManager) -> None:
+        """
+        Revalues all portfolios at once and prints their exposure per
+        asset class, together with the total over all portfolios.
+
+        Parameters
+        ----------
+        manager: models.PortfolioManager
+            Holds all named portfolios.
+
+        Returns
+        -------
+        None
+
+        Notes
+        -----
+        Adjusts the current value of all assets, prints to the terminal.
+        """
+        manager.revalue_all()
+        exposure = manager.aggregate_exposure("asset_class")
+        exposure["Total"] = exposure.sum(axis=1)
+        print("\nCurrent value per portfolio and asset class")
+        print(exposure.round(2).to_markdown(tablefmt="pipe"))
+
+    def display_stress(
+            self,
+            restrictions: Optional[dict[str, str]]=None,
+            by: str="asset_class",
+            window: Optional[int]=None,
+            date1: str="2000-01-01",
+            date2: Optional[str]=None,
+            top: int=20,
+    ) -> pd.DataFrame:
+        """
+        Stresses the filtered portfolio with the scenario library and
+        the historical replays, and prints the P&L of the worst
+        scenarios to the terminal.
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            To filter the portfolio by e.g. asset class and/or sector.
+        by: str
+            Group of the P&L breakdown, one of "asset_class",
+            "sector" or "ticker".
+        window: Optional[int]
+            Also replays every window of this many trading days
+            between date1 and date2, None to skip.
+        date1: str
+            Starting date of the rolling windows.
+        date2: Optional[str]
+            Ending date of the rolling windows.
+        top: int
+            Number of scenarios to print, worst first.
+
+        Returns
+        -------
+        pd.DataFrame
+            P&L of all scenarios, see models.StressTester.stress_values.
+
+        Notes
+        -----
+        prints to the terminal.
+        """
+        results = StressTester(self.portfolio).run(
+            restrictions, by=by, window=window, date1=date1, date2=date2,
+        )
+        print(f"\nP&L per scenario ({len(results)} scenarios, worst {min(top, len(results))} shown)")
+        print(results.nsmallest(top, "Total").round(2).to_markdown(tablefmt="pipe"))
+        return results
+
+    def display_pnl(self, restrictions: Optional[dict[str, str]]=None) -> pd.DataFrame:
+        """
+        Prints the realised and unrealised profit per asset of the
+        filtered portfolio to the terminal, with a total row.
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            To filter the portfolio by e.g. asset class and/or sector.
+
+        Returns
+        -------
+        pd.DataFrame
+            See models.Portfolio.pnl.
+
+        Notes
+        -----
+        prints to the terminal.
+        """
+        table = self.portfolio.pnl(restrictions)
+        shown = table.copy()
+        shown.loc["Total"] = table.sum()
+        print(f"\nProfit and loss ({config.BASE_CURRENCY})")
+        print(shown.round(2).to_markdown(tablefmt="pipe"))
+        return table
+
+    def display_returns(
+            self,
+            restrictions: Optional[dict[str, str]]=None,
+            by: str="asset_class",
+    ) -> pd.DataFrame:
+        """
+        Prints the time-weighted and money-weighted returns of the
+        filtered portfolio per group and in total to the terminal.
+
+        Parameters
+        ----------
+        restrictions: Optional[dict[str, str]]
+            To filter the portfolio by e.g. asset class and/or sector.
+        by: str
+            Group of the breakdown, one of "asset_class", "sector" or
+            "ticker".
+
+        Returns
+        -------
+        pd.DataFrame
+            See models.ReturnCalculator.run.
+
+        Notes
+        -----
+        prints to the terminal.
+        """
+        table = ReturnCalculator(self.portfolio).run(restrictions, by)
+        print(f"\nReturns (amounts in {config.BASE_CURRENCY})")
+        print(table.round(2).to_markdown(tablefmt="pipe"))
+        return table